@@ -0,0 +1,100 @@
+import os
+import time
+import atexit
+import threading
+from datetime import datetime
+import numpy as np
+from .database import record_accesses, get_item_vectors, get_user_profile, save_user_profile
+
+# Item opens are buffered in memory and written in batches: one transaction
+# per flush instead of a connection + UPDATE + commit per GET /api/items/{id}.
+# The user profile vector is an exponential moving average over opened items,
+# updated at flush time and kept in memory for search().
+ACCESS_FLUSH_S = float(os.getenv("ACCESS_FLUSH_S", "5"))
+ACCESS_FLUSH_MAX = int(os.getenv("ACCESS_FLUSH_MAX", "256"))   # Flush early once this many events queue up
+# ~ the old "average of the last 20" window (alpha = 2 / (N + 1))
+PROFILE_EMA_ALPHA = float(os.getenv("PROFILE_EMA_ALPHA", "0.1"))
+
+_pending = []          # (item_id, user_id, weight, accessed_at)
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_wakeup = threading.Event()
+_thread = None
+
+_profiles = {}         # user_id -> np.ndarray or None (known to have no profile)
+_profiles_lock = threading.Lock()
+
+def record(item_id, user_id=None, weight=1):
+    """Queues an access event; returns immediately."""
+    global _thread
+    with _lock:
+        _pending.append((item_id, user_id, weight, datetime.utcnow()))
+        full = len(_pending) >= ACCESS_FLUSH_MAX
+        if _thread is None:
+            _thread = threading.Thread(target=_run, daemon=True)
+            _thread.start()
+    if full:
+        _wakeup.set()
+
+def get_profile(user_id):
+    """The user's profile vector (cached), or None."""
+    with _profiles_lock:
+        if user_id in _profiles:
+            return _profiles[user_id]
+    stored = get_user_profile(user_id)
+    vector = np.asarray(stored, dtype=np.float32) if stored else None
+    with _profiles_lock:
+        # A flush may have set it while we were reading
+        return _profiles.setdefault(user_id, vector)
+
+def _run():
+    while True:
+        _wakeup.wait(ACCESS_FLUSH_S)
+        _wakeup.clear()
+        try:
+            flush()
+        except Exception as e:
+            print(f"[Access] Flush failed: {e}")
+
+def flush():
+    """Writes buffered access events and folds them into user profiles."""
+    with _flush_lock:
+        with _lock:
+            events = list(_pending)
+            _pending.clear()
+        if not events:
+            return 0
+
+        start = time.time()
+        try:
+            record_accesses([(item_id, weight, at) for item_id, _, weight, at in events])
+        except Exception:
+            # Put them back (ahead of anything queued since) for the next flush
+            with _lock:
+                _pending[:0] = events
+            raise
+
+        # Profile EMA, in access order, per user
+        opened = [(item_id, user_id) for item_id, user_id, _, _ in events if user_id]
+        vectors = get_item_vectors({item_id for item_id, _ in opened}) if opened else {}
+        touched = set()
+        for item_id, user_id in opened:
+            vec = vectors.get(item_id)
+            if vec is None:
+                continue
+            profile = get_profile(user_id)
+            if profile is None or profile.shape != vec.shape:
+                profile = vec.copy()
+            else:
+                profile = (1 - PROFILE_EMA_ALPHA) * profile + PROFILE_EMA_ALPHA * vec
+            with _profiles_lock:
+                _profiles[user_id] = profile
+            touched.add(user_id)
+        for user_id in touched:
+            save_user_profile(user_id, _profiles[user_id].tolist())
+
+        print(f"[Access] Flushed {len(events)} events, {len(touched)} profiles in {(time.time() - start) * 1000:.0f}ms")
+        return len(events)
+
+# Don't lose buffered opens on a clean shutdown
+atexit.register(flush)
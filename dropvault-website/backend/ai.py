@@ -1,17 +1,119 @@
 from sentence_transformers import SentenceTransformer
 import numpy as np
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from .database import get_cached_embeddings, put_cached_embeddings, evict_embedding_cache, count_embedding_cache
+
+MODEL_ID = "all-MiniLM-L6-v2"
 
 # Load Text-only model once (Force CPU to save VRAM for Vision/Whisper)
-print("Loading Text AI Model (all-MiniLM-L6-v2) on CPU...")
-text_model = SentenceTransformer("all-MiniLM-L6-v2", device="cpu")
+print(f"Loading Text AI Model ({MODEL_ID}) on CPU...")
+text_model = SentenceTransformer(MODEL_ID, device="cpu")
 print("AI Model Loaded.")
 
+# --- Embedding Cache ---
+# Persistent (SQLite) cache keyed by (model id, normalized text hash), fronted by a small
+# in-process LRU. Worker chunks, item edits, GitHub resyncs and reembed.py all go through it.
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "200000"))
+EMBED_CACHE_MEMORY_ENTRIES = 5000
+EMBED_CACHE_EVICT_EVERY = 1000  # Check the on-disk cap after this many new entries
+
+_memory_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+_writes_since_evict = 0
+
+def text_hash(text):
+    # Whitespace never changes the tokens, so it shouldn't change the key either
+    normalized = " ".join(str(text).split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def _remember(key, vector):
+    _memory_cache[key] = vector
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > EMBED_CACHE_MEMORY_ENTRIES:
+        _memory_cache.popitem(last=False)
+
+def generate_embeddings(texts):
+    """
+    Batch version of generate_embedding. Cached texts are served from the
+    cache; only the misses are encoded, in a single model call.
+    """
+    global _writes_since_evict
+    results = [None] * len(texts)
+    keys = {}
+    with _cache_lock:
+        for i, text in enumerate(texts):
+            if not text:
+                continue
+            key = text_hash(text)
+            if key in _memory_cache:
+                _memory_cache.move_to_end(key)
+                results[i] = _memory_cache[key]
+                _cache_stats["memory_hits"] += 1
+            else:
+                keys.setdefault(key, []).append(i)
+
+    if not keys:
+        return results
+
+    try:
+        found = get_cached_embeddings(MODEL_ID, keys.keys())
+    except Exception as e:
+        print(f"[Embed Cache] Lookup failed: {e}")
+        found = {}
+
+    missing = [key for key in keys if key not in found]
+    new_entries = {}
+    if missing:
+        vectors = text_model.encode([str(texts[keys[key][0]]) for key in missing])
+        new_entries = {key: vec.tolist() for key, vec in zip(missing, vectors)}
+
+    with _cache_lock:
+        for key, indices in keys.items():
+            vector = found.get(key) or new_entries[key]
+            _remember(key, vector)
+            for i in indices:
+                results[i] = vector
+        _cache_stats["disk_hits"] += sum(len(keys[key]) for key in found)
+        _cache_stats["misses"] += len(missing)
+        # Repeats of a missed text inside the same batch are encoded once
+        _cache_stats["memory_hits"] += sum(len(keys[key]) - 1 for key in missing)
+        _writes_since_evict += len(new_entries)
+        should_evict = _writes_since_evict >= EMBED_CACHE_EVICT_EVERY
+        if should_evict:
+            _writes_since_evict = 0
+
+    try:
+        put_cached_embeddings(MODEL_ID, new_entries)
+        if should_evict:
+            evicted = evict_embedding_cache(EMBED_CACHE_MAX_ENTRIES)
+            with _cache_lock:
+                _cache_stats["evictions"] += evicted
+    except Exception as e:
+        print(f"[Embed Cache] Store failed: {e}")
+
+    return results
+
 def generate_embedding(text):
     if not text:
         return None
-    text = str(text)
-    vector = text_model.encode(text)
-    return vector.tolist()
+    return generate_embeddings([str(text)])[0]
+
+def embedding_cache_stats():
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats["memory_entries"] = len(_memory_cache)
+    lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+    stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+    try:
+        stats["disk_entries"] = count_embedding_cache()
+    except Exception:
+        stats["disk_entries"] = None
+    stats["max_entries"] = EMBED_CACHE_MAX_ENTRIES
+    return stats
 
 def query_embedding(query):
     if not query:
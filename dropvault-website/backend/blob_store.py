@@ -0,0 +1,144 @@
+import os
+import re
+import glob
+import uuid
+import hashlib
+from .database import register_blob, release_blob_ref, collect_stale_blobs, get_blob, get_blob_by_path, get_blobs, move_blob
+from .media_utils import UPLOAD_DIR
+
+# Deduplicated store: one file per distinct content, shared by items. Files
+# get a random name (/uploads/blobs/<2 hex>/<32 hex><ext>) rather than their
+# hash, so a URL can't be computed from a copy of the file; the blobs table
+# maps content_hash -> file_path.
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+os.makedirs(BLOB_DIR, exist_ok=True)
+
+def blob_location(ext):
+    name = uuid.uuid4().hex
+    rel = f"blobs/{name[:2]}/{name}{ext}"
+    return os.path.join(UPLOAD_DIR, rel), f"/uploads/{rel}"
+
+def _full_path(file_url):
+    return os.path.join(UPLOAD_DIR, file_url.replace("/uploads/", "", 1))
+
+def blob_extension(filename):
+    ext = os.path.splitext(filename or "")[1].lower()
+    # Keep it filesystem/URL safe; mime detection only needs a sane suffix
+    return ext if re.fullmatch(r"\.[a-z0-9]{1,10}", ext) else ""
+
+def save_upload(fileobj, filename, block_size=1024 * 1024):
+    """
+    Streams an upload to disk while hashing it, then moves it into the blob
+    store. A duplicate keeps the existing blob and the temp copy is dropped.
+    Returns (content_hash, file_url, size).
+    """
+    tmp_path = os.path.join(BLOB_DIR, f"{uuid.uuid4().hex}.tmp")
+    h = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as out:
+            for block in iter(lambda: fileobj.read(block_size), b""):
+                h.update(block)
+                out.write(block)
+                size += len(block)
+    except Exception:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+
+    return commit_blob(tmp_path, h.hexdigest(), size, filename)
+
+def commit_blob(tmp_path, content_hash, size, filename):
+    """
+    Moves a fully written and hashed temp file into place and registers it.
+    """
+    existing = get_blob(content_hash)
+    if existing and os.path.exists(_full_path(existing['file_path'])):
+        os.remove(tmp_path)
+        print(f"[Blobs] Duplicate upload {content_hash[:12]} ({size} bytes)")
+        return content_hash, register_blob(content_hash, existing['file_path'], size), size
+
+    if existing:
+        # Row without its file (removed by hand): put the content back
+        full_path, file_url = _full_path(existing['file_path']), existing['file_path']
+    else:
+        full_path, file_url = blob_location(blob_extension(filename))
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    os.replace(tmp_path, full_path)
+    registered = register_blob(content_hash, file_url, size)
+    if registered != file_url:
+        # A concurrent upload of the same content registered first
+        os.remove(full_path)
+    return content_hash, registered, size
+
+def content_hash_from_path(file_path):
+    if not file_path or not file_path.startswith("/uploads/blobs/"):
+        return None
+    blob = get_blob_by_path(file_path)
+    return blob['content_hash'] if blob else None
+
+def rename_hashed_blobs():
+    """
+    Moves blobs stored under their content hash (the earlier naming) to a
+    random name, with their thumbnail and keyframes. Runs at startup.
+    """
+    moved = 0
+    for blob in get_blobs():
+        old_url = blob['file_path']
+        stem, ext = os.path.splitext(os.path.basename(old_url or ""))
+        if stem != blob['content_hash']:
+            continue
+        old_full = _full_path(old_url)
+        new_full, new_url = blob_location(ext)
+        old_name, new_name = os.path.basename(old_full), os.path.basename(new_full)
+        old_thumbs = os.path.join(os.path.dirname(old_full), "thumbnails")
+        new_thumbs = os.path.join(os.path.dirname(new_full), "thumbnails")
+        # The blob file, its thumbnail (<name>.jpg) and keyframes (<name>_<ms>.jpg)
+        files = [(old_full, new_full), (os.path.join(old_thumbs, f"{old_name}.jpg"), os.path.join(new_thumbs, f"{new_name}.jpg"))]
+        for path in glob.glob(glob.escape(os.path.join(old_thumbs, "keyframes", old_name)) + "_*.jpg"):
+            suffix = os.path.basename(path)[len(old_name):]
+            files.append((path, os.path.join(new_thumbs, "keyframes", new_name + suffix)))
+        thumb_urls = {f"{os.path.dirname(old_url)}/thumbnails/{old_name}.jpg": f"{os.path.dirname(new_url)}/thumbnails/{new_name}.jpg"}
+        done = []
+        try:
+            for src, dst in files:
+                if os.path.exists(src):
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    os.replace(src, dst)
+                    done.append((src, dst))
+            move_blob(blob['content_hash'], old_url, new_url, thumb_urls)
+            moved += 1
+        except Exception as e:
+            print(f"[Blobs] Could not rename {blob['content_hash'][:12]}: {e}")
+            for src, dst in done:
+                os.replace(dst, src)
+    if moved:
+        print(f"[Blobs] Renamed {moved} hash-named blobs")
+    return moved
+
+def release(content_hash):
+    """
+    Drops an item's reference; deletes the file when nothing uses it anymore.
+    """
+    blob = release_blob_ref(content_hash)
+    if blob:
+        _remove_files(blob)
+
+def collect_garbage():
+    """Deletes blobs uploaded but never referenced by an item within the grace period."""
+    blobs = collect_stale_blobs()
+    for blob in blobs:
+        _remove_files(blob)
+    return len(blobs)
+
+def _remove_files(blob):
+    full_path = _full_path(blob['file_path'])
+    thumb_dir = os.path.join(os.path.dirname(full_path), "thumbnails")
+    thumb_path = os.path.join(thumb_dir, f"{os.path.basename(full_path)}.jpg")
+    # Video keyframes (media_utils.extract_keyframes): <name>_<ms>.jpg
+    keyframes = glob.glob(glob.escape(os.path.join(thumb_dir, "keyframes", os.path.basename(full_path))) + "_*.jpg")
+    for path in [full_path, thumb_path] + keyframes:
+        try:
+            if os.path.exists(path): os.remove(path)
+        except OSError as e:
+            print(f"[Blobs] Could not remove {path}: {e}")
+    print(f"[Blobs] Released {blob['content_hash'][:12]}")
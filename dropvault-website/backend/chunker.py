@@ -1,3 +1,5 @@
+import zlib
+
 def split_text(text, max_words=300):
     """
     Splits text into chunks of at most max_words.
@@ -8,3 +10,56 @@ def split_text(text, max_words=300):
     words = text.split()
     for i in range(0, len(words), max_words):
         yield " ".join(words[i:i+max_words])
+
+def split_segments(segments, max_words=300):
+    """
+    Groups timestamped transcript segments into chunks of at most max_words.
+    Yields (text, start, end) so each chunk can deep-link into the recording.
+    """
+    if not segments:
+        return
+    buf, count, start, end = [], 0, None, None
+    for seg in segments:
+        n = len(seg["text"].split())
+        if buf and count + n > max_words:
+            yield " ".join(buf), start, end
+            buf, count, start = [], 0, None
+        if start is None:
+            start = seg["start"]
+        buf.append(seg["text"])
+        count += n
+        end = seg["end"]
+    if buf:
+        yield " ".join(buf), start, end
+
+def split_blocks(text, max_words=300):
+    """
+    Paragraph-aware chunking with content-defined boundaries, used for content
+    that is re-indexed incrementally. Paragraphs are packed up to max_words,
+    but a chunk always ends after an "anchor" paragraph (picked by a hash of its
+    text), so an edit only reshapes the chunks around it instead of shifting
+    every fixed-size window after it.
+    """
+    if not text:
+        return
+    buf, count = [], 0
+    for para in (p.strip() for p in text.split("\n\n")):
+        if not para:
+            continue
+        words = para.split()
+        if len(words) > max_words:
+            if buf:
+                yield "\n\n".join(buf)
+                buf, count = [], 0
+            yield from split_text(para, max_words)
+            continue
+        if buf and count + len(words) > max_words:
+            yield "\n\n".join(buf)
+            buf, count = [], 0
+        buf.append(para)
+        count += len(words)
+        if zlib.crc32(para.encode("utf-8")) % 4 == 0:
+            yield "\n\n".join(buf)
+            buf, count = [], 0
+    if buf:
+        yield "\n\n".join(buf)
@@ -1,6 +1,8 @@
 import sqlite3
 import json
 import os
+import time
+from datetime import datetime, timedelta
 
 DB_NAME = "dropvault.db"
 
@@ -80,8 +82,64 @@ def init_db():
     except sqlite3.OperationalError:
         c.execute("ALTER TABLE items ADD COLUMN last_accessed TIMESTAMP")
     
+    # Check if content_hash column exists (dedup of uploads), if not add it
+    try:
+        c.execute("SELECT content_hash FROM items LIMIT 1")
+    except sqlite3.OperationalError:
+        c.execute("ALTER TABLE items ADD COLUMN content_hash TEXT")
+    
+    # Media metadata captured once at ingest (served from the DB, no per-request stat)
+    for column, col_type in [("file_size", "INTEGER"), ("mime_type", "TEXT"), ("width", "INTEGER"), ("height", "INTEGER"), ("duration", "REAL")]:
+        try:
+            c.execute(f"SELECT {column} FROM items LIMIT 1")
+        except sqlite3.OperationalError:
+            c.execute(f"ALTER TABLE items ADD COLUMN {column} {col_type}")
+    
+    # Precomputed ranking prior (recency bucket + usage + decayed access frequency)
+    try:
+        c.execute("SELECT static_score, access_frequency FROM items LIMIT 1")
+    except sqlite3.OperationalError:
+        c.execute("ALTER TABLE items ADD COLUMN static_score REAL")
+        c.execute("ALTER TABLE items ADD COLUMN access_frequency REAL DEFAULT 0")
+    
     # Add index for faster queries
     c.execute("CREATE INDEX IF NOT EXISTS idx_user_id ON items(user_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_items_content_hash ON items(content_hash)")
+    # Keyset pagination of a user's items (newest first, id breaks created_at ties)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_items_user_created ON items(user_id, created_at DESC, id DESC)")
+
+    # Content-addressed upload store (one file per distinct upload, shared by items)
+    c.execute('''CREATE TABLE IF NOT EXISTS blobs
+                 (content_hash TEXT PRIMARY KEY,
+                  file_path TEXT,
+                  size INTEGER,
+                  ref_count INTEGER DEFAULT 0,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    # Last upload of the content (epoch seconds): holds a pending reference
+    # until an item is created from it, see BLOB_PENDING_GRACE_S
+    try:
+        c.execute("SELECT committed_at FROM blobs LIMIT 1")
+    except sqlite3.OperationalError:
+        c.execute("ALTER TABLE blobs ADD COLUMN committed_at REAL")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_blobs_file_path ON blobs(file_path)")
+
+    # Extraction outputs cached by content hash (duplicates clone instead of re-processing)
+    c.execute('''CREATE TABLE IF NOT EXISTS extraction_cache
+                 (content_hash TEXT PRIMARY KEY,
+                  outputs TEXT,
+                  content TEXT,
+                  embedding TEXT,
+                  thumbnail_path TEXT,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS extraction_cache_chunks
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  content_hash TEXT,
+                  type TEXT,
+                  text TEXT,
+                  embedding TEXT,
+                  start_time REAL,
+                  end_time REAL)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_extraction_cache_chunks_hash ON extraction_cache_chunks(content_hash)")
     
     # Chunking Table
     c.execute('''CREATE TABLE IF NOT EXISTS chunks
@@ -91,6 +149,20 @@ def init_db():
                   text TEXT,
                   embedding TEXT,
                   created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+    # Check if chunk timestamp columns exist (media deep-links), if not add them
+    try:
+        c.execute("SELECT start_time, end_time FROM chunks LIMIT 1")
+    except sqlite3.OperationalError:
+        c.execute("ALTER TABLE chunks ADD COLUMN start_time REAL")
+        c.execute("ALTER TABLE chunks ADD COLUMN end_time REAL")
+
+    # Check if text_hash column exists (incremental re-indexing), if not add it
+    try:
+        c.execute("SELECT text_hash FROM chunks LIMIT 1")
+    except sqlite3.OperationalError:
+        c.execute("ALTER TABLE chunks ADD COLUMN text_hash TEXT")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_chunks_item_id ON chunks(item_id)")
                   
     # User Profile Table (Personal Relevance)
     c.execute('''CREATE TABLE IF NOT EXISTS user_profile
@@ -98,6 +170,15 @@ def init_db():
                   embedding TEXT,
                   updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
 
+    # Embedding Cache (model id + normalized text hash -> vector)
+    c.execute('''CREATE TABLE IF NOT EXISTS embedding_cache
+                 (model_id TEXT,
+                  text_hash TEXT,
+                  embedding TEXT,
+                  last_used REAL,
+                  PRIMARY KEY (model_id, text_hash))''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache(last_used)")
+
     # Connected Accounts Table (OAuth Tokens)
     c.execute('''CREATE TABLE IF NOT EXISTS connected_accounts
                  (user_id TEXT,
@@ -109,6 +190,127 @@ def init_db():
                   last_synced_at TIMESTAMP,
                   PRIMARY KEY (user_id, provider))''')
                   
+    # GitHub sync watermarks + ETags (conditional, incremental sync)
+    c.execute('''CREATE TABLE IF NOT EXISTS github_repo_state
+                 (user_id TEXT,
+                  repo_id INTEGER,
+                  full_name TEXT,
+                  pushed_at TEXT,
+                  updated_at TEXT,
+                  readme_etag TEXT,
+                  readme TEXT,
+                  commits_etag TEXT,
+                  commits TEXT,
+                  synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  PRIMARY KEY (user_id, repo_id))''')
+    c.execute('''CREATE TABLE IF NOT EXISTS github_page_cache
+                 (user_id TEXT,
+                  url TEXT,
+                  etag TEXT,
+                  body TEXT,
+                  PRIMARY KEY (user_id, url))''')
+
+    # YouTube metadata, shared across users and keyed by canonical video id
+    c.execute('''CREATE TABLE IF NOT EXISTS youtube_meta_cache
+                 (video_id TEXT PRIMARY KEY,
+                  info TEXT,
+                  source TEXT,
+                  fetched_at REAL)''')
+
+    # Normalized tags (items.tags stays the display string). Kept in sync by
+    # index_item_tags on write; per-user counts are maintained by triggers.
+    c.execute('''CREATE TABLE IF NOT EXISTS item_tags
+                 (item_id INTEGER,
+                  user_id TEXT,
+                  tag TEXT COLLATE NOCASE,
+                  PRIMARY KEY (item_id, tag))''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_item_tags_user_tag ON item_tags(user_id, tag, item_id)")
+    c.execute('''CREATE TABLE IF NOT EXISTS tag_counts
+                 (user_id TEXT,
+                  tag TEXT COLLATE NOCASE,
+                  count INTEGER DEFAULT 0,
+                  PRIMARY KEY (user_id, tag))''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_tag_counts_user_count ON tag_counts(user_id, count DESC)")
+    c.execute('''CREATE TRIGGER IF NOT EXISTS item_tags_count_insert AFTER INSERT ON item_tags
+                 BEGIN
+                     INSERT OR IGNORE INTO tag_counts (user_id, tag, count) VALUES (new.user_id, new.tag, 0);
+                     UPDATE tag_counts SET count = count + 1 WHERE user_id = new.user_id AND tag = new.tag;
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS item_tags_count_delete AFTER DELETE ON item_tags
+                 BEGIN
+                     UPDATE tag_counts SET count = count - 1 WHERE user_id = old.user_id AND tag = old.tag;
+                     DELETE FROM tag_counts WHERE user_id = old.user_id AND tag = old.tag AND count <= 0;
+                 END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS items_delete_tags AFTER DELETE ON items
+                 BEGIN
+                     DELETE FROM item_tags WHERE item_id = old.id;
+                 END''')
+
+    # Per-user search index generation: bumped by triggers on anything the
+    # in-memory search index (search_index.py) is built from, so a search
+    # only has to compare one integer to know its arrays are current.
+    # Items without an owner count under '' (a NULL key never conflicts).
+    c.execute('''CREATE TABLE IF NOT EXISTS index_generation
+                 (user_id TEXT PRIMARY KEY,
+                  generation INTEGER DEFAULT 0)''')
+    c.execute("DELETE FROM index_generation WHERE user_id IS NULL")
+    bump = '''INSERT OR IGNORE INTO index_generation (user_id, generation) VALUES (COALESCE({user}, ''), 0);
+              UPDATE index_generation SET generation = generation + 1 WHERE user_id = COALESCE({user}, '');'''
+    chunk_user = "(SELECT user_id FROM items WHERE id = {}.item_id)"
+    for name, event, user in [
+        ("chunks_insert_gen", "AFTER INSERT ON chunks", chunk_user.format("new")),
+        ("chunks_delete_gen", "AFTER DELETE ON chunks", chunk_user.format("old")),
+        ("chunks_update_gen", "AFTER UPDATE OF embedding, text, type, item_id ON chunks", chunk_user.format("new")),
+        ("items_update_gen", "AFTER UPDATE OF type, created_at, title, user_id ON items", "new.user_id"),
+        ("items_delete_gen", "AFTER DELETE ON items", "old.user_id"),
+        ("item_tags_insert_gen", "AFTER INSERT ON item_tags", "new.user_id"),
+        ("item_tags_delete_gen", "AFTER DELETE ON item_tags", "old.user_id"),
+    ]:
+        c.execute(f"DROP TRIGGER IF EXISTS {name}")
+        c.execute(f"CREATE TRIGGER {name} {event} BEGIN {bump.format(user=user)} END")
+
+    # Delta log for on-disk search index snapshots: which chunks / items changed
+    # since a snapshot, so a loaded snapshot is caught up by re-reading only
+    # those rows. chunk_id is NULL for item-level changes (metadata, tags,
+    # deletes). Entries up to a user's snapshot are dropped on compaction.
+    c.execute('''CREATE TABLE IF NOT EXISTS index_log
+                 (seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                  user_id TEXT,
+                  item_id INTEGER,
+                  chunk_id INTEGER)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_index_log_user ON index_log(user_id, seq)")
+    log = "INSERT INTO index_log (user_id, item_id, chunk_id) VALUES ({user}, {item}, {chunk});"
+    for name, event, user, item, chunk in [
+        ("chunks_insert_log", "AFTER INSERT ON chunks", chunk_user.format("new"), "new.item_id", "new.id"),
+        ("chunks_delete_log", "AFTER DELETE ON chunks", chunk_user.format("old"), "old.item_id", "old.id"),
+        ("chunks_update_log", "AFTER UPDATE OF embedding, text, type, item_id ON chunks", chunk_user.format("new"), "new.item_id", "new.id"),
+        ("items_update_log", "AFTER UPDATE OF type, created_at, title, user_id ON items", "new.user_id", "new.id", "NULL"),
+        ("items_delete_log", "AFTER DELETE ON items", "old.user_id", "old.id", "NULL"),
+        ("item_tags_insert_log", "AFTER INSERT ON item_tags", "new.user_id", "new.item_id", "NULL"),
+        ("item_tags_delete_log", "AFTER DELETE ON item_tags", "old.user_id", "old.item_id", "NULL"),
+    ]:
+        c.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {log.format(user=user, item=item, chunk=chunk)} END")
+
+    # Backfill the tag index the first time it exists
+    if c.execute("SELECT 1 FROM item_tags LIMIT 1").fetchone() is None:
+        rows = c.execute("SELECT id, user_id, tags FROM items WHERE tags IS NOT NULL AND tags != ''").fetchall()
+        for item_id, user_id, tags in rows:
+            index_item_tags(c, item_id, user_id, tags)
+        if rows:
+            print(f"[DB] Indexed tags for {len(rows)} items")
+
+    # Resumable uploads in progress (bytes live in blobs/<id>.part until finalized)
+    c.execute('''CREATE TABLE IF NOT EXISTS upload_sessions
+                 (id TEXT PRIMARY KEY,
+                  user_id TEXT,
+                  filename TEXT,
+                  mime_type TEXT,
+                  size INTEGER,
+                  offset INTEGER DEFAULT 0,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_upload_sessions_user ON upload_sessions(user_id, updated_at)")
+
     # Check if last_synced_at exists (migration)
     try:
         c.execute("SELECT last_synced_at FROM connected_accounts LIMIT 1")
@@ -119,6 +321,34 @@ def init_db():
     conn.close()
     return db_path
 
+def split_tags(tags):
+    """Comma-separated tag string -> list of distinct tags (case-insensitive, order kept)."""
+    result = []
+    seen = set()
+    for tag in (tags or "").split(","):
+        tag = tag.strip()
+        if tag and tag.lower() not in seen:
+            seen.add(tag.lower())
+            result.append(tag)
+    return result
+
+def index_item_tags(c, item_id, user_id, tags):
+    """
+    Syncs item_tags for one item inside the caller's transaction. Only the
+    difference is written so tag_counts triggers don't churn.
+    """
+    if not user_id:
+        return
+    wanted = {t.lower(): t for t in split_tags(tags)}
+    c.execute("SELECT tag FROM item_tags WHERE item_id = ?", (item_id,))
+    existing = {row[0].lower() for row in c.fetchall()}
+    removed = existing - set(wanted)
+    if removed:
+        placeholders = ", ".join(["?"] * len(removed))
+        c.execute(f"DELETE FROM item_tags WHERE item_id = ? AND tag IN ({placeholders})", (item_id, *removed))
+    c.executemany("INSERT OR IGNORE INTO item_tags (item_id, user_id, tag) VALUES (?, ?, ?)",
+                  [(item_id, user_id, wanted[key]) for key in wanted if key not in existing])
+
 def get_db_path():
     base_dir = os.path.dirname(os.path.abspath(__file__))
     return os.path.join(base_dir, DB_NAME)
@@ -134,38 +364,9 @@ def get_user_profile(user_id):
         return json.loads(row['embedding'])
     return None
 
-def update_user_profile(user_id):
-    """
-    Computes a user profile vector by averaging embeddings of the last 20 accessed chunks.
-    """
+def save_user_profile(user_id, vector):
     conn = sqlite3.connect(get_db_path())
-    conn.row_factory = sqlite3.Row
     c = conn.cursor()
-    
-    # Get last 20 accessed chunks for this user
-    c.execute("""
-        SELECT c.embedding 
-        FROM chunks c
-        JOIN items i ON c.item_id = i.id
-        WHERE i.user_id = ? AND i.last_accessed IS NOT NULL
-        ORDER BY i.last_accessed DESC
-        LIMIT 20
-    """, (user_id,))
-    
-    rows = c.fetchall()
-    if not rows:
-        conn.close()
-        return
-
-    import numpy as np
-    embeddings = [json.loads(r['embedding']) for r in rows if r['embedding']]
-    if not embeddings:
-        conn.close()
-        return
-        
-    avg_vec = np.mean(np.array(embeddings), axis=0).tolist()
-    
-    from datetime import datetime
     c.execute("""
         INSERT INTO user_profile (user_id, embedding, updated_at)
         VALUES (?, ?, ?)
@@ -173,79 +374,378 @@ def update_user_profile(user_id):
         DO UPDATE SET
             embedding = excluded.embedding,
             updated_at = excluded.updated_at
-    """, (user_id, json.dumps(avg_vec), datetime.utcnow()))
-    
+    """, (user_id, json.dumps(vector), datetime.utcnow()))
     conn.commit()
     conn.close()
 
-def record_access(item_id, weight=1):
+def get_item_vectors(item_ids):
+    """{item_id: mean of its chunk embeddings} for items that have any."""
+    import numpy as np
+    item_ids = list(item_ids)
     conn = sqlite3.connect(get_db_path())
     c = conn.cursor()
-    from datetime import datetime
-    c.execute("""
+    grouped = {}
+    for start in range(0, len(item_ids), 500):
+        batch = item_ids[start:start + 500]
+        c.execute(f"SELECT item_id, embedding FROM chunks WHERE embedding IS NOT NULL AND item_id IN ({', '.join(['?'] * len(batch))})", tuple(batch))
+        for item_id, embedding in c.fetchall():
+            try:
+                grouped.setdefault(item_id, []).append(json.loads(embedding))
+            except ValueError:
+                continue
+    conn.close()
+    vectors = {}
+    for item_id, embeddings in grouped.items():
+        # Chunks from an older model (different width) are left out
+        width = len(embeddings[-1])
+        same = [e for e in embeddings if len(e) == width]
+        vectors[item_id] = np.mean(np.array(same, dtype=np.float32), axis=0)
+    return vectors
+
+# Static prior: search adds items.static_score instead of recomputing
+# recency/usage boosts per candidate. Recency buckets move at day boundaries,
+# so refresh_static_scores re-buckets recent items periodically.
+ACCESS_FREQUENCY_HALF_LIFE_DAYS = float(os.getenv("ACCESS_FREQUENCY_HALF_LIFE_DAYS", "14"))
+ACCESS_FREQUENCY_WEIGHT = float(os.getenv("ACCESS_FREQUENCY_WEIGHT", "0"))   # Off by default (keeps ranking as before)
+ACCESS_FREQUENCY_CAP = 10.0
+
+def _parse_db_time(value):
+    try:
+        return datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return None
+
+def decayed_frequency(frequency, last_accessed, now_utc):
+    """Access frequency as of now_utc (stored value is as of last_accessed)."""
+    last = _parse_db_time(last_accessed)
+    if not frequency or last is None:
+        return 0.0
+    age_days = max(0.0, (now_utc - last).total_seconds() / 86400)
+    return frequency * 0.5 ** (age_days / ACCESS_FREQUENCY_HALF_LIFE_DAYS)
+
+def compute_static_score(created_at, access_count, frequency=0.0, now=None):
+    """
+    Recency bucket (+0.05 under 7 days old, +0.02 under 30) + usage bucket
+    (+0.03 / 0.05 / 0.07 at 3 / 10 / 20 opens) + weighted access frequency.
+    created_at=None means the item was just created.
+    """
+    score = 0.0
+    created = datetime.now() if created_at is None else _parse_db_time(created_at)
+    if created is not None:
+        days_old = ((now or datetime.now()) - created).days
+        if days_old < 7: score += 0.05
+        elif days_old < 30: score += 0.02
+    if access_count:
+        if access_count >= 20: score += 0.07
+        elif access_count >= 10: score += 0.05
+        elif access_count >= 3: score += 0.03
+    if ACCESS_FREQUENCY_WEIGHT and frequency:
+        score += ACCESS_FREQUENCY_WEIGHT * min(frequency, ACCESS_FREQUENCY_CAP) / ACCESS_FREQUENCY_CAP
+    return score
+
+def record_accesses(events):
+    """
+    Applies a batch of access events [(item_id, weight, accessed_at utc or
+    None)] in one transaction: counts, last_accessed, decayed frequency and
+    static_score per item.
+    """
+    now_utc = datetime.utcnow()
+    per_item = {}
+    for item_id, weight, accessed_at in events:
+        total, last = per_item.get(item_id, (0, None))
+        at = accessed_at or now_utc
+        per_item[item_id] = (total + weight, at if last is None or at > last else last)
+    if not per_item:
+        return
+
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    ids = list(per_item)
+    rows = []
+    for start in range(0, len(ids), 500):
+        batch = ids[start:start + 500]
+        c.execute(f"SELECT id, created_at, access_count, access_frequency, last_accessed FROM items WHERE id IN ({', '.join(['?'] * len(batch))})", tuple(batch))
+        rows.extend(c.fetchall())
+
+    updates = []
+    for item_id, created_at, access_count, frequency, last_accessed in rows:
+        weight, accessed_at = per_item[item_id]
+        access_count = (access_count or 0) + weight
+        frequency = decayed_frequency(frequency, last_accessed, accessed_at) + weight
+        updates.append((access_count, accessed_at, frequency, compute_static_score(created_at, access_count, frequency), item_id))
+    c.executemany("""
         UPDATE items
-        SET access_count = access_count + ?,
-            last_accessed = ?
+        SET access_count = ?,
+            last_accessed = ?,
+            access_frequency = ?,
+            static_score = ?
         WHERE id = ?
-    """, (weight, datetime.utcnow(), item_id))
+    """, updates)
+    conn.commit()
+    conn.close()
+
+def refresh_static_scores(full=False):
+    """
+    Recomputes static_score where it can have moved without an access:
+    items still inside a recency bucket (or just leaving one), items with a
+    decaying access frequency, and items never scored. full=True rescores
+    everything (startup, when the process may have been down for days).
+    Returns rows changed.
+    """
+    now = datetime.now()
+    now_utc = datetime.utcnow()
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    # 31 days: one day of slack so an item leaving the 30-day bucket is caught
+    recent_cutoff = (now - timedelta(days=31)).strftime("%Y-%m-%d %H:%M:%S")
+    query = "SELECT id, created_at, access_count, access_frequency, last_accessed, static_score FROM items WHERE static_score IS NULL OR created_at >= ?"
+    params = [recent_cutoff]
+    if ACCESS_FREQUENCY_WEIGHT:
+        query += " OR access_frequency > 0"
+    if full:
+        query, params = "SELECT id, created_at, access_count, access_frequency, last_accessed, static_score FROM items", []
+    c.execute(query, tuple(params))
+    updates = []
+    for item_id, created_at, access_count, frequency, last_accessed, old_score in c.fetchall():
+        score = compute_static_score(created_at, access_count, decayed_frequency(frequency, last_accessed, now_utc), now)
+        if old_score is None or abs(score - old_score) > 1e-9:
+            updates.append((score, item_id, access_count, last_accessed))
+    # Only write rows no access flush touched since the SELECT; a concurrent
+    # record_accesses already stored a newer score and wins.
+    c.executemany("UPDATE items SET static_score = ? WHERE id = ? AND access_count IS ? AND last_accessed IS ?", updates)
+    changed = c.rowcount
     conn.commit()
     conn.close()
+    return changed
 
-def insert_chunk(item_id, type, text, embedding):
+def insert_chunk(item_id, type, text, embedding, start_time=None, end_time=None):
     conn = sqlite3.connect(get_db_path())
     c = conn.cursor()
     embedding_json = json.dumps(embedding) if embedding else None
-    c.execute("INSERT INTO chunks (item_id, type, text, embedding) VALUES (?, ?, ?, ?)", (item_id, type, text, embedding_json))
+    c.execute("INSERT INTO chunks (item_id, type, text, embedding, start_time, end_time) VALUES (?, ?, ?, ?, ?, ?)", (item_id, type, text, embedding_json, start_time, end_time))
     conn.commit()
     conn.close()
 
-def delete_chunks(item_id):
+def delete_chunks(item_id, chunk_type=None):
     conn = sqlite3.connect(get_db_path())
     c = conn.cursor()
-    c.execute("DELETE FROM chunks WHERE item_id = ?", (item_id,))
+    if chunk_type:
+        c.execute("DELETE FROM chunks WHERE item_id = ? AND type = ?", (item_id, chunk_type))
+    else:
+        c.execute("DELETE FROM chunks WHERE item_id = ?", (item_id,))
     conn.commit()
     conn.close()
 
-def get_all_chunks(user_id=None):
+def get_chunk_rows(item_id, chunk_type):
+    conn = sqlite3.connect(get_db_path())
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute("SELECT id, text, text_hash FROM chunks WHERE item_id = ? AND type = ? ORDER BY id", (item_id, chunk_type))
+    rows = c.fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+def apply_chunk_diff(item_id, chunk_type, delete_ids, new_chunks):
+    """
+    Applies an incremental re-index in one transaction.
+    new_chunks: list of (text, text_hash, embedding)
+    """
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    if delete_ids:
+        c.executemany("DELETE FROM chunks WHERE id = ?", [(cid,) for cid in delete_ids])
+    c.executemany("INSERT INTO chunks (item_id, type, text, embedding, text_hash) VALUES (?, ?, ?, ?, ?)",
+                  [(item_id, chunk_type, text, json.dumps(emb) if emb else None, h) for text, h, emb in new_chunks])
+    conn.commit()
+    conn.close()
+
+def get_all_chunks(user_id=None, item_ids=None, chunk_ids=None):
+    """
+    Chunks joined with their item's metadata. Passing item_ids and/or
+    chunk_ids restricts to chunks of those items or with those ids (used to
+    catch a search index snapshot up with index_log).
+    """
     conn = sqlite3.connect(get_db_path())
     conn.row_factory = sqlite3.Row
     c = conn.cursor()
     
     # Join with items to get user_id and item metadata for filtering
     query = """
-        SELECT c.id, c.item_id, c.type as chunk_type, c.text, c.embedding, 
+        SELECT c.id, c.item_id, c.type as chunk_type, c.text, c.embedding, c.start_time, c.end_time,
                i.user_id, i.type as item_type, i.created_at, i.title, i.tags
         FROM chunks c
         JOIN items i ON c.item_id = i.id
     """
+    conditions = []
     params = []
     
     if user_id:
-        query += " WHERE i.user_id = ?"
+        conditions.append("i.user_id = ?")
         params.append(user_id)
+    if item_ids is not None or chunk_ids is not None:
+        item_ids, chunk_ids = list(item_ids or []), list(chunk_ids or [])
+        if not item_ids and not chunk_ids:
+            conn.close()
+            return []
+        subset = []
+        if item_ids:
+            subset.append(f"c.item_id IN ({', '.join(['?'] * len(item_ids))})")
+            params.extend(item_ids)
+        if chunk_ids:
+            subset.append(f"c.id IN ({', '.join(['?'] * len(chunk_ids))})")
+            params.extend(chunk_ids)
+        conditions.append("(" + " OR ".join(subset) + ")")
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY c.id"
         
     c.execute(query, tuple(params))
     rows = c.fetchall()
     conn.close()
     return [dict(row) for row in rows]
 
-def add_item(title, type, content, notes, file_path, embedding, tags="", user_id=None, thumbnail_path=None, status="completed", progress_stage="done", progress_percent=100, progress_message=""):
+def get_chunk_payloads(chunk_ids):
+    """{chunk_id: {text, chunk_type, title, start_time, end_time}} for the given chunks."""
+    conn = sqlite3.connect(get_db_path())
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    payloads = {}
+    for start in range(0, len(chunk_ids), 500):
+        batch = chunk_ids[start:start + 500]
+        c.execute(f"""SELECT c.id, c.text, c.type as chunk_type, c.start_time, c.end_time, i.title
+                      FROM chunks c JOIN items i ON c.item_id = i.id
+                      WHERE c.id IN ({', '.join(['?'] * len(batch))})""", tuple(batch))
+        for row in c.fetchall():
+            payloads[row['id']] = dict(row)
+    conn.close()
+    return payloads
+
+def get_chunk_embeddings(chunk_ids):
+    """{chunk_id: embedding list} for the given chunks."""
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    vectors = {}
+    for start in range(0, len(chunk_ids), 500):
+        batch = chunk_ids[start:start + 500]
+        c.execute(f"SELECT id, embedding FROM chunks WHERE embedding IS NOT NULL AND id IN ({', '.join(['?'] * len(batch))})", tuple(batch))
+        for chunk_id, embedding in c.fetchall():
+            try:
+                vectors[chunk_id] = json.loads(embedding)
+            except ValueError:
+                continue
+    conn.close()
+    return vectors
+
+def get_index_generation(user_id):
+    """
+    The user's index generation. Without a user_id the index covers every
+    chunk (get_all_chunks(None)), so any user's write moves it.
+    """
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    if user_id:
+        c.execute("SELECT generation FROM index_generation WHERE user_id = ?", (user_id,))
+    else:
+        c.execute("SELECT COALESCE(SUM(generation), 0) FROM index_generation")
+    row = c.fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+def get_user_item_tags(user_id, item_ids=None):
+    """(item_id, tag) pairs for a user (optionally only some items), tags lowercased."""
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    if item_ids is None:
+        c.execute("SELECT item_id, lower(tag) FROM item_tags WHERE user_id = ?", (user_id,))
+        rows = c.fetchall()
+    else:
+        item_ids = list(item_ids)
+        rows = []
+        for start in range(0, len(item_ids), 500):
+            batch = item_ids[start:start + 500]
+            c.execute(f"SELECT item_id, lower(tag) FROM item_tags WHERE user_id = ? AND item_id IN ({', '.join(['?'] * len(batch))})",
+                      (user_id, *batch))
+            rows.extend(c.fetchall())
+    conn.close()
+    return rows
+
+def get_index_log_seq():
+    """Highest index_log seq ever issued (0 if none); never goes back after truncation."""
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    c.execute("SELECT seq FROM sqlite_sequence WHERE name = 'index_log'")
+    row = c.fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+def get_index_log(user_id, after_seq):
+    """(seq, item_id, chunk_id) entries for a user after after_seq, oldest first."""
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    c.execute("SELECT seq, item_id, chunk_id FROM index_log WHERE user_id = ? AND seq > ? ORDER BY seq", (user_id, after_seq))
+    rows = c.fetchall()
+    conn.close()
+    return rows
+
+def get_index_log_users():
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    c.execute("SELECT DISTINCT user_id FROM index_log")
+    rows = c.fetchall()
+    conn.close()
+    return [row[0] for row in rows]
+
+def truncate_index_log(user_id, upto_seq):
+    """Drops a user's index_log entries up to upto_seq (already in their snapshot)."""
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    c.execute("DELETE FROM index_log WHERE user_id IS ? AND seq <= ?", (user_id, upto_seq))
+    conn.commit()
+    conn.close()
+
+def add_item(title, type, content, notes, file_path, embedding, tags="", user_id=None, thumbnail_path=None, status="completed", progress_stage="done", progress_percent=100, progress_message="", content_hash=None, file_size=None, mime_type=None):
     conn = sqlite3.connect(get_db_path())
     c = conn.cursor()
     embedding_json = json.dumps(embedding) if embedding else None
-    c.execute("INSERT INTO items (title, type, content, notes, file_path, embedding, tags, user_id, thumbnail_path, status, progress_stage, progress_percent, progress_message) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-              (title, type, content, notes, file_path, embedding_json, tags, user_id, thumbnail_path, status, progress_stage, progress_percent, progress_message))
+    c.execute("INSERT INTO items (title, type, content, notes, file_path, embedding, tags, user_id, thumbnail_path, status, progress_stage, progress_percent, progress_message, content_hash, file_size, mime_type, static_score) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+              (title, type, content, notes, file_path, embedding_json, tags, user_id, thumbnail_path, status, progress_stage, progress_percent, progress_message, content_hash, file_size, mime_type, compute_static_score(None, 0)))
     item_id = c.lastrowid
+    index_item_tags(c, item_id, user_id, tags)
+    if content_hash:
+        # Each item referencing a blob holds one reference
+        c.execute("UPDATE blobs SET ref_count = ref_count + 1 WHERE content_hash = ?", (content_hash,))
     conn.commit()
     conn.close()
     return item_id
 
-def get_all_items(user_id=None, limit=None, offset=None, item_type=None):
+def update_item_media(item_id, media):
+    """
+    Stores probed media metadata (file_size, mime_type, width, height, duration).
+    """
+    columns = [key for key in ("file_size", "mime_type", "width", "height", "duration") if media.get(key) is not None]
+    if not columns:
+        return
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    c.execute(f"UPDATE items SET {', '.join(f'{col} = ?' for col in columns)} WHERE id = ?",
+              [media[col] for col in columns] + [item_id])
+    conn.commit()
+    conn.close()
+
+# Indexed lookup on item_tags (replaces tags LIKE '%github%')
+GITHUB_TAGGED = "EXISTS (SELECT 1 FROM item_tags t WHERE t.item_id = items.id AND t.tag = 'github')"
+
+def get_all_items(user_id=None, limit=None, offset=None, item_type=None, cursor=None):
+    """
+    List view of a user's items, newest first. Pass `cursor` as the
+    (created_at, id) of the last row seen to page without OFFSET.
+    """
     conn = sqlite3.connect(get_db_path())
     conn.row_factory = sqlite3.Row
     c = conn.cursor()
     
-    fields = "id, title, type, content, notes, file_path, created_at, tags, user_id, thumbnail_path, status, progress_stage, progress_percent, progress_message, access_count, last_accessed"
+    # Content/notes are trimmed in SQL so large OCR text never leaves SQLite
+    fields = "id, title, type, substr(COALESCE(content, ''), 1, 1000) AS content, substr(COALESCE(notes, ''), 1, 1000) AS notes, file_path, created_at, tags, user_id, thumbnail_path, status, progress_stage, progress_percent, progress_message, access_count, last_accessed, COALESCE(file_size, 0) AS file_size, mime_type, width, height, duration"
     query = f"SELECT {fields} FROM items WHERE user_id = ?"
     params = [user_id]
     
@@ -253,20 +753,24 @@ def get_all_items(user_id=None, limit=None, offset=None, item_type=None):
         if item_type == "DOCS":
             query += " AND (type = 'pdf' OR type = 'file')"
         elif item_type == "LINKS":
-            query += " AND (type = 'link' OR type = 'article') AND (tags NOT LIKE '%github%' OR tags IS NULL)"
+            query += f" AND (type = 'link' OR type = 'article') AND NOT {GITHUB_TAGGED}"
         elif item_type == "YOUTUBE":
             query += " AND type = 'video'"
         elif item_type == "GITHUB":
-            query += " AND tags LIKE '%github%'"
+            query += f" AND {GITHUB_TAGGED}"
         else:
             query += " AND type = ?"
             params.append(item_type.lower())
     elif item_type == "ALL" or item_type is None:
         # Exclude GitHub items from "ALL" view
-        query += " AND (tags NOT LIKE '%github%' OR tags IS NULL)"
+        query += f" AND NOT {GITHUB_TAGGED}"
+    
+    if cursor:
+        query += " AND (created_at < ? OR (created_at = ? AND id < ?))"
+        params.extend([cursor[0], cursor[0], cursor[1]])
     
     if user_id:
-        query += " ORDER BY created_at DESC"
+        query += " ORDER BY created_at DESC, id DESC"
         if limit is not None:
             query += " LIMIT ?"
             params.append(limit)
@@ -281,22 +785,13 @@ def get_all_items(user_id=None, limit=None, offset=None, item_type=None):
         return []
         
     conn.close()
-    
-    # Truncate content for list view to prevent huge payloads
-    results = []
-    for row in rows:
-        item = dict(row)
-        item['content'] = item['content'][:1000] if item['content'] else ""
-        item['notes'] = item['notes'][:1000] if item['notes'] else ""
-        results.append(item)
-        
-    return results
+    return [dict(row) for row in rows]
 
 def get_item(item_id, user_id=None):
     conn = sqlite3.connect(get_db_path())
     conn.row_factory = sqlite3.Row
     c = conn.cursor()
-    fields = "id, title, type, content, notes, file_path, created_at, tags, user_id, thumbnail_path, status, progress_stage, progress_percent, progress_message, access_count, last_accessed"
+    fields = "id, title, type, content, notes, file_path, created_at, tags, user_id, thumbnail_path, status, progress_stage, progress_percent, progress_message, access_count, last_accessed, COALESCE(file_size, 0) AS file_size, mime_type, width, height, duration"
     if user_id:
         c.execute(f"SELECT {fields} FROM items WHERE id = ? AND user_id = ?", (item_id, user_id))
     else:
@@ -305,6 +800,29 @@ def get_item(item_id, user_id=None):
     conn.close()
     return dict(row) if row else None
 
+def get_items_by_ids(item_ids, user_id=None, fields=None):
+    """Batch get_item: {id: item} for the ids that exist (and belong to user_id)."""
+    fields = fields or "id, title, type, content, notes, file_path, created_at, tags, user_id, thumbnail_path, status, progress_stage, progress_percent, progress_message, access_count, last_accessed, COALESCE(file_size, 0) AS file_size, mime_type, width, height, duration"
+    item_ids = list(item_ids)
+    conn = sqlite3.connect(get_db_path())
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    items = {}
+    # Batched to stay under SQLite's bound-parameter limit
+    for start in range(0, len(item_ids), 500):
+        batch = item_ids[start:start + 500]
+        placeholders = ", ".join(["?"] * len(batch))
+        query = f"SELECT {fields} FROM items WHERE id IN ({placeholders})"
+        params = list(batch)
+        if user_id:
+            query += " AND user_id = ?"
+            params.append(user_id)
+        c.execute(query, tuple(params))
+        for row in c.fetchall():
+            items[row['id']] = dict(row)
+    conn.close()
+    return items
+
 def get_item_by_path(user_id, file_path):
     conn = sqlite3.connect(get_db_path())
     conn.row_factory = sqlite3.Row
@@ -394,6 +912,9 @@ def update_item(item_id, title, content, tags, embedding=None, user_id=None, sta
         params.append(user_id)
 
     c.execute(query, tuple(params))
+    if tags is not None and c.rowcount:
+        c.execute("SELECT user_id FROM items WHERE id = ?", (item_id,))
+        index_item_tags(c, item_id, c.fetchone()[0], tags)
     conn.commit()
     conn.close()
 
@@ -420,34 +941,52 @@ def delete_items(item_ids, user_id=None):
 
 def get_all_tags(user_id):
     conn = sqlite3.connect(get_db_path())
-    conn.row_factory = sqlite3.Row
     c = conn.cursor()
-    c.execute("SELECT tags FROM items WHERE user_id = ? AND tags IS NOT NULL AND tags != ''", (user_id,))
+    # OPTIMIZATION: counts are maintained on write, no re-count of every item
+    c.execute("SELECT tag, count FROM tag_counts WHERE user_id = ? AND count > 0 ORDER BY count DESC, tag", (user_id,))
     rows = c.fetchall()
     conn.close()
+    return [{"text": tag, "value": count} for tag, count in rows]
 
-    tag_counts = {}
-    for row in rows:
-        tags_str = row['tags']
-        if tags_str:
-            for tag in tags_str.split(','):
-                cleaned_tag = tag.strip()
-                if cleaned_tag:
-                    tag_counts[cleaned_tag] = tag_counts.get(cleaned_tag, 0) + 1
-    
-    sorted_tags = sorted(
-        [{"text": tag, "value": count} for tag, count in tag_counts.items()], 
-        key=lambda x: x['value'], 
-        reverse=True
-    )
-    return sorted_tags
+def suggest_tags(user_id, prefix, limit=10):
+    """Tag autocomplete: the user's most used tags starting with prefix."""
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    # Range scan on the (user_id, tag) primary key; NOCASE makes it case-insensitive
+    c.execute("""
+        SELECT tag, count FROM tag_counts
+        WHERE user_id = ? AND tag >= ? AND tag < ? AND count > 0
+        ORDER BY count DESC, tag
+        LIMIT ?
+    """, (user_id, prefix, prefix + "\U0010ffff", limit))
+    rows = c.fetchall()
+    conn.close()
+    return [{"text": tag, "value": count} for tag, count in rows]
+
+def get_item_ids_by_tags(user_id, tags, match_any=False):
+    """Ids of the user's items carrying all (or, with match_any, any) of the tags."""
+    tags = split_tags(",".join(tags))
+    if not tags:
+        return set()
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    placeholders = ", ".join(["?"] * len(tags))
+    query = f"SELECT item_id FROM item_tags WHERE user_id = ? AND tag IN ({placeholders}) GROUP BY item_id"
+    params = [user_id, *tags]
+    if not match_any:
+        query += " HAVING COUNT(*) = ?"
+        params.append(len(tags))
+    c.execute(query, tuple(params))
+    ids = {row[0] for row in c.fetchall()}
+    conn.close()
+    return ids
 
 def get_processing_items(user_id=None):
     conn = sqlite3.connect(get_db_path())
     conn.row_factory = sqlite3.Row
     c = conn.cursor()
     
-    query = "SELECT id, title, type, content, notes, file_path, embedding, created_at, tags, user_id, thumbnail_path, status, progress_stage, progress_percent, progress_message FROM items WHERE status IN ('pending', 'processing')"
+    query = "SELECT id, title, type, content, notes, file_path, embedding, created_at, tags, user_id, thumbnail_path, status, progress_stage, progress_percent, progress_message, content_hash FROM items WHERE status IN ('pending', 'processing')"
     params = []
     
     if user_id:
@@ -469,6 +1008,7 @@ def get_processing_items(user_id=None):
             "file_path": row["file_path"],
             "user_id": row["user_id"],
             "thumbnail_path": row["thumbnail_path"],
+            "content_hash": row["content_hash"],
             "status": row["status"],
             "stage": row["progress_stage"],
             "percent": row["progress_percent"],
@@ -479,7 +1019,6 @@ def get_processing_items(user_id=None):
 def save_connected_account(user_id, provider, access_token, scope=""):
     conn = sqlite3.connect(get_db_path())
     c = conn.cursor()
-    from datetime import datetime
     c.execute("""
         INSERT INTO connected_accounts (user_id, provider, access_token, scope, connected_at)
         VALUES (?, ?, ?, ?, ?)
@@ -505,13 +1044,16 @@ def delete_connected_account(user_id, provider):
     conn = sqlite3.connect(get_db_path())
     c = conn.cursor()
     c.execute("DELETE FROM connected_accounts WHERE user_id = ? AND provider = ?", (user_id, provider))
+    if provider == "github":
+        # A reconnect should start from a full sync
+        c.execute("DELETE FROM github_repo_state WHERE user_id = ?", (user_id,))
+        c.execute("DELETE FROM github_page_cache WHERE user_id = ?", (user_id,))
     conn.commit()
     conn.close()
 
 def update_last_synced(user_id, provider):
     conn = sqlite3.connect(get_db_path())
     c = conn.cursor()
-    from datetime import datetime
     c.execute("UPDATE connected_accounts SET last_synced_at = ? WHERE user_id = ? AND provider = ?", (datetime.utcnow(), user_id, provider))
     conn.commit()
     conn.close()
@@ -529,4 +1071,369 @@ def get_users_needing_sync(provider, hours=24):
     c.execute(query, (provider,))
     rows = c.fetchall()
     conn.close()
-    return [row['user_id'] for row in rows]
\ No newline at end of file
+    return [row['user_id'] for row in rows]
+
+def get_sync_candidates(provider):
+    """
+    Every connected account for a provider with what the sync scheduler
+    needs to order them: last sync, connect time and the user's latest activity.
+    """
+    conn = sqlite3.connect(get_db_path())
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute("""
+        SELECT a.user_id, a.connected_at, a.last_synced_at,
+               (SELECT MAX(i.last_accessed) FROM items i WHERE i.user_id = a.user_id) AS last_active
+        FROM connected_accounts a
+        WHERE a.provider = ?
+    """, (provider,))
+    rows = c.fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+# How long an upload holds its blob before an item references it (the
+# upload and the item are created by separate requests)
+BLOB_PENDING_GRACE_S = int(os.getenv("BLOB_PENDING_GRACE_S", str(24 * 3600)))
+
+def register_blob(content_hash, file_path, size):
+    """
+    Records an uploaded blob. Every upload (duplicates included) refreshes
+    committed_at, which keeps a blob with no items alive for
+    BLOB_PENDING_GRACE_S so the item created from the upload can reference it.
+    Returns the blob's file_path: file_path, or the registered one if the
+    content was already stored.
+    """
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    c.execute("INSERT OR IGNORE INTO blobs (content_hash, file_path, size, ref_count) VALUES (?, ?, ?, 0)", (content_hash, file_path, size))
+    c.execute("UPDATE blobs SET committed_at = ? WHERE content_hash = ?", (time.time(), content_hash))
+    c.execute("SELECT file_path FROM blobs WHERE content_hash = ?", (content_hash,))
+    registered = c.fetchone()[0]
+    conn.commit()
+    conn.close()
+    return registered
+
+def get_blob(content_hash):
+    conn = sqlite3.connect(get_db_path())
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute("SELECT * FROM blobs WHERE content_hash = ?", (content_hash,))
+    row = c.fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def get_blob_by_path(file_path):
+    conn = sqlite3.connect(get_db_path())
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute("SELECT * FROM blobs WHERE file_path = ?", (file_path,))
+    row = c.fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def get_blobs():
+    conn = sqlite3.connect(get_db_path())
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute("SELECT * FROM blobs")
+    rows = c.fetchall()
+    conn.close()
+    return [dict(row) for row in rows]
+
+def move_blob(content_hash, old_path, new_path, thumb_paths):
+    """Points the blob and the items using it at new_path; thumb_paths maps old -> new thumbnail URLs."""
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    c.execute("UPDATE blobs SET file_path = ? WHERE content_hash = ?", (new_path, content_hash))
+    c.execute("UPDATE items SET file_path = ? WHERE file_path = ?", (new_path, old_path))
+    c.executemany("UPDATE items SET thumbnail_path = ? WHERE thumbnail_path = ?", [(new, old) for old, new in thumb_paths.items()])
+    conn.commit()
+    conn.close()
+
+def get_content_hashes(item_ids, user_id=None):
+    if not item_ids:
+        return []
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    placeholders = ', '.join(['?'] * len(item_ids))
+    query = f"SELECT content_hash FROM items WHERE id IN ({placeholders}) AND content_hash IS NOT NULL"
+    params = list(item_ids)
+    if user_id:
+        query += " AND user_id = ?"
+        params.append(user_id)
+    c.execute(query, tuple(params))
+    rows = c.fetchall()
+    conn.close()
+    return [row[0] for row in rows]
+
+def _drop_blob(c, content_hash):
+    c.execute("DELETE FROM blobs WHERE content_hash = ?", (content_hash,))
+    c.execute("DELETE FROM extraction_cache WHERE content_hash = ?", (content_hash,))
+    c.execute("DELETE FROM extraction_cache_chunks WHERE content_hash = ?", (content_hash,))
+
+def release_blob_ref(content_hash):
+    """
+    Drops one reference. When the last one goes and no upload of the content
+    is pending (committed_at older than BLOB_PENDING_GRACE_S), the blob row
+    and its cached extraction are removed and the blob (with its file_path)
+    is returned so the caller can delete the file. A blob kept for a pending
+    upload is collected later by collect_stale_blobs.
+    """
+    conn = sqlite3.connect(get_db_path())
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute("UPDATE blobs SET ref_count = MAX(ref_count - 1, 0) WHERE content_hash = ?", (content_hash,))
+    c.execute("SELECT * FROM blobs WHERE content_hash = ?", (content_hash,))
+    row = c.fetchone()
+    if row and row['ref_count'] == 0 and (row['committed_at'] or 0) < time.time() - BLOB_PENDING_GRACE_S:
+        _drop_blob(c, content_hash)
+        conn.commit()
+        conn.close()
+        return dict(row)
+    conn.commit()
+    conn.close()
+    return None
+
+def collect_stale_blobs():
+    """
+    Removes blobs that no item references and that were last uploaded more
+    than BLOB_PENDING_GRACE_S ago (uploaded but never turned into an item).
+    Returns them so the caller can delete the files.
+    """
+    conn = sqlite3.connect(get_db_path())
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute("SELECT * FROM blobs WHERE ref_count <= 0 AND COALESCE(committed_at, 0) < ?", (time.time() - BLOB_PENDING_GRACE_S,))
+    rows = [dict(row) for row in c.fetchall()]
+    for row in rows:
+        _drop_blob(c, row['content_hash'])
+    conn.commit()
+    conn.close()
+    return rows
+
+def cache_item_extraction(content_hash, item_id, outputs):
+    """
+    Snapshots a finished item's extraction (task outputs, aggregated content,
+    embedding and chunks) under its content hash.
+    """
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    c.execute("""
+        INSERT OR REPLACE INTO extraction_cache (content_hash, outputs, content, embedding, thumbnail_path)
+        SELECT ?, ?, content, embedding, thumbnail_path FROM items WHERE id = ?
+    """, (content_hash, json.dumps(outputs), item_id))
+    c.execute("DELETE FROM extraction_cache_chunks WHERE content_hash = ?", (content_hash,))
+    c.execute("""
+        INSERT INTO extraction_cache_chunks (content_hash, type, text, embedding, start_time, end_time)
+        SELECT ?, type, text, embedding, start_time, end_time FROM chunks WHERE item_id = ? ORDER BY id
+    """, (content_hash, item_id))
+    conn.commit()
+    conn.close()
+
+def clone_cached_extraction(content_hash, item_id):
+    """
+    Completes an item from the extraction cache by copying the cached chunks
+    and content. Returns the cached outputs dict, or None on a cache miss.
+    """
+    conn = sqlite3.connect(get_db_path())
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute("SELECT * FROM extraction_cache WHERE content_hash = ?", (content_hash,))
+    row = c.fetchone()
+    if not row:
+        conn.close()
+        return None
+
+    c.execute("DELETE FROM chunks WHERE item_id = ?", (item_id,))
+    c.execute("""
+        INSERT INTO chunks (item_id, type, text, embedding, start_time, end_time)
+        SELECT ?, type, text, embedding, start_time, end_time FROM extraction_cache_chunks
+        WHERE content_hash = ? ORDER BY id
+    """, (item_id, content_hash))
+    c.execute("""
+        UPDATE items
+        SET content = ?, embedding = ?, thumbnail_path = COALESCE(?, thumbnail_path),
+            status = 'completed', progress_stage = 'done', progress_percent = 100, progress_message = 'Completed'
+        WHERE id = ?
+    """, (row['content'], row['embedding'], row['thumbnail_path'], item_id))
+    conn.commit()
+    conn.close()
+    return json.loads(row['outputs']) if row['outputs'] else {}
+
+# LRU timestamps are refreshed at most this often, so a cache hit is a plain
+# read unless the entry hasn't been touched for a while
+EMBED_CACHE_TOUCH_S = int(os.getenv("EMBED_CACHE_TOUCH_S", str(6 * 3600)))
+
+def get_cached_embeddings(model_id, text_hashes):
+    """
+    Looks up cached vectors and refreshes the LRU timestamp of the ones last
+    touched more than EMBED_CACHE_TOUCH_S ago. Returns {text_hash: embedding}.
+    """
+    if not text_hashes:
+        return {}
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    found = {}
+    stale = []
+    now = time.time()
+    hashes = list(text_hashes)
+    # Stay well under SQLite's bound-parameter limit
+    for i in range(0, len(hashes), 500):
+        batch = hashes[i:i + 500]
+        placeholders = ', '.join(['?'] * len(batch))
+        c.execute(f"SELECT text_hash, embedding, last_used FROM embedding_cache WHERE model_id = ? AND text_hash IN ({placeholders})", (model_id, *batch))
+        for text_hash, embedding, last_used in c.fetchall():
+            found[text_hash] = json.loads(embedding)
+            if (last_used or 0) < now - EMBED_CACHE_TOUCH_S:
+                stale.append(text_hash)
+    if stale:
+        c.executemany("UPDATE embedding_cache SET last_used = ? WHERE model_id = ? AND text_hash = ?",
+                      [(now, model_id, h) for h in stale])
+        conn.commit()
+    conn.close()
+    return found
+
+def put_cached_embeddings(model_id, entries):
+    """
+    entries: {text_hash: embedding}
+    """
+    if not entries:
+        return
+    now = time.time()
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    c.executemany("INSERT OR REPLACE INTO embedding_cache (model_id, text_hash, embedding, last_used) VALUES (?, ?, ?, ?)",
+                  [(model_id, h, json.dumps(vec), now) for h, vec in entries.items()])
+    conn.commit()
+    conn.close()
+
+def evict_embedding_cache(max_entries):
+    """
+    Trims the cache to max_entries, least recently used first. Returns rows evicted.
+    """
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    c.execute("SELECT COUNT(*) FROM embedding_cache")
+    excess = c.fetchone()[0] - max_entries
+    evicted = 0
+    if excess > 0:
+        c.execute("DELETE FROM embedding_cache WHERE rowid IN (SELECT rowid FROM embedding_cache ORDER BY last_used LIMIT ?)", (excess,))
+        evicted = c.rowcount
+        conn.commit()
+    conn.close()
+    return evicted
+
+def count_embedding_cache():
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    c.execute("SELECT COUNT(*) FROM embedding_cache")
+    count = c.fetchone()[0]
+    conn.close()
+    return count
+
+def get_github_repo_states(user_id):
+    conn = sqlite3.connect(get_db_path())
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute("SELECT * FROM github_repo_state WHERE user_id = ?", (user_id,))
+    rows = c.fetchall()
+    conn.close()
+    return {row['repo_id']: dict(row) for row in rows}
+
+def save_github_repo_state(user_id, state):
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    c.execute("""
+        INSERT OR REPLACE INTO github_repo_state
+            (user_id, repo_id, full_name, pushed_at, updated_at, readme_etag, readme, commits_etag, commits, synced_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (user_id, state['repo_id'], state['full_name'], state['pushed_at'], state['updated_at'],
+          state['readme_etag'], state['readme'], state['commits_etag'], state['commits'], datetime.utcnow()))
+    conn.commit()
+    conn.close()
+
+def get_github_page_cache(user_id, url):
+    conn = sqlite3.connect(get_db_path())
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute("SELECT etag, body FROM github_page_cache WHERE user_id = ? AND url = ?", (user_id, url))
+    row = c.fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def save_github_page_cache(user_id, url, etag, body):
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    c.execute("INSERT OR REPLACE INTO github_page_cache (user_id, url, etag, body) VALUES (?, ?, ?, ?)", (user_id, url, etag, body))
+    conn.commit()
+    conn.close()
+
+def get_youtube_meta(video_id):
+    conn = sqlite3.connect(get_db_path())
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute("SELECT info, source, fetched_at FROM youtube_meta_cache WHERE video_id = ?", (video_id,))
+    row = c.fetchone()
+    conn.close()
+    if not row:
+        return None
+    return {"info": json.loads(row["info"]), "source": row["source"], "fetched_at": row["fetched_at"]}
+
+def save_youtube_meta(video_id, info, source):
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    c.execute("INSERT OR REPLACE INTO youtube_meta_cache (video_id, info, source, fetched_at) VALUES (?, ?, ?, ?)",
+              (video_id, json.dumps(info), source, time.time()))
+    conn.commit()
+    conn.close()
+
+def create_upload_session(upload_id, user_id, filename, mime_type, size):
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    now = datetime.utcnow()
+    c.execute("INSERT INTO upload_sessions (id, user_id, filename, mime_type, size, offset, created_at, updated_at) VALUES (?, ?, ?, ?, ?, 0, ?, ?)",
+              (upload_id, user_id, filename, mime_type, size, now, now))
+    conn.commit()
+    conn.close()
+
+def get_upload_session(upload_id):
+    conn = sqlite3.connect(get_db_path())
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+    c.execute("SELECT * FROM upload_sessions WHERE id = ?", (upload_id,))
+    row = c.fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def update_upload_offset(upload_id, offset):
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    c.execute("UPDATE upload_sessions SET offset = ?, updated_at = ? WHERE id = ?", (offset, datetime.utcnow(), upload_id))
+    conn.commit()
+    conn.close()
+
+def delete_upload_session(upload_id):
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    c.execute("DELETE FROM upload_sessions WHERE id = ?", (upload_id,))
+    conn.commit()
+    conn.close()
+
+def count_active_uploads(user_id, idle_minutes=30):
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    c.execute(f"SELECT COUNT(*) FROM upload_sessions WHERE user_id IS ? AND updated_at > datetime('now', '-{int(idle_minutes)} minutes')", (user_id,))
+    count = c.fetchone()[0]
+    conn.close()
+    return count
+
+def pop_stale_upload_sessions(hours=24):
+    conn = sqlite3.connect(get_db_path())
+    c = conn.cursor()
+    c.execute(f"SELECT id FROM upload_sessions WHERE updated_at < datetime('now', '-{int(hours)} hours')")
+    ids = [row[0] for row in c.fetchall()]
+    if ids:
+        c.execute(f"DELETE FROM upload_sessions WHERE id IN ({','.join('?' * len(ids))})", ids)
+    conn.commit()
+    conn.close()
+    return ids
@@ -0,0 +1,170 @@
+import os
+import re
+import uuid
+import mimetypes
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+
+CHUNK_SIZE = 256 * 1024
+MAX_RANGES = 16   # More than this and we just send the whole file
+
+# Content-addressed (blob sha256) and uuid-prefixed names never change content
+IMMUTABLE_NAME_RE = re.compile(r"^([0-9a-f]{64}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})")
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+def _etag(st):
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip() for t in if_none_match.split(",")]
+        # Weak comparison, as the spec asks for If-None-Match
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            pass
+    return False
+
+def _range_applies(request, etag, mtime):
+    # If-Range: only honor Range when the client's copy is still current
+    if_range = request.headers.get("if-range")
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    try:
+        return int(mtime) == int(parsedate_to_datetime(if_range).timestamp())
+    except (TypeError, ValueError):
+        return False
+
+def parse_ranges(header, size):
+    """
+    Parses a Range header into sorted, merged (start, end) pairs (inclusive).
+    Returns None when the header should be ignored (malformed / not bytes / too
+    many ranges) and [] when it is valid but nothing is satisfiable.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    ranges = []
+    specs = header[6:].split(",")
+    if len(specs) > MAX_RANGES:
+        return None
+    for spec in specs:
+        spec = spec.strip()
+        m = re.fullmatch(r"(\d*)-(\d*)", spec)
+        if not m or (not m.group(1) and not m.group(2)):
+            return None
+        if m.group(1):
+            start = int(m.group(1))
+            end = int(m.group(2)) if m.group(2) else size - 1
+            if m.group(2) and end < start:
+                return None
+            if start >= size:
+                continue
+            ranges.append((start, min(end, size - 1)))
+        else:
+            # Suffix range: the last N bytes
+            length = int(m.group(2))
+            if length == 0 or size == 0:
+                continue # Nothing to return from an empty file (416)
+            ranges.append((max(0, size - length), size - 1))
+
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def _read_range(path, start, end):
+    # Constant memory: seek once, then stream fixed-size blocks
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = f.read(min(CHUNK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+def _read_multipart(path, parts, boundary):
+    for part_header, start, end in parts:
+        yield part_header
+        yield from _read_range(path, start, end)
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode()
+
+def serve_file(full_path, request, cache_control=None, etag=None, extra_headers=None):
+    """
+    Streams a file with ETag/Last-Modified validation and single, multi and
+    suffix byte ranges. Memory use per request is one CHUNK_SIZE block.
+    Callers serving derived files can pin the ETag and Cache-Control.
+    """
+    try:
+        st = os.stat(full_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not os.path.isfile(full_path):
+        raise HTTPException(status_code=404, detail="File not found")
+
+    size = st.st_size
+    etag = etag or _etag(st)
+    mime_type, _ = mimetypes.guess_type(full_path)
+    mime_type = mime_type or "application/octet-stream"
+    immutable = IMMUTABLE_NAME_RE.match(os.path.basename(full_path))
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": cache_control or (IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE),
+        "Access-Control-Expose-Headers": "Content-Range, Content-Length, ETag, Accept-Ranges",
+        **(extra_headers or {})
+    }
+
+    if _not_modified(request, etag, st.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    is_head = request.method == "HEAD"
+    ranges = None
+    if _range_applies(request, etag, st.st_mtime):
+        ranges = parse_ranges(request.headers.get("range"), size)
+
+    if ranges == []:
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status_code=416, headers=headers)
+
+    if not ranges:
+        headers["Content-Length"] = str(size)
+        body = iter(()) if is_head else _read_range(full_path, 0, size - 1)
+        return StreamingResponse(body, media_type=mime_type, headers=headers)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        body = iter(()) if is_head else _read_range(full_path, start, end)
+        return StreamingResponse(body, status_code=206, media_type=mime_type, headers=headers)
+
+    # Multiple ranges: multipart/byteranges, with the length computed up front
+    boundary = uuid.uuid4().hex
+    parts = []
+    length = 0
+    for start, end in ranges:
+        part_header = (f"--{boundary}\r\nContent-Type: {mime_type}\r\n"
+                       f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n").encode()
+        parts.append((part_header, start, end))
+        length += len(part_header) + (end - start + 1) + 2
+    length += len(f"--{boundary}--\r\n")
+    headers["Content-Length"] = str(length)
+    body = iter(()) if is_head else _read_multipart(full_path, parts, boundary)
+    return StreamingResponse(body, status_code=206, media_type=f"multipart/byteranges; boundary={boundary}", headers=headers)
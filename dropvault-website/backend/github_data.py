@@ -1,12 +1,118 @@
+import os
+import json
+import time
+import base64
+import threading
 import requests
-from .database import get_connected_account
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .database import get_connected_account, get_github_repo_states, get_github_page_cache, save_github_page_cache
+
+# Overridable so the sync can run against a local stand-in for the GitHub API
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+
+# Per-repo README/commit calls in flight at once (per sync)
+GITHUB_FETCH_CONCURRENCY = int(os.getenv("GITHUB_FETCH_CONCURRENCY", "8"))
+
+# Start spreading requests out when the remaining quota drops below this
+RATE_LIMIT_LOW_WATER = 200
+MAX_RETRIES = 3
+
+# OPTIMIZATION: One pooled keep-alive session for all GitHub traffic
+# (instead of a new TCP/TLS connection per requests.get)
+session = requests.Session()
+session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=GITHUB_FETCH_CONCURRENCY * 2))
+session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=GITHUB_FETCH_CONCURRENCY * 2))
+
+class RateLimiter:
+    """
+    Adaptive throttle driven by GitHub's rate-limit headers (one per token).
+    Honors Retry-After / exhausted quotas outright, and when the remaining
+    quota runs low spreads the rest of it evenly until the reset.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.remaining = None
+        self.reset_at = 0
+        self.blocked_until = 0
+
+    def wait(self):
+        with self.lock:
+            now = time.time()
+            delay = 0
+            if now < self.blocked_until:
+                delay = self.blocked_until - now
+            elif self.remaining is not None and self.remaining < RATE_LIMIT_LOW_WATER and self.reset_at > now:
+                delay = (self.reset_at - now) / max(self.remaining, 1)
+        if delay > 0:
+            time.sleep(min(delay, 900))
+
+    def update(self, res):
+        """
+        Returns True when the response was a rate-limit rejection worth retrying.
+        """
+        with self.lock:
+            try:
+                if "X-RateLimit-Remaining" in res.headers:
+                    self.remaining = int(res.headers["X-RateLimit-Remaining"])
+                if "X-RateLimit-Reset" in res.headers:
+                    self.reset_at = int(res.headers["X-RateLimit-Reset"])
+            except ValueError:
+                pass
+
+            if res.status_code not in (403, 429):
+                return False
+            retry_after = res.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                self.blocked_until = time.time() + int(retry_after)
+            elif self.remaining == 0 and self.reset_at:
+                self.blocked_until = self.reset_at
+            else:
+                return False
+            print(f"[GitHub] Rate limited, pausing {self.blocked_until - time.time():.0f}s")
+            return True
+
+class GitHubFetchError(Exception):
+    """A README/commit request failed (not a legitimate "nothing there")."""
+
+def conditional_get(url, headers, etag=None, limiter=None):
+    """
+    GET with If-None-Match over the pooled session. A 304 costs nothing
+    against the rate limit. Rate-limit rejections are retried after waiting.
+    """
+    req_headers = dict(headers)
+    if etag:
+        req_headers["If-None-Match"] = etag
+    for _ in range(MAX_RETRIES):
+        if limiter: limiter.wait()
+        res = session.get(url, headers=req_headers, timeout=30)
+        if not (limiter and limiter.update(res)):
+            return res
+    return res
+
+def iter_github_data(user_id, report=None, api_url=None):
+    """
+    Incremental, concurrent sync. Yields repos that are new or changed since
+    the last sync as soon as their README/commits arrive, so the caller can
+    pipeline them into the embed stage. Repos whose pushed_at/updated_at
+    watermarks match the stored state are skipped without any README/commit
+    calls; changed ones are fetched with conditional requests on a bounded
+    pool. Each yielded repo carries a "state" dict the caller persists with
+    save_github_repo_state once the repo is queued. Repos whose README or
+    commits could not be fetched are not yielded (their stored content and
+    watermark stay as they were, so the next sync retries them).
+    If given, `report` is filled with what changed.
+    """
+    if report is None:
+        report = {}
+    report.update({"new": [], "updated": [], "unchanged": 0, "failed": [], "requests": 0, "not_modified": 0})
 
-def fetch_github_data(user_id):
     account = get_connected_account(user_id, "github")
     if not account:
         print(f"No GitHub account found for user {user_id}")
-        return []
+        return
 
+    api = (api_url or GITHUB_API_URL).rstrip("/")
     access_token = account["access_token"]
     headers = {
         "Authorization": f"Bearer {access_token}",
@@ -14,71 +120,119 @@ def fetch_github_data(user_id):
     }
 
     print(f"Fetching GitHub data for user {user_id}...")
-    
-    results = []
+
+    states = get_github_repo_states(user_id)
+    limiter = RateLimiter()
+    report_lock = threading.Lock()
     seen_ids = set()
 
-    def process_repos(url_template, category_tag, limit=100):
+    def get(url, etag=None):
+        res = conditional_get(url, headers, etag, limiter)
+        with report_lock:
+            report["requests"] += 1
+            if res.status_code == 304:
+                report["not_modified"] += 1
+        return res
+
+    def list_page(url):
+        # Listing pages are cached by ETag too; a 304 replays the stored body
+        cached = get_github_page_cache(user_id, url)
+        res = get(url, cached["etag"] if cached else None)
+        if res.status_code == 304 and cached:
+            return json.loads(cached["body"])
+        if res.status_code != 200:
+            print(f"GitHub API Error ({url}): {res.text}")
+            return None
+        if res.headers.get("ETag"):
+            save_github_page_cache(user_id, url, res.headers["ETag"], res.text)
+        return res.json()
+
+    def fetch_readme(repo, state):
+        etag = state["readme_etag"] if state else None
+        rm_res = get(f"{api}/repos/{repo['full_name']}/readme", etag)
+        if rm_res.status_code == 304 and state:
+            return state["readme"], etag
+        if rm_res.status_code == 200:
+            content_b64 = rm_res.json().get("content", "")
+            readme = base64.b64decode(content_b64).decode("utf-8", errors="ignore") if content_b64 else ""
+            return readme, rm_res.headers.get("ETag")
+        if rm_res.status_code == 404:
+            return "", None # No README
+        raise GitHubFetchError(f"README: HTTP {rm_res.status_code}")
+
+    def fetch_commits(repo, state):
+        # Limit 20 to save API quota for massive syncs
+        etag = state["commits_etag"] if state else None
+        c_res = get(f"{api}/repos/{repo['full_name']}/commits?per_page=20", etag)
+        if c_res.status_code == 304 and state:
+            return state["commits"], etag
+        if c_res.status_code == 200:
+            lines = []
+            for c in c_res.json():
+                if isinstance(c, dict) and 'commit' in c:
+                    msg = c['commit']['message'].split('\n')[0]
+                    date = c['commit']['author']['date'].split('T')[0]
+                    lines.append(f"[{date}] {msg}")
+            return "\n".join(lines), c_res.headers.get("ETag")
+        if c_res.status_code == 409:
+            return "", None # Empty repository
+        raise GitHubFetchError(f"commits: HTTP {c_res.status_code}")
+
+    def fetch_repo(repo, state, category_tag):
+        try:
+            readme_content, readme_etag = fetch_readme(repo, state)
+            commits_content, commits_etag = fetch_commits(repo, state)
+        except (GitHubFetchError, requests.RequestException, ValueError) as e:
+            print(f"[GitHub] Skipping {repo['full_name']} this sync ({e})")
+            with report_lock:
+                report["failed"].append(repo["full_name"])
+            return None
+        return {
+            "id": repo["id"],
+            "full_name": repo["full_name"],
+            "description": repo["description"],
+            "html_url": repo["html_url"],
+            "language": repo["language"],
+            "stars": repo["stargazers_count"],
+            "updated_at": repo["updated_at"],
+            "readme": readme_content,
+            "commits": commits_content,
+            "category": category_tag,
+            "is_fork": repo.get("fork", False),
+            "state": {
+                "repo_id": repo["id"],
+                "full_name": repo["full_name"],
+                "pushed_at": repo.get("pushed_at"),
+                "updated_at": repo.get("updated_at"),
+                "readme_etag": readme_etag,
+                "readme": readme_content,
+                "commits_etag": commits_etag,
+                "commits": commits_content
+            }
+        }
+
+    def list_repos(url_template, category_tag, limit=100):
+        # Pagination stays sequential; yields (repo, state, category) for changed repos
         fetched_count = 0
         page = 1
         while True:
             url = f"{url_template}&per_page=30&page={page}"
             try:
-                res = requests.get(url, headers=headers)
-                if res.status_code != 200:
-                    print(f"GitHub API Error ({url}): {res.text}")
-                    break
-                
-                data = res.json()
+                data = list_page(url)
                 if not data: break
-                
+
                 for repo in data:
                     if repo['id'] in seen_ids: continue
                     seen_ids.add(repo['id'])
-                    
-                    # Fetch README
-                    readme_content = ""
-                    try:
-                        readme_url = f"https://api.github.com/repos/{repo['full_name']}/readme"
-                        rm_res = requests.get(readme_url, headers=headers)
-                        if rm_res.status_code == 200:
-                            import base64
-                            content_b64 = rm_res.json().get("content", "")
-                            if content_b64:
-                                readme_content = base64.b64decode(content_b64).decode("utf-8", errors="ignore")
-                    except: pass
-
-                    # Fetch Commits (Limit 20 to save API quota for massive syncs)
-                    commits_content = ""
-                    try:
-                        commits_url = f"https://api.github.com/repos/{repo['full_name']}/commits?per_page=20"
-                        c_res = requests.get(commits_url, headers=headers)
-                        if c_res.status_code == 200:
-                            commits_data = c_res.json()
-                            lines = []
-                            for c in commits_data:
-                                if isinstance(c, dict) and 'commit' in c:
-                                    msg = c['commit']['message'].split('\n')[0]
-                                    date = c['commit']['author']['date'].split('T')[0]
-                                    lines.append(f"[{date}] {msg}")
-                            commits_content = "\n".join(lines)
-                    except: pass
-
-                    results.append({
-                        "id": repo["id"],
-                        "full_name": repo["full_name"],
-                        "description": repo["description"],
-                        "html_url": repo["html_url"],
-                        "language": repo["language"],
-                        "stars": repo["stargazers_count"],
-                        "updated_at": repo["updated_at"],
-                        "readme": readme_content,
-                        "commits": commits_content,
-                        "category": category_tag,
-                        "is_fork": repo.get("fork", False)
-                    })
-                    
                     fetched_count += 1
+
+                    state = states.get(repo['id'])
+                    if state and state["pushed_at"] == repo.get("pushed_at") and state["updated_at"] == repo.get("updated_at"):
+                        report["unchanged"] += 1
+                    else:
+                        report["updated" if state else "new"].append(repo["full_name"])
+                        yield repo, state, category_tag
+
                     if fetched_count >= limit: return
 
                 page += 1
@@ -86,12 +240,32 @@ def fetch_github_data(user_id):
                 print(f"Error in fetch loop: {e}")
                 break
 
-    # 1. Fetch User Repos (Owned, Member, Forks)
-    # type=all covers owner, collaborator, organization_member
-    process_repos("https://api.github.com/user/repos?sort=updated&type=all", "repo", limit=150)
+    with ThreadPoolExecutor(max_workers=GITHUB_FETCH_CONCURRENCY) as pool:
+        pending = set()
+        # 1. User Repos (type=all covers owner, collaborator, organization_member)
+        # 2. Starred Repos
+        listings = [
+            (f"{api}/user/repos?sort=updated&type=all", "repo"),
+            (f"{api}/user/starred?sort=created", "starred")
+        ]
+        for url_template, category_tag in listings:
+            for repo, state, category in list_repos(url_template, category_tag, limit=150):
+                pending.add(pool.submit(fetch_repo, repo, state, category))
+                # Hand over whatever already finished while we keep listing
+                for fut in [f for f in pending if f.done()]:
+                    pending.discard(fut)
+                    if fut.result() is not None:
+                        yield fut.result()
+
+        for fut in as_completed(pending):
+            if fut.result() is not None:
+                yield fut.result()
 
-    # 2. Fetch Starred Repos
-    process_repos("https://api.github.com/user/starred?sort=created", "starred", limit=150)
+    print(f"GitHub sync for {user_id}: {len(report['new'])} new, {len(report['updated'])} changed, "
+          f"{report['unchanged']} unchanged, {len(report['failed'])} failed ({report['requests']} requests, {report['not_modified']} not modified).")
 
-    print(f"Total fetched: {len(results)} items.")
-    return results
+def fetch_github_data(user_id, report=None, api_url=None):
+    """
+    Collects iter_github_data into a list (for callers that don't stream).
+    """
+    return list(iter_github_data(user_id, report=report, api_url=api_url))
@@ -0,0 +1,33 @@
+from .ai import text_hash, generate_embeddings
+from .database import get_chunk_rows, apply_chunk_diff
+
+def reindex_chunks(item_id, chunk_type, parts):
+    """
+    Brings an item's chunks of one type in line with freshly chunked text.
+    Chunks are matched by content hash: unchanged rows (and their embeddings)
+    are kept, only new parts are embedded and written, and parts that
+    disappeared are deleted. Cost scales with the size of the change.
+    Returns (kept, added, removed).
+    """
+    existing = {}
+    for row in get_chunk_rows(item_id, chunk_type):
+        # Rows written before text_hash existed are hashed on the fly
+        h = row['text_hash'] or text_hash(row['text'])
+        existing.setdefault(h, []).append(row['id'])
+
+    kept = 0
+    to_add = []
+    for part in parts:
+        h = text_hash(part)
+        if existing.get(h):
+            existing[h].pop()
+            kept += 1
+        else:
+            to_add.append((part, h))
+
+    to_delete = [cid for ids in existing.values() for cid in ids]
+    vectors = generate_embeddings([part for part, _ in to_add])
+    apply_chunk_diff(item_id, chunk_type, to_delete, [(part, h, vec) for (part, h), vec in zip(to_add, vectors)])
+
+    print(f"[Indexer] Item {item_id} {chunk_type}: kept {kept}, added {len(to_add)}, removed {len(to_delete)}")
+    return kept, len(to_add), len(to_delete)
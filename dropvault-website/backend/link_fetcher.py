@@ -0,0 +1,271 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlsplit
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+from .media_utils import UPLOAD_DIR, enforce_cache_size
+
+# Link fetches in flight at once (sizes the worker's link pool)
+LINK_FETCH_CONCURRENCY = int(os.getenv("LINK_FETCH_CONCURRENCY", "8"))
+# Minimum spacing between requests to the same host
+LINK_HOST_INTERVAL_S = float(os.getenv("LINK_HOST_INTERVAL_S", "1.0"))
+# Bodies are streamed and cut off here; metadata lives in <head> anyway
+LINK_MAX_BYTES = int(os.getenv("LINK_MAX_KB", "2048")) * 1024
+LINK_TIMEOUT_S = 10
+
+# On-disk HTTP cache (one file per URL: JSON header line + body), LRU by size
+HTTP_CACHE_DIR = os.path.join(UPLOAD_DIR, ".cache", "http")
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_MB", "256")) * 1024 * 1024
+HTTP_CACHE_MAX_AGE_S = 24 * 3600   # Upper bound on trusting a max-age without revalidating
+os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# lxml is several times faster than the pure-Python parser; fall back if it isn't installed
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+# OPTIMIZATION: One pooled keep-alive session for all link fetches
+session = requests.Session()
+session.headers.update({"User-Agent": USER_AGENT})
+session.mount("https://", HTTPAdapter(pool_connections=32, pool_maxsize=LINK_FETCH_CONCURRENCY * 2))
+session.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=LINK_FETCH_CONCURRENCY * 2))
+
+class HostLimiter:
+    """
+    Per-host politeness: requests to one host are spaced at least
+    `interval` seconds apart; different hosts don't wait on each other.
+    """
+    def __init__(self, interval=LINK_HOST_INTERVAL_S):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, host):
+        with self.lock:
+            now = time.time()
+            slot = max(now, self.next_slot.get(host, 0))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+host_limiter = HostLimiter()
+
+def _cache_path(url):
+    return os.path.join(HTTP_CACHE_DIR, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".http")
+
+def _read_cache(url):
+    path = _cache_path(url)
+    try:
+        with open(path, "rb") as f:
+            meta = json.loads(f.readline())
+            body = f.read()
+        os.utime(path, None)  # LRU touch
+        return meta, body
+    except (OSError, ValueError):
+        return None, None
+
+def _write_cache(url, meta, body):
+    path = _cache_path(url)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(json.dumps(meta).encode("utf-8") + b"\n")
+            f.write(body)
+        os.replace(tmp_path, path)
+        enforce_cache_size(HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES, keep=path)
+    except OSError as e:
+        print(f"[Links] Cache write failed for {url}: {e}")
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+
+def _max_age(headers):
+    cache_control = headers.get("Cache-Control", "").lower()
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0
+    m = re.search(r"max-age=(\d+)", cache_control)
+    if m:
+        return min(int(m.group(1)), HTTP_CACHE_MAX_AGE_S)
+    expires = headers.get("Expires")
+    if expires:
+        try:
+            return max(0, min(parsedate_to_datetime(expires).timestamp() - time.time(), HTTP_CACHE_MAX_AGE_S))
+        except (TypeError, ValueError):
+            pass
+    return 0
+
+def _read_capped(res, max_bytes):
+    body = bytearray()
+    for block in res.iter_content(64 * 1024):
+        body.extend(block)
+        if len(body) >= max_bytes:
+            return bytes(body[:max_bytes]), True
+    return bytes(body), False
+
+def fetch(url, max_bytes=LINK_MAX_BYTES):
+    """
+    GET through the shared session with per-host rate limiting and the
+    on-disk HTTP cache. Fresh entries are served without a request; stale
+    ones are revalidated with If-None-Match/If-Modified-Since.
+    Returns {"url", "status", "headers", "body", "encoding", "truncated", "from_cache"}.
+    """
+    meta, body = _read_cache(url)
+    if meta and time.time() - meta["fetched_at"] < meta["max_age"]:
+        return {**meta["response"], "body": body, "from_cache": True}
+
+    headers = {}
+    if meta:
+        if meta["response"]["headers"].get("ETag"):
+            headers["If-None-Match"] = meta["response"]["headers"]["ETag"]
+        if meta["response"]["headers"].get("Last-Modified"):
+            headers["If-Modified-Since"] = meta["response"]["headers"]["Last-Modified"]
+
+    host_limiter.wait(urlsplit(url).netloc.lower())
+    with session.get(url, headers=headers, timeout=LINK_TIMEOUT_S, stream=True) as res:
+        if res.status_code == 304 and meta:
+            meta["fetched_at"] = time.time()
+            meta["max_age"] = _max_age(res.headers) or meta["max_age"]
+            _write_cache(url, meta, body)
+            return {**meta["response"], "body": body, "from_cache": True}
+
+        new_body, truncated = _read_capped(res, max_bytes)
+        response = {
+            "url": res.url,
+            "status": res.status_code,
+            "headers": {k: v for k, v in res.headers.items() if k in ("Content-Type", "ETag", "Last-Modified")},
+            "encoding": res.encoding if "charset" in res.headers.get("Content-Type", "").lower() else None,
+            "truncated": truncated
+        }
+
+    can_validate = response["headers"].get("ETag") or response["headers"].get("Last-Modified")
+    max_age = _max_age(res.headers)
+    if response["status"] == 200 and (can_validate or max_age):
+        _write_cache(url, {"fetched_at": time.time(), "max_age": max_age, "response": response}, new_body)
+    return {**response, "body": new_body, "from_cache": False}
+
+def parse_html(page):
+    return BeautifulSoup(page["body"], HTML_PARSER, from_encoding=page.get("encoding"))
+
+def extract_link(url):
+    """
+    Fetches a page and builds the searchable text for a link item.
+    Returns (text, page_title, image_url), the same shape as extract_text.
+    """
+    extracted_links = set()
+    try:
+        page = fetch(url)
+        soup = parse_html(page)
+
+        meta = {
+            "title": None,
+            "description": None,
+            "author": None,
+            "date": None,
+            "site_name": None,
+            "keywords": None,
+            "image": None
+        }
+
+        # One pass over <meta> instead of a tree search per property
+        meta_tags = {}
+        for tag in soup.find_all("meta"):
+            key = tag.get("property") or tag.get("name")
+            value = tag.get("content")
+            if key and value and key.lower() not in meta_tags:
+                meta_tags[key.lower()] = value.strip()
+
+        def get_content(props):
+            for prop in props:
+                if meta_tags.get(prop):
+                    return meta_tags[prop]
+            return None
+
+        page_title_tag = soup.title.string.strip() if soup.title and soup.title.string else None
+        meta["title"] = get_content(["og:title", "twitter:title"]) or page_title_tag
+        meta["description"] = get_content(["og:description", "twitter:description", "description"])
+        meta["site_name"] = get_content(["og:site_name"])
+        meta["author"] = get_content(["article:author", "author", "twitter:creator"])
+        meta["date"] = get_content(["article:published_time", "date", "pubdate", "og:pubdate"])
+        meta["keywords"] = get_content(["keywords", "article:tag"])
+        meta["image"] = get_content(["og:image", "twitter:image"])
+
+        if not meta["date"] or not meta["author"] or not meta["title"] or not meta["description"]:
+            try:
+                ld_scripts = soup.find_all("script", type="application/ld+json")
+                for script in ld_scripts:
+                    if script.string:
+                        try:
+                            data = json.loads(script.string)
+                            if isinstance(data, list): data = data[0]
+                            if isinstance(data, dict):
+                                if not meta["date"]:
+                                    meta["date"] = data.get("datePublished") or data.get("dateCreated") or data.get("uploadDate")
+                                if not meta["author"]:
+                                    auth = data.get("author")
+                                    if isinstance(auth, dict): meta["author"] = auth.get("name")
+                                    elif isinstance(auth, list) and auth: meta["author"] = auth[0].get("name")
+                                    elif isinstance(auth, str): meta["author"] = auth
+                                if not meta["image"]:
+                                    meta["image"] = data.get("image") or data.get("thumbnailUrl")
+                                if not meta["title"]:
+                                    meta["title"] = data.get("name") or data.get("headline")
+                                if not meta["description"]:
+                                    meta["description"] = data.get("description") or data.get("articleBody")
+                        except: pass
+            except: pass
+
+        # Clean up title (remove site names)
+        if meta["title"]:
+            separators = [" | ", " - ", " : ", " • ", " on Instagram", " on TikTok"]
+            for sep in separators:
+                if sep in meta["title"]:
+                    # Check if the part after separator is the site name or similar generic text
+                    parts = meta["title"].split(sep)
+                    if len(parts) > 1:
+                        # Heuristic: if the last part is short or matches site name, remove it
+                        last = parts[-1].strip().lower()
+                        if last in ["instagram", "tiktok", "youtube", "twitter", "x", "facebook", "linkedin"] or len(last) < 15:
+                            meta["title"] = sep.join(parts[:-1]).strip()
+
+        page_title = meta["title"]
+
+        for script in soup(["script", "style", "nav", "footer", "header", "aside"]):
+            script.extract()
+
+        body_text = soup.get_text()
+        lines = (line.strip() for line in body_text.splitlines())
+        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+        clean_body = "\n".join(chunk for chunk in chunks if chunk)
+
+        # Find links in body text
+        urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', clean_body)
+        for link in urls:
+            extracted_links.add(link)
+
+        final_parts = [f"URL: {url}"]
+        if meta["title"]: final_parts.append(f"Title: {meta['title']}")
+        if meta["description"]: final_parts.append(f"Description: {meta['description']}")
+        if meta["author"]: final_parts.append(f"Author: {meta['author']}")
+        if meta["date"]: final_parts.append(f"Date: {meta['date']}")
+        if meta["site_name"]: final_parts.append(f"Site: {meta['site_name']}")
+        if meta["keywords"]: final_parts.append(f"Keywords: {meta['keywords']}")
+
+        final_parts.append("\n--- Content ---\n")
+        final_parts.append(clean_body[:7000])
+
+        if extracted_links:
+            final_parts.append("\n\n--- Extracted Links ---\n" + "\n".join(list(extracted_links)[:20])) # Limit to 20 links
+
+        return "\n".join(final_parts), page_title, meta["image"]
+
+    except Exception as e:
+        print(f"Link Extraction Error: {e}")
+        return url, None, None
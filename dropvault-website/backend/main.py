@@ -3,12 +3,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from typing import List
-import shutil
 import os
-import uuid
-import json
 import re
 import mimetypes
+import asyncio
+import base64
 from datetime import datetime, timedelta
 import numpy as np
 import pdfplumber
@@ -19,13 +18,22 @@ import cv2
 from PIL import Image
 import whisper
 from io import BytesIO
-from .ai import generate_embedding, query_embedding, cosine_sim
-from .database import init_db, add_item, get_all_items, delete_item, delete_items, update_item, get_item, get_all_items_with_embeddings, get_all_tags, get_processing_items, get_all_chunks, record_access, update_user_profile, get_user_profile
+from .ai import generate_embedding, query_embedding, embedding_cache_stats
+from .database import init_db, add_item, get_all_items, delete_item, delete_items, update_item, get_item, get_items_by_ids, compute_static_score, get_all_items_with_embeddings, get_all_tags, suggest_tags, get_processing_items, get_content_hashes, get_blob
 from .vision import detect_objects
-from .media_utils import UPLOAD_DIR, extract_text, extract_text_from_image, generate_video_thumbnail, transcribe_audio
-from .worker import worker, manager
+from .media_utils import UPLOAD_DIR, extract_text, extract_text_from_image, transcribe_audio
+from .worker import worker, manager, INCREMENTAL_TYPES
+from .chunker import split_blocks
+from .indexer import reindex_chunks
+from . import blob_store
+from .file_server import serve_file, IMMUTABLE_NAME_RE, IMMUTABLE_CACHE
+from . import media_variants
+from .previews import ensure_preview
+from . import search_index
+from . import access_tracker
 from .synonyms import expand_query
 from .github_auth import router as github_router
+from .uploads import router as uploads_router
 from .github_data import fetch_github_data
 
 app = FastAPI()
@@ -40,6 +48,7 @@ app.add_middleware(
 )
 
 app.include_router(github_router)
+app.include_router(uploads_router)
 
 @app.post("/api/sync/github")
 async def sync_github(userId: str = Form(...)):
@@ -50,6 +59,7 @@ async def sync_github(userId: str = Form(...)):
 
 # Init DB
 init_db()
+blob_store.rename_hashed_blobs()
 
 @app.websocket("/ws/progress/{user_id}")
 async def websocket_endpoint(websocket: WebSocket, user_id: str):
@@ -69,58 +79,55 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
     except Exception:
         manager.disconnect(websocket)
 
-@app.get("/uploads/{file_path:path}")
+@app.api_route("/uploads/{file_path:path}", methods=["GET", "HEAD"])
 async def get_file(file_path: str, request: Request):
     full_path = os.path.join(UPLOAD_DIR, file_path)
 
     if not os.path.abspath(full_path).startswith(os.path.abspath(UPLOAD_DIR)):
         raise HTTPException(status_code=403, detail="Access denied")
+    # Internal caches (.cache/: decoded audio, HTTP bodies, variants) aren't public
+    if any(part.startswith(".") for part in os.path.relpath(os.path.abspath(full_path), os.path.abspath(UPLOAD_DIR)).split(os.sep)):
+        raise HTTPException(status_code=404, detail="File not found")
+    if file_path.startswith("previews/"):
+        await asyncio.to_thread(ensure_preview, file_path)
+
+    # OPTIMIZATION: Streams only the requested range(s) from disk (was: whole file read per request)
+    return serve_file(full_path, request)
+
+@app.get("/api/media/{file_path:path}")
+async def get_media_variant(file_path: str, request: Request, w: int = 640, format: str = None):
+    """
+    Resized/re-encoded image of an upload (image, video thumbnail or PDF first page)
+    for grid views. Width snaps to a bucket; format follows the Accept header.
+    """
+    # Accepts both /api/media/<rel> and /api/media/uploads/<rel>
+    rel_path = file_path.lstrip("/")
+    if rel_path.startswith("uploads/"):
+        rel_path = rel_path[len("uploads/"):]
+    full_path = os.path.join(UPLOAD_DIR, rel_path)
 
-    if not os.path.exists(full_path):
+    if not os.path.abspath(full_path).startswith(os.path.abspath(UPLOAD_DIR)):
+        raise HTTPException(status_code=403, detail="Access denied")
+    if not os.path.isfile(full_path):
         raise HTTPException(status_code=404, detail="File not found")
+    if not media_variants.source_kind(full_path):
+        raise HTTPException(status_code=415, detail="No image variant for this file type")
 
-    # Get bytes
+    width = media_variants.bucket_width(max(1, w))
+    fmt = media_variants.negotiate_format(request.headers.get("accept"), format)
     try:
-        with open(full_path, "rb") as f:
-            file_bytes = f.read()
-    except Exception:
-         raise HTTPException(status_code=500, detail="Could not read file")
-
-    mime_type, _ = mimetypes.guess_type(full_path)
-    mime_type = mime_type or "application/octet-stream"
-
-    size = len(file_bytes)
-    range_header = request.headers.get("range")
-
-    if range_header:
-        start, end = 0, size - 1
-        m = re.match(r"bytes=(\d*)-(\d*)", range_header)
-        if m:
-            if m.group(1):
-                start = int(m.group(1))
-            if m.group(2):
-                end = int(m.group(2))
-
-        end = min(end, size - 1)
-        chunk = file_bytes[start:end+1]
-
-        headers = {
-            "Content-Range": f"bytes {start}-{end}/{size}",
-            "Accept-Ranges": "bytes",
-            "Content-Length": str(len(chunk)),
-            "Access-Control-Expose-Headers": "Content-Range",
-        }
-
-        return Response(chunk, status_code=206, media_type=mime_type, headers=headers)
-
-    # FULL FILE
-    return Response(
-        file_bytes,
-        media_type=mime_type,
-        headers={
-            "Content-Length": str(size),
-            "Accept-Ranges": "bytes"
-        }
+        variant_path = await asyncio.wrap_future(media_variants.get_variant(full_path, width, fmt))
+    except Exception as e:
+        print(f"[Media] Variant failed for {file_path}: {e}")
+        raise HTTPException(status_code=422, detail="Could not render variant")
+
+    # Uploads are content-addressed / uuid-named, so a variant URL never changes content
+    immutable = IMMUTABLE_NAME_RE.match(os.path.basename(full_path))
+    return serve_file(
+        variant_path, request,
+        cache_control=IMMUTABLE_CACHE if immutable else "public, max-age=86400",
+        etag=f'"{os.path.splitext(os.path.basename(variant_path))[0][:32]}"',
+        extra_headers={"Vary": "Accept"} if not format else None
     )
 
 def detect_social_platform(url):
@@ -254,6 +261,16 @@ async def create_item(
     if (type == "link" or type == "video") and content and content.startswith("http"):
         final_file_path = content
 
+    # Uploads in the blob store are deduplicated by content hash
+    content_hash = blob_store.content_hash_from_path(final_file_path)
+
+    # Size/mime are known up front for uploads; dimensions and duration are probed by the worker
+    file_size, mime_type = None, None
+    if final_file_path and final_file_path.startswith("/uploads/"):
+        blob = get_blob(content_hash) if content_hash else None
+        file_size = blob['size'] if blob else None
+        mime_type = mimetypes.guess_type(final_file_path)[0]
+
     item_id = add_item(
         title=title, 
         type=type, 
@@ -267,11 +284,14 @@ async def create_item(
         status="pending",
         progress_stage="queued",
         progress_percent=0,
-        progress_message="Waiting in queue..."
+        progress_message="Waiting in queue...",
+        content_hash=content_hash,
+        file_size=file_size,
+        mime_type=mime_type
     )
     
     # Queue for processing
-    worker.add_task(item_id, final_file_path, type, userId, thumbnail_path)
+    worker.add_task(item_id, final_file_path, type, userId, thumbnail_path, content_hash=content_hash)
     
     return {
         "id": item_id, 
@@ -284,67 +304,43 @@ async def create_item(
 
 @app.post("/api/upload")
 async def upload_file(file: UploadFile = File(...), userId: str = Form(None)):
-    if userId:
-        user_upload_dir = os.path.join(UPLOAD_DIR, userId)
-        os.makedirs(user_upload_dir, exist_ok=True)
-        filename = f"{uuid.uuid4()}-{file.filename}"
-        file_path = os.path.join(user_upload_dir, filename)
-        file_url = f"/uploads/{userId}/{filename}"
-    else:
-        filename = f"{uuid.uuid4()}-{file.filename}"
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        file_url = f"/uploads/{filename}"
-    
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-        
-    # Generate Thumbnail for Video
-    thumbnail_url = None
-    mime_type = file.content_type
-    if not mime_type:
-        mime_type, _ = mimetypes.guess_type(file.filename)
-        
-    if mime_type and mime_type.startswith('video/'):
-        thumb_dir = os.path.join(os.path.dirname(file_path), "thumbnails")
-        os.makedirs(thumb_dir, exist_ok=True)
-        thumb_filename = f"{filename}.jpg"
-        thumb_path = os.path.join(thumb_dir, thumb_filename)
-        
-        if generate_video_thumbnail(file_path, thumb_path):
-            if userId:
-                thumbnail_url = f"/uploads/{userId}/thumbnails/{thumb_filename}"
-            else:
-                thumbnail_url = f"/uploads/thumbnails/{thumb_filename}"
+    # Hash while streaming to disk (off the event loop); identical files share one blob.
+    # Large files should use the resumable /api/uploads protocol instead.
+    content_hash, file_url, _ = await asyncio.to_thread(blob_store.save_upload, file.file, file.filename)
+    filename = os.path.basename(file_url)
 
+    # Video thumbnails are generated by the worker, not on the request path
     return {
         "success": True,
         "fileUrl": file_url, 
         "filename": filename, 
         "originalName": file.filename,
         "mimetype": file.content_type,
-        "thumbnailUrl": thumbnail_url
+        "contentHash": content_hash,
+        "thumbnailUrl": None
     }
     
+def encode_cursor(item):
+    raw = f"{item['created_at']}|{item['id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, item_id = raw.rsplit("|", 1)
+        return created_at, int(item_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/api/items")
-async def list_items(userId: str = None, limit: int = None, offset: int = None, type: str = None):
-    items = get_all_items(userId, limit, offset, type)
-    
-    # Inject file_size for frontend performance optimization
-    for item in items:
-        item['file_size'] = 0
-        if item.get('file_path'):
-            try:
-                # file_path is like "/uploads/user/file.png"
-                # UPLOAD_DIR is absolute path to uploads folder
-                # We need to strip "/uploads" prefix to join correctly
-                rel_path = item['file_path'].replace('/uploads/', '', 1).lstrip('/')
-                full_path = os.path.join(UPLOAD_DIR, rel_path)
-                
-                if os.path.exists(full_path):
-                    item['file_size'] = os.path.getsize(full_path)
-            except Exception:
-                pass
-                
+async def list_items(response: Response, userId: str = None, limit: int = None, offset: int = None, type: str = None, cursor: str = None):
+    # file_size and media metadata are stored at ingest (no per-item filesystem calls)
+    # OPTIMIZATION: keyset pagination on (created_at, id). Pass back X-Next-Cursor
+    # instead of an offset so deep pages don't scan every earlier row.
+    items = get_all_items(userId, limit, None if cursor else offset, type, decode_cursor(cursor) if cursor else None)
+    if limit and len(items) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(items[-1])
+    response.headers["Access-Control-Expose-Headers"] = "X-Next-Cursor"
     return items
     
 def parse_search_intent(query):
@@ -377,6 +373,16 @@ def parse_search_intent(query):
     
     query = " ".join(new_words)
 
+    # --- 1b. Source Filtering ("github repos about rust", "source:github") ---
+    # Only an explicit phrase filters: "repository" alone ("notes from the
+    # repository meeting") stays a search word.
+    source_filter = None
+    source_match = re.search(r'\bsource:github\b|\bgithub\s+repo(?:s|sitory|sitories)?\b|\brepo(?:s|sitory|sitories)?\s+(?:on|from)\s+github\b', query)
+    if source_match:
+        source_filter = "github"
+        filter_desc.append("Source: GitHub")
+        query = " ".join(query.replace(source_match.group(0), " ").split())
+
     # Helper to set day range
     def set_day_range(date_obj):
         s = date_obj.replace(hour=0, minute=0, second=0, microsecond=0)
@@ -471,56 +477,20 @@ def parse_search_intent(query):
                     query = query.replace(day, "")
                     break
 
-    return query.strip(), start_date, end_date, type_filter, ", ".join(filter_desc)
-
-CHUNK_WEIGHTS = {
-    "visual": 1.5,      # OWL-ViT objects - highest precision
-    "caption": 1.3,     # BLIP description - high signal
-    "ocr": 1.0,         # document text - standard
-    "transcript": 0.7   # spoken text - high noise
-}
-
-VISUAL_HINTS = ["diagram", "image", "photo", "chart", "whiteboard", "picture", "screenshot"]
-AUDIO_HINTS = ["said", "meeting", "audio", "voice", "discussion", "podcast", "recording"]
+    return query.strip(), start_date, end_date, type_filter, source_filter, ", ".join(filter_desc)
 
 def get_keywords(text):
     return set(w.lower() for w in text.split() if len(w) > 3)
 
-def keyword_overlap_score(query_words, text):
-    if not text: return 0
-    words = set(text.lower().split())
-    return len(query_words & words)
-
-def usage_boost(access_count):
-    if not access_count: return 0.0
-    if access_count >= 20: return 0.07
-    if access_count >= 10: return 0.05
-    if access_count >= 3: return 0.03
-    return 0.0
-
-def get_modality_boost(query, chunk_type):
-    q = query.lower()
-    if any(w in q for w in VISUAL_HINTS) and chunk_type in ["visual", "caption"]:
-        return 0.05
-    if any(w in q for w in AUDIO_HINTS) and chunk_type == "transcript":
-        return 0.05
-    return 0
-
-def get_recency_boost(created_at_str):
-    try:
-        item_date = datetime.strptime(created_at_str, "%Y-%m-%d %H:%M:%S")
-        days_old = (datetime.now() - item_date).days
-        if days_old < 7: return 0.05
-        if days_old < 30: return 0.02
-    except: pass
-    return 0
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    h, rem = divmod(seconds, 3600)
+    m, s = divmod(rem, 60)
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m}:{s:02d}"
 
 @app.get("/api/search")
-async def search(q: str, userId: str = None, tags: str = None):
-    cleaned_q, start_date, end_date, type_filter, filter_desc = parse_search_intent(q)
-    
-    # Parse tags filter
-    required_tags = [t.strip().lower() for t in tags.split(',')] if tags else []
+async def search(q: str, userId: str = None, tags: str = None, tagMode: str = "all"):
+    cleaned_q, start_date, end_date, type_filter, source_filter, filter_desc = parse_search_intent(q)
     
     # --- Step 5: Query Expansion ---
     expanded_q = expand_query(cleaned_q)
@@ -533,11 +503,11 @@ async def search(q: str, userId: str = None, tags: str = None):
         
         # --- Step 8: Personal Relevance Tuning ---
         if userId:
-            user_vec = get_user_profile(userId)
-            if user_vec and q_vec is not None:
+            # Cached in memory, kept current by access_tracker
+            user_vec = access_tracker.get_profile(userId)
+            if user_vec is not None and q_vec is not None:
                 # Blend: 85% Query, 15% User Context
                 try:
-                    import numpy as np
                     q_arr = np.array(q_vec)
                     u_arr = np.array(user_vec)
                     # Simple weighted average
@@ -548,132 +518,83 @@ async def search(q: str, userId: str = None, tags: str = None):
         # Use expanded words for keyword matching to handle synonyms
         query_keywords = get_keywords(expanded_q if expanded_q else cleaned_q)
     
-    all_chunks = get_all_chunks(userId)
-    
     # --- STAGE 1: Recall (Vector Search) ---
-    candidates = []
-    
-    for chunk in all_chunks:
-        # 0. Tag Filtering (Hard Filter)
-        if required_tags:
-            item_tags = (chunk.get('tags') or "").lower()
-            # Check if ALL required tags are present in item_tags
-            if not all(rt in item_tags for rt in required_tags):
-                continue
-
-        # 1. Metadata Filtering
-        if type_filter:
-            c_type = chunk['item_type']
-            match = False
-            if type_filter == c_type: match = True
-            elif type_filter == 'link' and c_type == 'article': match = True
-            elif type_filter == 'pdf' and c_type == 'file': match = True
-            if not match: continue
-
-        if start_date and end_date:
-            try:
-                item_date = datetime.strptime(chunk['created_at'], "%Y-%m-%d %H:%M:%S")
-                if not (start_date <= item_date <= end_date):
-                    continue
-            except:
-                continue
-
-        # 2. Vector Scoring
-        score = 0
-        if q_vec is not None and chunk['embedding']:
-            try:
-                chunk_vec = json.loads(chunk['embedding'])
-                raw_score = cosine_sim(q_vec, chunk_vec)
-                # Apply Weighting based on chunk type
-                weight = CHUNK_WEIGHTS.get(chunk['chunk_type'], 1.0)
-                score = raw_score * weight
-            except: score = 0
-        
-        if score > 0.15 or (not cleaned_q): # Lowered threshold for recall stage
-             candidates.append({
-                 "item_id": chunk['item_id'],
-                 "vector_score": score,
-                 "chunk_type": chunk['chunk_type'],
-                 "text": chunk['text'],
-                 "created_at": chunk['created_at'],
-                 "item_title": chunk['title']
-             })
-
-    # Sort by vector score and keep top 60
-    candidates.sort(key=lambda x: x["vector_score"], reverse=True)
-    top_candidates = candidates[:60]
+    # OPTIMIZATION: metadata filters are boolean masks over the user's in-memory
+    # chunk arrays, intersected before scoring; only surviving rows are scored.
+    index = search_index.get_index(userId)
+    mask = index.filter_mask(
+        type_filter=type_filter,
+        start_date=start_date,
+        end_date=end_date,
+        # Tag filter: exact, case-insensitive. tagMode "all" (AND, default) or "any" (OR)
+        tags=tags.split(',') if tags else None,
+        match_any=tagMode.lower() in ("any", "or"),
+        github=True if source_filter == "github" else None
+    )
+    rows = np.flatnonzero(mask)
+
+    if cleaned_q:
+        # Weighted by chunk type (int8 tier: approximate, then exact on the best rows)
+        rows, scores = index.recall_scores(q_vec, rows)
+        keep = scores > 0.15 # Lowered threshold for recall stage
+        rows, scores = rows[keep], scores[keep]
+    else:
+        scores = np.zeros(len(rows), dtype=np.float32)
+
+    # Keep the top K (60 by default) by vector score
+    rows, scores = search_index.top_k(scores, rows, search_index.SEARCH_RECALL_K)
     
     # --- STAGE 2: Reranking (Precision) ---
-    reranked_chunks = []
-    
-    for c in top_candidates:
-        final_score = c['vector_score']
-        boosts = []
-        
-        # Keyword Boost
-        overlap = keyword_overlap_score(query_keywords, c['text'])
-        if overlap > 0:
-            boost = 0.05 * overlap
-            final_score += boost
-            boosts.append(f"+Key({overlap})")
-            
-        # Modality Boost
-        mod_boost = get_modality_boost(cleaned_q, c['chunk_type'])
-        if mod_boost > 0:
-            final_score += mod_boost
-            boosts.append("+Mode")
-            
-        # Recency Boost
-        rec_boost = get_recency_boost(c['created_at'])
-        if rec_boost > 0:
-            final_score += rec_boost
-            boosts.append("+New")
-            
-        c['final_score'] = final_score
-        c['boosts'] = " ".join(boosts)
-        reranked_chunks.append(c)
+    # OPTIMIZATION: boosts and the per-item aggregation are array operations
+    # over the candidate set; items are fetched in one batch, and only the
+    # top 20 are loaded in full. Chunk text comes from the DB for the
+    # candidates only (the index holds arrays, not payload).
+    payload = index.payload(rows)
+    final_scores, overlap, modality = search_index.rerank(index, rows, scores, cleaned_q, query_keywords,
+                                                          [p['text'] for p in payload])
 
     # Aggregation by Item (Multi-chunk evidence)
-    item_map = {}
-    for c in reranked_chunks: 
-        iid = c['item_id']
-        if iid not in item_map:
-            item_map[iid] = {
-                "chunks": [c]
-            }
-        else:
-            item_map[iid]['chunks'].append(c)
+    item_ids, best, item_scores, evidence = search_index.aggregate_items(index.item_ids[rows], final_scores)
+    priors = get_items_by_ids(item_ids.tolist(), userId, fields="id, COALESCE(static_score, 0) AS static_score")
+    found = np.array([int(iid) in priors for iid in item_ids], dtype=bool)
+    item_ids, best, item_scores, evidence = item_ids[found], best[found], item_scores[found], evidence[found]
+    
+    # --- Step 6: Recency + Usage Boost ---
+    # OPTIMIZATION: one precomputed float per item (maintained by access_tracker
+    # flushes and the worker's refresher) instead of recomputing both boosts here
+    item_scores = item_scores + np.array([priors[int(iid)]['static_score'] for iid in item_ids], dtype=np.float64)
+
+    ranked = np.argsort(-item_scores, kind="stable")[:20]
+    items = get_items_by_ids([int(item_ids[g]) for g in ranked], userId)
 
     results_list = []
-    for iid, data in item_map.items():
-        chunks = data['chunks']
-        # Find best chunk
-        best_chunk = max(chunks, key=lambda x: x['final_score'])
-        
-        # Item Score = Best Chunk + Evidence Bonus
-        item_score = best_chunk['final_score']
-        
-        # Add 0.03 for every additional supporting chunk (capped at 5)
-        evidence_count = len(chunks) - 1
-        if evidence_count > 0:
-            bonus = min(0.15, 0.03 * evidence_count)
-            item_score += bonus
-        
-        item = get_item(iid, userId)
+    for g in ranked:
+        item = items.get(int(item_ids[g]))
         if not item: continue
+        pos = best[g]
+        chunk = payload[pos]
+        item['score'] = float(item_scores[g])
+
+        boosts = []
+        if overlap[pos] > 0: boosts.append(f"+Key({overlap[pos]})")
+        if modality[pos] > 0: boosts.append("+Mode")
+        if compute_static_score(item['created_at'], 0) > 0: boosts.append("+New")
         
-        # --- Step 6: Usage Boost ---
-        u_boost = usage_boost(item.get('access_count', 0))
-        item_score += u_boost
-        
-        item['score'] = float(item_score)
+        explanation = f"Matched {chunk['chunk_type']}: \"{(chunk['text'] or '')[:100]}...\""
         
-        explanation = f"Matched {best_chunk['chunk_type']}: \"{best_chunk['text'][:100]}...\""
-        if best_chunk['boosts']:
-            explanation += f" [{best_chunk['boosts']}]"
-        if evidence_count > 0:
-            explanation += f" (+{evidence_count} more)"
-        if u_boost > 0:
+        # Deep-link into recordings (media fragment on the local file URL)
+        start_time = chunk['start_time']
+        if start_time is not None:
+            item['match_start'] = start_time
+            item['match_end'] = chunk['end_time']
+            explanation += f" @ {format_timestamp(start_time)}"
+            if item.get('file_path') and not item['file_path'].startswith('http'):
+                item['deep_link'] = f"{item['file_path']}#t={int(start_time)}"
+        if boosts:
+            explanation += f" [{' '.join(boosts)}]"
+        if evidence[g] > 0:
+            explanation += f" (+{evidence[g]} more)"
+        if (item.get('access_count') or 0) >= 3:
             explanation += f" (+UsageBoost)"
             
         if filter_desc:
@@ -682,8 +603,7 @@ async def search(q: str, userId: str = None, tags: str = None):
         item['explanation'] = explanation
         results_list.append(item)
 
-    results_list.sort(key=lambda x: x['score'], reverse=True)
-    return results_list[:20]
+    return results_list
     
     # Aggregation
     item_map = {}
@@ -727,20 +647,9 @@ async def get_single_item(item_id: int, userId: str = None):
         raise HTTPException(status_code=404, detail="Item not found")
     
     # --- Step 6 & 8: Feedback Loop ---
-    # Record access for usage boost
-    try:
-        record_access(item_id, 1)
-    except Exception as e:
-        print(f"Error recording access: {e}")
-
-    # Update user profile for personalization
-    if userId:
-        try:
-            # We run this in background or just fire and forget since it might be slow?
-            # For now, synchronous is fine as sqlite is fast enough for single user.
-            update_user_profile(userId)
-        except Exception as e:
-            print(f"Error updating user profile: {e}")
+    # OPTIMIZATION: buffered; the usage counters and the user profile (EMA)
+    # are updated in batches off the request path
+    access_tracker.record(item_id, userId)
 
     return item
 
@@ -770,6 +679,13 @@ async def update_item_endpoint(
         
     vector = generate_embedding(text_to_embed)
     update_item(item_id, title, content, tags, vector, userId)
+
+    # Refresh search chunks for edited text; unchanged chunks keep their embeddings.
+    # Only types whose chunks the worker builds from content (links are chunked
+    # from the fetched page, not the edited field).
+    if existing_item and content is not None and content != existing_item['content'] \
+            and existing_item['type'] in INCREMENTAL_TYPES:
+        await asyncio.to_thread(reindex_chunks, item_id, "ocr", list(split_blocks(content)))
     
     return {"status": "updated", "id": item_id}
         
@@ -779,7 +695,10 @@ async def delete_item_endpoint(item_id: int, userId: str = None):
     if userId and not existing_item:
         raise HTTPException(status_code=403, detail="Not authorized to delete this item")
     
+    hashes = get_content_hashes([item_id], userId)
     delete_item(item_id, userId)
+    for content_hash in hashes:
+        blob_store.release(content_hash)
     return {"status": "deleted", "id": item_id}
 
 class BulkDeleteRequest(BaseModel):
@@ -793,9 +712,16 @@ async def bulk_delete_endpoint(
     if not userId:
         raise HTTPException(status_code=403, detail="Not authorized")
     
+    hashes = get_content_hashes(request.item_ids, userId)
     delete_items(request.item_ids, userId)
+    for content_hash in hashes:
+        blob_store.release(content_hash)
     return {"status": "deleted", "count": len(request.item_ids)}
 
+@app.get("/api/stats/embedding-cache")
+async def get_embedding_cache_stats():
+    return embedding_cache_stats()
+
 @app.get("/api/processing")
 async def list_processing_items(userId: str):
     if not userId:
@@ -806,4 +732,10 @@ async def list_processing_items(userId: str):
 async def get_tags(userId: str = None):
     if not userId:
         return []
-    return get_all_tags(userId)
\ No newline at end of file
+    return get_all_tags(userId)
+
+@app.get("/api/tags/suggest")
+async def suggest_tags_endpoint(prefix: str = "", userId: str = None, limit: int = 10):
+    if not userId:
+        return []
+    return suggest_tags(userId, prefix.strip(), min(max(limit, 1), 50))
@@ -4,26 +4,51 @@ import uuid
 import json
 import re
 import mimetypes
+import time
+import hashlib
+import subprocess
 from datetime import datetime
 import numpy as np
 import pdfplumber
-import requests
-from bs4 import BeautifulSoup
 import pytesseract
 import cv2
 from PIL import Image
 import whisper
 import torch
 import gc
-import yt_dlp
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 # Static for uploads
 UPLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "uploads")
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Normalized audio cache (16 kHz mono PCM), content-addressed by source hash
+AUDIO_CACHE_DIR = os.path.join(UPLOAD_DIR, ".cache", "audio")
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_MB", "2048")) * 1024 * 1024
+os.makedirs(AUDIO_CACHE_DIR, exist_ok=True)
+
 # Global Whisper Model (Lazy Loaded)
 whisper_model = None
 
+# Whisper works on 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+# Voice Activity Detection (energy based, no extra model needed)
+VAD_FRAME_MS = 30
+VAD_MARGIN_DB = 12          # Frames this far above the noise floor count as speech
+VAD_SPEECH_DB = -35         # ...and anything louder than this always does
+VAD_MIN_SPEECH_S = 0.3      # Drop blips shorter than this
+VAD_MIN_SILENCE_S = 0.6     # Bridge pauses shorter than this
+VAD_PAD_S = 0.2             # Keep a little context around each region
+VAD_MAX_SEGMENT_S = 30.0    # Group regions up to one Whisper window
+
+# OPTIMIZATION: On CPU, long recordings are decoded segment-parallel across processes.
+# Each process holds its own model, so only fan out when there is enough speech to amortize loading.
+WHISPER_CPU_WORKERS = int(os.getenv("WHISPER_CPU_WORKERS", max(1, (os.cpu_count() or 2) // 4)))
+WHISPER_PARALLEL_MIN_S = 120.0
+whisper_pool = None
+
 def load_whisper_model():
     global whisper_model
     if whisper_model is not None:
@@ -41,17 +66,221 @@ def load_whisper_model():
         return False
 
 def unload_whisper_model():
-    global whisper_model
+    global whisper_model, whisper_pool
     print("Audio: Unloading Whisper model...")
     if whisper_model is not None:
         del whisper_model
         whisper_model = None
+
+    if whisper_pool is not None:
+        whisper_pool.shutdown(wait=True)
+        whisper_pool = None
     
     if torch.cuda.is_available():
         torch.cuda.empty_cache()
     gc.collect()
     print("Audio: Whisper model unloaded.")
 
+# (path, size, mtime) -> sha256, so a file is hashed once per process
+_hash_memo = {}
+
+def file_sha256(path, block_size=1024 * 1024):
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime)
+    if memo_key in _hash_memo:
+        return _hash_memo[memo_key]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    _hash_memo[memo_key] = h.hexdigest()
+    return _hash_memo[memo_key]
+
+def enforce_cache_size(cache_dir, max_bytes, keep=None, evictable=None):
+    """
+    Size-based eviction for a cache directory (subdirectories included).
+    Oldest mtime goes first; cache hits touch their file, so this is LRU.
+    evictable(path) can exempt files (they still count toward the size).
+    """
+    entries = []
+    total = 0
+    for root, _, names in os.walk(cache_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            if name.endswith(".tmp") or not os.path.isfile(path):
+                continue
+            st = os.stat(path)
+            total += st.st_size
+            if path != keep and (evictable is None or evictable(path)):
+                entries.append((st.st_mtime, st.st_size, path))
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+def probe_media(file_path):
+    """
+    One-time metadata for an uploaded file: size, mime type, pixel
+    dimensions (images/videos) and duration (audio/video).
+    Missing values are None; nothing here raises.
+    """
+    meta = {"file_size": None, "mime_type": None, "width": None, "height": None, "duration": None}
+    try:
+        meta["file_size"] = os.path.getsize(file_path)
+    except OSError:
+        return meta
+    meta["mime_type"] = mimetypes.guess_type(file_path)[0]
+    kind = (meta["mime_type"] or "").split("/")[0]
+
+    if kind == "image":
+        try:
+            with Image.open(file_path) as img:  # Reads the header only
+                meta["width"], meta["height"] = img.size
+        except Exception:
+            pass
+    elif kind in ("audio", "video"):
+        try:
+            res = subprocess.run(
+                ["ffprobe", "-v", "error", "-print_format", "json", "-show_format", "-show_streams", file_path],
+                capture_output=True, check=True, timeout=30
+            )
+            info = json.loads(res.stdout)
+            if info.get("format", {}).get("duration"):
+                meta["duration"] = float(info["format"]["duration"])
+            for stream in info.get("streams", []):
+                if stream.get("codec_type") == "video" and stream.get("width"):
+                    meta["width"], meta["height"] = stream["width"], stream["height"]
+                    break
+        except Exception as e:
+            print(f"[Media] ffprobe failed for {file_path}: {e}")
+    return meta
+
+def extract_audio(file_path):
+    """
+    Decodes the audio track of an audio/video file once into the cache
+    (16 kHz mono s16le PCM) and returns the cached path.
+    Retries and re-transcribes reuse it instead of decoding the container again.
+    """
+    key = file_sha256(file_path)
+    cached = os.path.join(AUDIO_CACHE_DIR, f"{key}.pcm")
+    if os.path.exists(cached):
+        os.utime(cached, None)
+        return cached
+
+    print(f"Audio: Extracting audio track from {file_path}")
+    tmp = f"{cached}.{uuid.uuid4().hex}.tmp"
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", file_path,
+        "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "-f", "s16le", "-acodec", "pcm_s16le", "-y", tmp
+    ]
+    try:
+        subprocess.run(cmd, capture_output=True, check=True)
+        os.replace(tmp, cached)
+    except subprocess.CalledProcessError as e:
+        if os.path.exists(tmp): os.remove(tmp)
+        raise RuntimeError(f"Failed to extract audio: {e.stderr.decode(errors='ignore')[-300:]}")
+
+    enforce_cache_size(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES, keep=cached)
+    return cached
+
+def load_audio_cached(file_path):
+    """
+    Same float32 waveform whisper.load_audio returns, read from the PCM cache.
+    """
+    pcm_path = extract_audio(file_path)
+    return np.fromfile(pcm_path, dtype=np.int16).astype(np.float32) / 32768.0
+
+def _init_whisper_process(threads):
+    # Runs once in each pool process: load a private CPU model
+    global whisper_model
+    torch.set_num_threads(threads)
+    whisper_model = whisper.load_model("base", device="cpu")
+
+def _get_whisper_pool():
+    global whisper_pool
+    if whisper_pool is None:
+        threads = max(1, (os.cpu_count() or 2) // WHISPER_CPU_WORKERS)
+        print(f"Audio: Starting {WHISPER_CPU_WORKERS} Whisper processes ({threads} threads each)...")
+        whisper_pool = ProcessPoolExecutor(
+            max_workers=WHISPER_CPU_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_whisper_process,
+            initargs=(threads,)
+        )
+    return whisper_pool
+
+def _decode_clip(clip, offset):
+    """
+    Transcribe one speech clip and shift Whisper's segment times by the clip offset.
+    """
+    result = whisper_model.transcribe(clip, fp16=torch.cuda.is_available(), condition_on_previous_text=False)
+    segments = []
+    for seg in result.get("segments", []):
+        text = seg["text"].strip()
+        if text:
+            segments.append({
+                "start": round(offset + seg["start"], 2),
+                "end": round(offset + seg["end"], 2),
+                "text": text
+            })
+    return segments
+
+def detect_speech_segments(audio):
+    """
+    Finds speech in a 16 kHz mono float array.
+    Returns a list of (start_s, end_s) windows of at most VAD_MAX_SEGMENT_S
+    (a single longer region is kept whole rather than cut mid-sentence).
+    """
+    frame = int(SAMPLE_RATE * VAD_FRAME_MS / 1000)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return []
+
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    energy = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    noise_floor = np.percentile(energy, 10)
+    threshold = min(noise_floor + VAD_MARGIN_DB, VAD_SPEECH_DB)
+    is_speech = energy > threshold
+
+    # Frame runs -> (start, end) regions in frames
+    edges = np.diff(np.concatenate(([0], is_speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return []
+
+    frame_s = VAD_FRAME_MS / 1000
+    min_gap = int(VAD_MIN_SILENCE_S / frame_s)
+    min_len = int(VAD_MIN_SPEECH_S / frame_s)
+
+    regions = []
+    for s, e in zip(starts, ends):
+        if regions and s - regions[-1][1] < min_gap:
+            regions[-1][1] = e
+        else:
+            regions.append([s, e])
+
+    duration = len(audio) / SAMPLE_RATE
+    spans = []
+    for s, e in regions:
+        if e - s < min_len:
+            continue
+        start = max(0.0, float(s * frame_s - VAD_PAD_S))
+        end = min(duration, float(e * frame_s + VAD_PAD_S))
+        # Group neighbours into one window to cut per-call overhead
+        if spans and end - spans[-1][0] <= VAD_MAX_SEGMENT_S:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    return spans
+
 def extract_text_from_image(path):
     print(f"Running OCR on: {path}")
     try:
@@ -113,23 +342,136 @@ def generate_video_thumbnail(video_path, thumbnail_path):
         print(f"Thumbnail Generation Error: {e}")
         return False
 
-def transcribe_audio(file_path):
+# Keyframe sampling for video vision analysis
+KEYFRAME_SAMPLE_S = 2.0             # Probe one frame every N seconds of video
+KEYFRAME_MAX_PER_MIN = 6            # Hard cap on frames sent to vision
+KEYFRAME_SCENE_THRESHOLD = 0.35     # Bhattacharyya distance that counts as a cut
+KEYFRAME_CPU_BUDGET_S = 1.5         # CPU seconds allowed per minute of video
+KEYFRAME_MAX_SIDE = 768             # Vision models downscale anyway
+
+def extract_keyframes(video_path, out_dir):
     """
-    Transcribe audio file using OpenAI Whisper.
+    Picks scene-change frames from a video for captioning.
+    Seeks from probe to probe instead of decoding every frame, compares cheap
+    HSV histograms of a downscaled frame, and stops at the frames-per-minute
+    cap or when the CPU budget for this video is spent.
+    Returns a list of {"path", "timestamp"} dicts.
+    """
+    keyframes = []
+    try:
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            print("Could not open video for keyframe extraction")
+            return []
+
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        duration_min = max(1.0, total_frames / fps / 60)
+        budget = KEYFRAME_CPU_BUDGET_S * duration_min
+        max_frames = max(1, int(KEYFRAME_MAX_PER_MIN * duration_min))
+        min_gap_s = 60.0 / KEYFRAME_MAX_PER_MIN
+        step = max(1, int(fps * KEYFRAME_SAMPLE_S))
+
+        os.makedirs(out_dir, exist_ok=True)
+        base = os.path.basename(video_path)
+        cpu_start = time.thread_time()   # This thread only; Whisper/OCR/embedding run alongside
+        prev_hist = None
+        last_kept_s = None
+
+        # Skip the first second to avoid black/fade-in frames (same idea as the thumbnail)
+        frame_idx = min(int(fps), total_frames // 10)
+        while frame_idx < total_frames and len(keyframes) < max_frames:
+            if time.thread_time() - cpu_start > budget:
+                print(f"Keyframes: CPU budget spent after {len(keyframes)} frames")
+                break
+
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            h, w = frame.shape[:2]
+            small = cv2.resize(frame, (160, max(1, int(160 * h / w))), interpolation=cv2.INTER_AREA)
+            hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+            hist = cv2.calcHist([hsv], [0, 1], None, [16, 16], [0, 180, 0, 256])
+            cv2.normalize(hist, hist)
+
+            timestamp = frame_idx / fps
+            is_cut = prev_hist is None or cv2.compareHist(prev_hist, hist, cv2.HISTCMP_BHATTACHARYYA) > KEYFRAME_SCENE_THRESHOLD
+            prev_hist = hist
+
+            if is_cut and (last_kept_s is None or timestamp - last_kept_s >= min_gap_s):
+                scale = KEYFRAME_MAX_SIDE / max(h, w)
+                if scale < 1:
+                    frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+                path = os.path.join(out_dir, f"{base}_{int(timestamp * 1000)}.jpg")
+                cv2.imwrite(path, frame)
+                keyframes.append({"path": path, "timestamp": round(timestamp, 2)})
+                last_kept_s = timestamp
+
+            frame_idx += step
+
+        cap.release()
+        print(f"Keyframes: {len(keyframes)} selected from {video_path}")
+    except Exception as e:
+        print(f"Keyframe Extraction Error: {e}")
+    return keyframes
+
+def transcribe_segments(file_path, on_segments=None):
+    """
+    Transcribe only the speech in an audio/video file.
+    Runs VAD first, decodes the speech windows (in parallel on CPU for long
+    recordings) and stitches them back in order.
+    If given, on_segments(segments, done_s, total_s) is called after each
+    window so callers can index partial transcripts and report progress.
+    Returns a list of {"start", "end", "text"} dicts with absolute timestamps.
     """
     global whisper_model
     if not whisper_model:
         # Auto-load if not loaded (fallback, though orchestrator should handle)
         if not load_whisper_model():
-             return "Transcription unavailable (Model failed to load)."
-        
+            raise RuntimeError("Whisper model failed to load")
+
     print(f"Transcribing audio: {file_path}")
+    audio = load_audio_cached(file_path)
+    spans = detect_speech_segments(audio)
+    speech_s = sum(e - s for s, e in spans)
+    print(f"VAD: {len(spans)} speech windows, {speech_s:.0f}s of {len(audio) / SAMPLE_RATE:.0f}s")
+
+    clips = [(audio[int(s * SAMPLE_RATE):int(e * SAMPLE_RATE)], s) for s, e in spans]
+    use_pool = (
+        not torch.cuda.is_available()
+        and WHISPER_CPU_WORKERS > 1
+        and len(clips) > 1
+        and speech_s >= WHISPER_PARALLEL_MIN_S
+    )
+
+    if use_pool:
+        # map() submits every window up front but yields in order, so partial
+        # results stay contiguous for the caller
+        pool = _get_whisper_pool()
+        parts = pool.map(_decode_clip, [c for c, _ in clips], [o for _, o in clips])
+    else:
+        parts = (_decode_clip(clip, offset) for clip, offset in clips)
+
+    segments = []
+    done_s = 0.0
+    for (start, end), part in zip(spans, parts):
+        segments.extend(part)
+        done_s += end - start
+        if on_segments:
+            on_segments(part, done_s, speech_s)
+
+    print(f"Transcription complete. {len(segments)} segments.")
+    return segments
+
+def transcribe_audio(file_path):
+    """
+    Transcribe audio file using OpenAI Whisper.
+    """
     try:
-        # Run transcription
-        result = whisper_model.transcribe(file_path)
-        text = result["text"].strip()
-        print(f"Transcription complete. Length: {len(text)}")
-        return text
+        segments = transcribe_segments(file_path)
+        return " ".join(seg["text"] for seg in segments)
 
     except Exception as e:
         print(f"Transcription Error: {e}")
@@ -171,171 +513,20 @@ def extract_text(file_path, type, content=None):
         text = transcribe_audio(file_path)
         return text, None, None
     elif type == "link" or (type == "video" and content and content.startswith("http")):
-        # Check for YouTube URL first for optimized metadata extraction
+        # Check for YouTube URL first for optimized metadata extraction (cached per video id)
         if content and ("youtube.com" in content or "youtu.be" in content):
+            from .youtube_meta import extract_youtube  # lazy: it imports this module via link_fetcher
             try:
-                print(f"Extracting YouTube metadata: {content}")
-                ydl_opts = {
-                    'quiet': True,
-                    'no_warnings': True,
-                    'skip_download': True,
-                    'ignoreerrors': True,  # Prevent crashing on errors
-                    'writesubtitles': True, # Try to get subtitles metadata
-                    'writeautomaticsub': True
-                }
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(content, download=False)
-                    
-                    if not info:
-                        raise Exception("yt-dlp returned no info")
-
-                    print(f"[DEBUG] Keys in info: {info.keys()}")
-                    title = info.get('title')
-                    # Try multiple keys for description
-                    desc = info.get('description') or info.get('full_description') or info.get('comment') or info.get('caption')
-                    print(f"[DEBUG] Extracted description length: {len(desc) if desc else 0}")
-                    
-                    uploader = info.get('uploader')
-                    upload_date = info.get('upload_date')
-                    thumbnail = info.get('thumbnail')
-                    tags = info.get('tags', [])
-                    
-                    # Try to extract captions text (simple approach)
-                    captions_text = ""
-                    try:
-                        # automatic_captions is a dict: {lang: [{url, ext}, ...]}
-                        # We won't download them here to keep it fast/light as requested,
-                        # but we can check if they exist to note it.
-                        # Real extraction of caption text without download is hard with just extract_info.
-                        pass 
-                    except: pass
-
-                    # Format content
-                    final_parts = [f"URL: {content}"]
-                    if title: final_parts.append(f"Title: {title}")
-                    
-                    if uploader: final_parts.append(f"Channel: {uploader}")
-                    if upload_date: final_parts.append(f"Date: {upload_date}")
-                    if tags: final_parts.append(f"Tags: {', '.join(tags)}")
-                    
-                    if desc: 
-                        final_parts.append("\n--- Video Description ---\n")
-                        final_parts.append(desc)
-                    
-                    return "\n".join(final_parts), title, thumbnail
+                result = extract_youtube(content)
+                if result:
+                    return result
             except Exception as e:
                 print(f"YouTube Metadata Extraction Failed: {e}")
-                # Fallback to standard request logic below if yt-dlp fails
-        
-        try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            resp = requests.get(content, headers=headers, timeout=10)
-            soup = BeautifulSoup(resp.text, 'html.parser')
-            
-            meta = {
-                "title": None,
-                "description": None,
-                "author": None,
-                "date": None,
-                "site_name": None,
-                "keywords": None,
-                "image": None
-            }
-
-            def get_content(props, attrs=None):
-                if not attrs: attrs = {}
-                for prop in props:
-                    tag = soup.find("meta", property=prop) or soup.find("meta", attrs={**attrs, "name": prop})
-                    if tag and tag.get("content"):
-                        return tag.get("content").strip()
-                return None
-
-            meta["title"] = get_content(["og:title", "twitter:title"]) or (soup.title.string.strip() if soup.title else None)
-            meta["description"] = get_content(["og:description", "twitter:description", "description"])
-            meta["site_name"] = get_content(["og:site_name"])
-            meta["author"] = get_content(["article:author", "author", "twitter:creator"])
-            meta["date"] = get_content(["article:published_time", "date", "pubdate", "og:pubdate"])
-            meta["keywords"] = get_content(["keywords", "article:tag"])
-            meta["image"] = get_content(["og:image", "twitter:image"])
-
-            if not meta["date"] or not meta["author"] or not meta["title"] or not meta["description"]:
-                try:
-                    ld_scripts = soup.find_all("script", type="application/ld+json")
-                    for script in ld_scripts:
-                        if script.string:
-                            try:
-                                data = json.loads(script.string)
-                                if isinstance(data, list): data = data[0]
-                                if isinstance(data, dict):
-                                    if not meta["date"]:
-                                        meta["date"] = data.get("datePublished") or data.get("dateCreated") or data.get("uploadDate")
-                                    if not meta["author"]:
-                                        auth = data.get("author")
-                                        if isinstance(auth, dict): meta["author"] = auth.get("name")
-                                        elif isinstance(auth, list) and auth: meta["author"] = auth[0].get("name")
-                                        elif isinstance(auth, str): meta["author"] = auth
-                                    if not meta["image"]:
-                                         meta["image"] = data.get("image") or data.get("thumbnailUrl")
-                                    if not meta["title"]:
-                                        meta["title"] = data.get("name") or data.get("headline")
-                                    if not meta["description"]:
-                                        meta["description"] = data.get("description") or data.get("articleBody")
-                            except: pass
-                except: pass
-
-            # Fallback for title/desc if still empty
-            if not meta["title"] and soup.title:
-                meta["title"] = soup.title.string.strip()
-            
-            # Clean up title (remove site names)
-            if meta["title"]:
-                separators = [" | ", " - ", " : ", " • ", " on Instagram", " on TikTok"]
-                for sep in separators:
-                    if sep in meta["title"]:
-                         # Check if the part after separator is the site name or similar generic text
-                         parts = meta["title"].split(sep)
-                         if len(parts) > 1:
-                             # Heuristic: if the last part is short or matches site name, remove it
-                             last = parts[-1].strip().lower()
-                             if last in ["instagram", "tiktok", "youtube", "twitter", "x", "facebook", "linkedin"] or len(last) < 15:
-                                 meta["title"] = sep.join(parts[:-1]).strip()
-
-            page_title = meta["title"]
-
-            for script in soup(["script", "style", "nav", "footer", "header", "aside"]):
-                script.extract()
-            
-            body_text = soup.get_text()
-            lines = (line.strip() for line in body_text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            clean_body = "\n".join(chunk for chunk in chunks if chunk)
-            
-            # Find links in body text
-            urls = re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', clean_body)
-            for url in urls:
-                extracted_links.add(url)
-
-            final_parts = [f"URL: {content}"]
-            if meta["title"]: final_parts.append(f"Title: {meta['title']}")
-            if meta["description"]: final_parts.append(f"Description: {meta['description']}")
-            if meta["author"]: final_parts.append(f"Author: {meta['author']}")
-            if meta["date"]: final_parts.append(f"Date: {meta['date']}")
-            if meta["site_name"]: final_parts.append(f"Site: {meta['site_name']}")
-            if meta["keywords"]: final_parts.append(f"Keywords: {meta['keywords']}")
-            
-            final_parts.append("\n--- Content ---\n")
-            final_parts.append(clean_body[:7000])
-            
-            if extracted_links:
-                final_parts.append("\n\n--- Extracted Links ---\n" + "\n".join(list(extracted_links)[:20])) # Limit to 20 links
+            # Fallback to standard request logic below if yt-dlp fails
 
-            return "\n".join(final_parts), page_title, meta["image"]
-
-        except Exception as e:
-            print(f"Link Extraction Error: {e}")
-            return content, None, None
+        # Generic pages go through the pooled/cached fetcher
+        from .link_fetcher import extract_link
+        return extract_link(content)
     elif type in ["note", "text"]:
         return content or "", None, None
     return content or "", None, None
\ No newline at end of file
@@ -0,0 +1,164 @@
+import os
+import hashlib
+import threading
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor, Future
+from PIL import Image
+from .media_utils import UPLOAD_DIR, enforce_cache_size
+
+# Resized/re-encoded variants of uploads for grid views, generated on first request
+VARIANT_CACHE_DIR = os.path.join(UPLOAD_DIR, ".cache", "variants")
+VARIANT_CACHE_MAX_BYTES = int(os.getenv("VARIANT_CACHE_MAX_MB", "1024")) * 1024 * 1024
+VARIANT_EVICT_EVERY = 50   # Check the cap after this many new variants
+VARIANT_WORKERS = int(os.getenv("VARIANT_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+os.makedirs(VARIANT_CACHE_DIR, exist_ok=True)
+
+# Requested widths snap to these so the cache stays small and hit rates high
+WIDTH_BUCKETS = (160, 320, 480, 640, 960, 1280, 1920)
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".tiff", ".avif", ".heic"}
+VIDEO_EXTS = {".mp4", ".mov", ".avi", ".mkv", ".wmv", ".webm"}
+
+FORMATS = {
+    "avif": ("AVIF", "image/avif", {"quality": 55}),
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 82, "progressive": True, "optimize": True}),
+}
+
+# AVIF needs a Pillow built with libavif (11.2+) or the pillow-avif-plugin
+try:
+    from PIL import features
+    AVIF_AVAILABLE = bool(features.check("avif"))
+except Exception:
+    AVIF_AVAILABLE = False
+if not AVIF_AVAILABLE:
+    try:
+        import pillow_avif  # noqa: F401
+        AVIF_AVAILABLE = True
+    except ImportError:
+        pass
+
+# Older mimetypes tables lack these; file_server relies on them for Content-Type
+mimetypes.add_type("image/avif", ".avif")
+mimetypes.add_type("image/webp", ".webp")
+
+variant_pool = ThreadPoolExecutor(max_workers=VARIANT_WORKERS)
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+_writes_since_evict = 0
+
+def bucket_width(width):
+    for bucket in WIDTH_BUCKETS:
+        if width <= bucket:
+            return bucket
+    return WIDTH_BUCKETS[-1]
+
+def negotiate_format(accept, requested=None):
+    if requested:
+        requested = "jpeg" if requested == "jpg" else requested
+        if requested in FORMATS and (requested != "avif" or AVIF_AVAILABLE):
+            return requested
+    accept = (accept or "").lower()
+    if AVIF_AVAILABLE and "image/avif" in accept:
+        return "avif"
+    if "image/webp" in accept:
+        return "webp"
+    return "jpeg"
+
+def source_kind(full_path):
+    ext = os.path.splitext(full_path)[1].lower()
+    if ext in IMAGE_EXTS: return "image"
+    if ext in VIDEO_EXTS: return "video"
+    if ext == ".pdf": return "pdf"
+    return None
+
+def _load_source(full_path, kind, width):
+    if kind == "image":
+        img = Image.open(full_path)
+        img.draft("RGB", (width * 2, width * 2))  # Cheap JPEG pre-scaling
+        return img
+
+    if kind == "video":
+        # Reuse the upload-time thumbnail; otherwise grab a frame
+        thumb = os.path.join(os.path.dirname(full_path), "thumbnails", f"{os.path.basename(full_path)}.jpg")
+        if os.path.exists(thumb):
+            return Image.open(thumb)
+        import cv2
+        cap = cv2.VideoCapture(full_path)
+        try:
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.set(cv2.CAP_PROP_POS_FRAMES, min(30, total_frames // 10))
+            ret, frame = cap.read()
+        finally:
+            cap.release()
+        if not ret:
+            raise ValueError("could not read a video frame")
+        return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+    # PDF: render only the first page, at roughly the target width
+    import pdfplumber
+    with pdfplumber.open(full_path) as pdf:
+        page = pdf.pages[0]
+        resolution = max(36, min(300, int(72 * width / float(page.width or 612))))
+        return page.to_image(resolution=resolution).original.copy()
+
+def _render(full_path, kind, width, fmt, out_path):
+    global _writes_since_evict
+    img = _load_source(full_path, kind, width)
+    if img.mode in ("RGBA", "LA", "P"):
+        # Flatten transparency onto white (JPEG has no alpha and black looks broken)
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        img = background
+    img = img.convert("RGB")
+    if img.width > width:  # Never upscale
+        img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+
+    pil_format, _, params = FORMATS[fmt]
+    tmp_path = f"{out_path}.tmp"
+    img.save(tmp_path, format=pil_format, **params)
+    os.replace(tmp_path, out_path)
+
+    with _in_flight_lock:
+        _writes_since_evict += 1
+        should_evict = _writes_since_evict >= VARIANT_EVICT_EVERY
+        if should_evict:
+            _writes_since_evict = 0
+    if should_evict:
+        enforce_cache_size(VARIANT_CACHE_DIR, VARIANT_CACHE_MAX_BYTES, keep=out_path)
+    return out_path
+
+def get_variant(full_path, width, fmt):
+    """
+    Returns a Future resolving to the cached variant's path. The key includes
+    the source's size/mtime, so a replaced source never serves a stale variant.
+    Concurrent requests for the same variant share one render.
+    """
+    kind = source_kind(full_path)
+    if not kind:
+        raise ValueError("unsupported source type")
+    st = os.stat(full_path)
+    key = hashlib.sha256(f"{os.path.abspath(full_path)}|{st.st_size}|{st.st_mtime_ns}|{width}|{fmt}".encode("utf-8")).hexdigest()
+    out_path = os.path.join(VARIANT_CACHE_DIR, f"{key}.{fmt}")
+
+    with _in_flight_lock:
+        fut = _in_flight.get(key)
+        if fut is not None:
+            return fut
+        if os.path.exists(out_path):
+            try:
+                os.utime(out_path, None)  # LRU touch
+            except OSError:
+                pass
+            fut = Future()
+            fut.set_result(out_path)
+            return fut
+        fut = variant_pool.submit(_render, full_path, kind, width, fmt, out_path)
+        _in_flight[key] = fut
+    fut.add_done_callback(lambda _: _forget(key))
+    return fut
+
+def _forget(key):
+    with _in_flight_lock:
+        _in_flight.pop(key, None)
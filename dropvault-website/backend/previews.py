@@ -0,0 +1,155 @@
+import os
+import io
+import re
+import hashlib
+import threading
+from urllib.parse import urljoin, urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from .media_utils import UPLOAD_DIR, enforce_cache_size
+from .link_fetcher import session, host_limiter, LINK_TIMEOUT_S
+
+# Local copies of remote preview images (og:image, video thumbnails), keyed by URL hash:
+# /uploads/previews/<2 hex>/<sha256>_640.webp. Items reference these paths, so
+# the source URL is kept under .cache/preview_sources and an evicted preview is
+# fetched again when it is next requested (ensure_preview).
+PREVIEW_DIR = os.path.join(UPLOAD_DIR, "previews")
+PREVIEW_SOURCE_DIR = os.path.join(UPLOAD_DIR, ".cache", "preview_sources")
+PREVIEW_WIDTH = 640
+PREVIEW_MAX_SOURCE_BYTES = int(os.getenv("PREVIEW_MAX_SOURCE_MB", "10")) * 1024 * 1024
+PREVIEW_CACHE_MAX_BYTES = int(os.getenv("PREVIEW_CACHE_MAX_MB", "512")) * 1024 * 1024
+PREVIEW_EVICT_EVERY = 50   # Check the cap after this many new previews
+PREVIEW_CONCURRENCY = int(os.getenv("PREVIEW_CONCURRENCY", "4"))
+os.makedirs(PREVIEW_DIR, exist_ok=True)
+os.makedirs(PREVIEW_SOURCE_DIR, exist_ok=True)
+
+PREVIEW_PATH_RE = re.compile(rf"^previews/[0-9a-f]{{2}}/([0-9a-f]{{64}})_{PREVIEW_WIDTH}\.webp$")
+
+preview_pool = ThreadPoolExecutor(max_workers=PREVIEW_CONCURRENCY)
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+_writes_since_evict = 0
+
+def preview_location(key, width=PREVIEW_WIDTH, ext="webp"):
+    rel = f"previews/{key[:2]}/{key}_{width}.{ext}"
+    return os.path.join(UPLOAD_DIR, rel), f"/uploads/{rel}"
+
+def _source_path(key):
+    return os.path.join(PREVIEW_SOURCE_DIR, key)
+
+def _evictable(path):
+    m = PREVIEW_PATH_RE.match(os.path.relpath(path, UPLOAD_DIR).replace(os.sep, "/"))
+    # Other sizes/formats (written by earlier versions) are never served; a
+    # preview cached before sources were recorded couldn't be fetched again
+    return not m or os.path.exists(_source_path(m.group(1)))
+
+def _download(url):
+    host_limiter.wait(urlsplit(url).netloc.lower())
+    with session.get(url, timeout=LINK_TIMEOUT_S, stream=True) as res:
+        if res.status_code != 200:
+            raise ValueError(f"HTTP {res.status_code}")
+        if not res.headers.get("Content-Type", "image/").lower().startswith("image/"):
+            raise ValueError(f"not an image ({res.headers.get('Content-Type')})")
+        body = bytearray()
+        for block in res.iter_content(64 * 1024):
+            body.extend(block)
+            if len(body) > PREVIEW_MAX_SOURCE_BYTES:
+                raise ValueError("image too large")
+    return bytes(body)
+
+def _render(key, url):
+    global _writes_since_evict
+    img = Image.open(io.BytesIO(_download(url)))
+    img.draft("RGB", (PREVIEW_WIDTH * 2, PREVIEW_WIDTH * 2))  # Cheap JPEG pre-scaling
+    if img.mode in ("RGBA", "LA", "P"):
+        # Flatten transparency onto white (black looks broken)
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        img = background
+    img = img.convert("RGB")
+    if img.width > PREVIEW_WIDTH:  # Never upscale
+        img = img.resize((PREVIEW_WIDTH, max(1, round(img.height * PREVIEW_WIDTH / img.width))), Image.LANCZOS)
+
+    with open(_source_path(key), "w") as f:
+        f.write(url)
+    path, local_url = preview_location(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    img.save(tmp_path, format="WEBP", quality=80, method=4)
+    os.replace(tmp_path, path)
+
+    with _in_flight_lock:
+        _writes_since_evict += 1
+        should_evict = _writes_since_evict >= PREVIEW_EVICT_EVERY
+        if should_evict:
+            _writes_since_evict = 0
+    if should_evict:
+        enforce_cache_size(PREVIEW_DIR, PREVIEW_CACHE_MAX_BYTES, keep=path, evictable=_evictable)
+    return local_url
+
+def _fetch(key, url):
+    """Renders the preview for url; concurrent calls for the same key share one download."""
+    with _in_flight_lock:
+        fut = _in_flight.get(key)
+        if fut is None:
+            fut = preview_pool.submit(_render, key, url)
+            _in_flight[key] = fut
+    try:
+        return fut.result()
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+
+def cache_preview(image_url, page_url=None):
+    """
+    Downloads a remote preview image once and stores a resized WebP copy.
+    Returns the local /uploads/ URL, or the original URL if it couldn't be cached.
+    Concurrent calls for the same image share one download.
+    """
+    # ld+json "image" can be an ImageObject or a list of either form
+    if isinstance(image_url, list):
+        image_url = image_url[0] if image_url else None
+    if isinstance(image_url, dict):
+        image_url = image_url.get("url") or image_url.get("contentUrl")
+    if not isinstance(image_url, str):
+        return None
+    if not image_url or image_url.startswith("/uploads/"):
+        return image_url
+    url = urljoin(page_url, image_url) if page_url else image_url
+    if not url.startswith(("http://", "https://")):
+        return image_url
+
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    path, local_url = preview_location(key)
+    if os.path.exists(path):
+        return local_url
+    try:
+        return _fetch(key, url)
+    except Exception as e:
+        print(f"[Previews] Could not cache {url}: {e}")
+        return url
+
+def ensure_preview(rel_path):
+    """
+    Called before serving /uploads/previews/...: touches a cached preview
+    (LRU) or fetches an evicted one again from its recorded source.
+    """
+    m = PREVIEW_PATH_RE.match(rel_path)
+    if not m:
+        return
+    key = m.group(1)
+    path, _ = preview_location(key)
+    try:
+        os.utime(path, None)
+        return
+    except OSError:
+        pass
+    if not os.path.exists(_source_path(key)):
+        return
+    try:
+        with open(_source_path(key)) as f:
+            url = f.read().strip()
+        _fetch(key, url)
+    except Exception as e:
+        print(f"[Previews] Could not restore {rel_path}: {e}")
@@ -0,0 +1,158 @@
+import os
+import time
+import zlib
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from .database import get_sync_candidates
+
+# Total provider syncs running at once (across all providers)
+SYNC_MAX_CONCURRENCY = int(os.getenv("SYNC_MAX_CONCURRENCY", "4"))
+SYNC_TICK_S = 60
+
+# Each account gets a stable offset of up to this fraction of the interval,
+# which shards accounts across the window instead of all coming due together
+SYNC_JITTER_FRACTION = 0.25
+# Never-synced accounts are staggered over this many seconds after connecting
+SYNC_FIRST_STAGGER_S = 600
+# Accounts with activity in the last week jump ahead of idle ones
+SYNC_ACTIVE_DAYS = 7
+SYNC_ACTIVE_WEIGHT = 2.0
+
+def _parse_ts(value):
+    if not value:
+        return None
+    try:
+        # Stored as naive UTC (datetime.utcnow / CURRENT_TIMESTAMP)
+        return datetime.fromisoformat(str(value)).replace(tzinfo=timezone.utc).timestamp()
+    except ValueError:
+        return None
+
+def _fraction(key):
+    # Stable pseudo-random fraction in [0, 1) per account
+    return (zlib.crc32(key.encode("utf-8")) % 10000) / 10000.0
+
+class SyncScheduler:
+    """
+    Schedules periodic syncs of connected accounts.
+    Providers register a handler (called with a user_id, expected to update
+    last_synced_at on success), a sync interval and a concurrency limit.
+    Each tick the scheduler works out who is due (with a per-account jittered
+    offset), orders them by weighted staleness and dispatches as many as the
+    global and per-provider limits allow. Manual requests jump the queue.
+    """
+    def __init__(self, max_concurrency=SYNC_MAX_CONCURRENCY, tick_s=SYNC_TICK_S):
+        self.providers = {}
+        self.max_concurrency = max_concurrency
+        self.tick_s = tick_s
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrency)
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.running = False
+        self.in_flight = set()      # (provider, user_id)
+        self.manual = []            # (provider, user_id) requested explicitly, FIFO
+        self.failures = {}          # (provider, user_id) -> (count, retry_at)
+        self.finished = {}          # (provider, user_id) -> last completed run (guards handlers that don't record one)
+
+    def register(self, name, handler, interval_hours=24, max_concurrency=2):
+        self.providers[name] = {
+            "handler": handler,
+            "interval_s": interval_hours * 3600,
+            "max_concurrency": max_concurrency
+        }
+
+    def request_sync(self, provider, user_id):
+        with self.lock:
+            if (provider, user_id) not in self.manual:
+                self.manual.append((provider, user_id))
+        self.wake.set()
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        print(f"[Scheduler] Started. Providers: {', '.join(self.providers)} (max {self.max_concurrency} concurrent syncs).")
+        while self.running:
+            try:
+                self.dispatch(self.plan())
+            except Exception as e:
+                print(f"[Scheduler] Error: {e}")
+            self.wake.wait(self.tick_s)
+            self.wake.clear()
+
+    def plan(self):
+        """
+        Returns due (priority, provider, user_id) entries, most urgent first.
+        """
+        now = time.time()
+        due = []
+        for name, provider in self.providers.items():
+            interval = provider["interval_s"]
+            for row in get_sync_candidates(name):
+                key = (name, row["user_id"])
+                failure = self.failures.get(key)
+                if failure and failure[1] > now:
+                    continue
+
+                last_synced = _parse_ts(row["last_synced_at"])
+                if key in self.finished:
+                    last_synced = max(last_synced or 0, self.finished[key])
+                if last_synced is None:
+                    connected = _parse_ts(row["connected_at"]) or now
+                    due_at = connected + _fraction(f"{name}:{row['user_id']}") * SYNC_FIRST_STAGGER_S
+                else:
+                    due_at = last_synced + interval * (1 + SYNC_JITTER_FRACTION * _fraction(f"{name}:{row['user_id']}"))
+                if due_at > now:
+                    continue
+
+                staleness = (now - due_at) / interval
+                last_active = _parse_ts(row["last_active"])
+                if last_active and now - last_active < SYNC_ACTIVE_DAYS * 86400:
+                    staleness *= SYNC_ACTIVE_WEIGHT
+                due.append((staleness, name, row["user_id"]))
+
+        due.sort(key=lambda x: x[0], reverse=True)
+        return due
+
+    def dispatch(self, due):
+        with self.lock:
+            # Manual requests first, then scheduled ones by priority
+            manual_keys = set(self.manual)
+            queue = self.manual + [(p, u) for _, p, u in due]
+            self.manual = []
+            deferred = []
+            for provider, user_id in queue:
+                key = (provider, user_id)
+                if provider not in self.providers:
+                    continue
+                if key in self.in_flight:
+                    # A "sync now" during a running sync runs again once it finishes
+                    if key in manual_keys:
+                        deferred.append(key)
+                    continue
+                running = sum(1 for p, _ in self.in_flight if p == provider)
+                if len(self.in_flight) >= self.max_concurrency or running >= self.providers[provider]["max_concurrency"]:
+                    deferred.append(key)
+                    continue
+                self.in_flight.add(key)
+                self.pool.submit(self._run_sync, provider, user_id)
+            # Manual requests that didn't fit (or are running) wait for the next free slot
+            self.manual = [key for key in dict.fromkeys(deferred) if key in manual_keys]
+
+    def _run_sync(self, provider, user_id):
+        key = (provider, user_id)
+        try:
+            self.providers[provider]["handler"](user_id)
+            self.failures.pop(key, None)
+            self.finished[key] = time.time()
+        except Exception as e:
+            count = self.failures.get(key, (0, 0))[0] + 1
+            backoff = min(300 * 2 ** count, self.providers[provider]["interval_s"])
+            self.failures[key] = (count, time.time() + backoff)
+            print(f"[Scheduler] {provider} sync failed for {user_id} (retry in {backoff}s): {e}")
+        finally:
+            with self.lock:
+                self.in_flight.discard(key)
+            # A slot freed up: let the loop dispatch the next account
+            self.wake.set()
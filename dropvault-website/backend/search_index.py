@@ -0,0 +1,653 @@
+import os
+import copy
+import json
+import time
+import shutil
+import hashlib
+import calendar
+import threading
+from collections import OrderedDict, Counter
+from datetime import datetime
+import numpy as np
+from .database import (
+    get_all_chunks, get_index_generation, get_user_item_tags, get_chunk_embeddings, get_chunk_payloads,
+    get_index_log, get_index_log_seq, get_index_log_users, truncate_index_log, get_db_path,
+)
+
+# In-memory, per-user search arrays. One row per chunk:
+#   embeddings  float32 (n, d), L2-normalized (zero rows for chunks without a vector)
+#   type codes  per item type, so type filters are a vectorized isin
+#   created_at  epoch seconds (int64), for date-range masks
+#   tag masks   one boolean mask per tag, built on first use
+# Filters are intersected into a single mask before any vector math, so a
+# narrow filter means fewer rows scored. Chunk text and display fields are not
+# held here; search reads them from the DB for the candidate rows only.
+SEARCH_INDEX_MAX_USERS = int(os.getenv("SEARCH_INDEX_MAX_USERS", "32"))
+SEARCH_RECALL_K = int(os.getenv("SEARCH_RECALL_K", "60"))   # Candidates passed to the rerank stage
+
+# Optional int8 tier: SEARCH_QUANTIZE=int8 keeps chunk vectors as int8 codes
+# with a per-dimension scale (4x less memory than float32). Recall ranks rows
+# on the approximate score, then the best SEARCH_RESCORE_K are re-scored with
+# exact float vectors read from the chunks table. Each rescored row is a JSON
+# parse, so the depth is kept small: past ~50 recall no longer improves while
+# the read grows linearly. Keep it above SEARCH_RECALL_K. See bench_quantized.py.
+SEARCH_QUANTIZE = os.getenv("SEARCH_QUANTIZE", "").lower() == "int8"
+SEARCH_RESCORE_K = int(os.getenv("SEARCH_RESCORE_K", "100"))
+QUANTIZE_BLOCK_ROWS = 4096   # Rows decoded to float per step when scoring int8 (stays in cache)
+
+# On-disk snapshots: a built index is saved as .npy files per user and
+# memory-mapped on the next start, so the first search after a restart maps
+# files instead of parsing every chunk's JSON embedding. Changes since the
+# snapshot come from index_log (written by DB triggers): changed rows are
+# tombstoned and their current versions appended as an in-memory tail. The
+# compactor periodically rebuilds indexes that carry a tail, re-snapshots
+# them and truncates the log. index_generation stays the per-search check.
+# With SEARCH_SNAPSHOTS=0 cached indexes still catch up from the log, and the
+# compactor trims it to what they have applied.
+SEARCH_SNAPSHOTS = os.getenv("SEARCH_SNAPSHOTS", "1") != "0"
+SEARCH_SNAPSHOT_DIR = os.getenv("SEARCH_SNAPSHOT_DIR", os.path.join(os.path.dirname(get_db_path()), "search_snapshots"))
+SNAPSHOT_COMPACT_S = int(os.getenv("SNAPSHOT_COMPACT_S", "300"))
+SNAPSHOT_VERSION = 1
+
+# Per-row arrays (one .npy file each in a snapshot)
+ROW_ARRAYS = ["chunk_ids", "item_ids", "chunk_weights", "chunk_type_codes", "type_codes",
+              "created_epoch", "date_valid", "has_embedding"]
+
+# Search type filter -> item types it covers
+TYPE_FILTER_ALIASES = {"link": ["link", "article"], "pdf": ["pdf", "file"]}
+
+GITHUB_TAG = "github"
+
+CHUNK_WEIGHTS = {
+    "visual": 1.5,      # OWL-ViT objects - highest precision
+    "caption": 1.3,     # BLIP description - high signal
+    "ocr": 1.0,         # document text - standard
+    "transcript": 0.7   # spoken text - high noise
+}
+
+VISUAL_HINTS = ["diagram", "image", "photo", "chart", "whiteboard", "picture", "screenshot"]
+AUDIO_HINTS = ["said", "meeting", "audio", "voice", "discussion", "podcast", "recording"]
+
+def _epoch(created_at):
+    # Parsed once per build; timegm keeps the naive timestamp as-is so it
+    # compares like the naive datetimes parse_search_intent produces.
+    try:
+        return to_epoch(datetime.strptime(created_at, "%Y-%m-%d %H:%M:%S"))
+    except (TypeError, ValueError):
+        return None
+
+def to_epoch(dt):
+    return calendar.timegm(dt.timetuple())
+
+def quantize(embeddings):
+    """float32 (n, d) -> (int8 codes, float32 per-dimension scale), symmetric."""
+    scale = np.abs(embeddings).max(axis=0) / 127.0 if len(embeddings) else np.ones(embeddings.shape[1], dtype=np.float32)
+    scale[scale == 0] = 1.0
+    codes = np.clip(np.rint(embeddings / scale), -127, 127).astype(np.int8)
+    return codes, scale.astype(np.float32)
+
+def approx_scores(codes, scale, q, rows):
+    """q . (codes * scale) for the given rows, decoding a block of rows at a time."""
+    qs = (q * scale).astype(np.float32)
+    if len(rows) * 4 >= len(codes):
+        # Dense selection: stream contiguous slices (no gather copy), then pick rows
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), QUANTIZE_BLOCK_ROWS):
+            out[start:start + QUANTIZE_BLOCK_ROWS] = codes[start:start + QUANTIZE_BLOCK_ROWS].astype(np.float32) @ qs
+        return out[rows]
+    out = np.empty(len(rows), dtype=np.float32)
+    for start in range(0, len(rows), QUANTIZE_BLOCK_ROWS):
+        block = rows[start:start + QUANTIZE_BLOCK_ROWS]
+        out[start:start + len(block)] = codes[block].astype(np.float32) @ qs
+    return out
+
+def _encode_rows(rows, type_names, chunk_type_names, dim):
+    """
+    get_all_chunks rows -> (per-row arrays, normalized float32 vectors,
+    type_names, chunk_type_names, dim). Name lists are extended with any new
+    names so codes stay stable when rows are appended to an index.
+    """
+    type_names, chunk_type_names = list(type_names), list(chunk_type_names)
+    for r in rows:
+        if (r['item_type'] or "") not in type_names:
+            type_names.append(r['item_type'] or "")
+        if (r['chunk_type'] or "") not in chunk_type_names:
+            chunk_type_names.append(r['chunk_type'] or "")
+    type_code = {name: i for i, name in enumerate(type_names)}
+    chunk_type_code = {name: i for i, name in enumerate(chunk_type_names)}
+
+    n = len(rows)
+    epochs = [_epoch(r['created_at']) for r in rows]
+    arrays = {
+        "chunk_ids": np.fromiter((r['id'] for r in rows), dtype=np.int64, count=n),
+        "item_ids": np.fromiter((r['item_id'] for r in rows), dtype=np.int64, count=n),
+        "chunk_weights": np.fromiter((CHUNK_WEIGHTS.get(r['chunk_type'], 1.0) for r in rows), dtype=np.float32, count=n),
+        "chunk_type_codes": np.fromiter((chunk_type_code[r['chunk_type'] or ""] for r in rows), dtype=np.int16, count=n),
+        "type_codes": np.fromiter((type_code[r['item_type'] or ""] for r in rows), dtype=np.int16, count=n),
+        "created_epoch": np.fromiter((e or 0 for e in epochs), dtype=np.int64, count=n),
+        "date_valid": np.fromiter((e is not None for e in epochs), dtype=bool, count=n),
+    }
+
+    parsed = []
+    for r in rows:
+        vec = None
+        if r['embedding']:
+            try:
+                vec = json.loads(r['embedding'])
+            except ValueError:
+                vec = None
+        if vec and not dim:
+            dim = len(vec)
+        parsed.append(vec)
+
+    dim = dim or 0
+    vectors = np.zeros((n, dim), dtype=np.float32)
+    has_embedding = np.zeros(n, dtype=bool)
+    for i, vec in enumerate(parsed):
+        # Vectors from another model (different width) can't be scored
+        if vec and len(vec) == dim:
+            vectors[i] = vec
+            has_embedding[i] = True
+    norms = np.linalg.norm(vectors, axis=1)
+    has_embedding &= norms > 0
+    norms[norms == 0] = 1.0
+    vectors /= norms[:, None]
+    arrays["has_embedding"] = has_embedding
+    return arrays, vectors, type_names, chunk_type_names, dim
+
+def _snapshot_path(user_id):
+    return os.path.join(SEARCH_SNAPSHOT_DIR, hashlib.sha1(str(user_id).encode("utf-8")).hexdigest())
+
+class UserIndex:
+    def __init__(self, user_id, generation, rows, item_tags, log_seq=0):
+        """
+        rows: get_all_chunks(user_id); item_tags: get_user_item_tags(user_id);
+        log_seq: index_log position the rows were read at.
+        """
+        self.user_id = user_id
+        self.generation = generation
+        self.log_seq = log_seq
+
+        arrays, vectors, self.type_names, self.chunk_type_names, self.dim = _encode_rows(
+            rows, sorted({r['item_type'] or "" for r in rows}), sorted({r['chunk_type'] or "" for r in rows}), 0)
+        for name in ROW_ARRAYS:
+            setattr(self, name, arrays[name])
+        self._set_base(vectors, len(rows))
+
+        self.tag_items = {}
+        for item_id, tag in item_tags:
+            self.tag_items.setdefault(tag, set()).add(item_id)
+        self._reset_caches()
+
+    def _set_base(self, vectors, n):
+        # Rows [0, n_base) score against the base vectors (memory-mapped when
+        # loaded from a snapshot), rows appended by catch-up against the tail
+        self.n_base = n
+        self.quantized = SEARCH_QUANTIZE
+        if self.quantized:
+            self.vectors = None
+            self.codes, self.scale = quantize(vectors)
+        else:
+            self.vectors = vectors
+        self.tail_vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self.alive = np.ones(n, dtype=bool)
+
+    def _reset_caches(self):
+        self._tag_masks = {}
+        # Lowercased word sets for keyword overlap by chunk id, filled in as rows become candidates
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return len(self.chunk_ids)
+
+    @property
+    def pending(self):
+        """Rows appended or tombstoned since the base was built (0 = compacted)."""
+        return int(self.size - self.n_base + np.count_nonzero(~self.alive[:self.n_base]))
+
+    @classmethod
+    def load_snapshot(cls, user_id):
+        """Maps the user's snapshot files, or returns None if there is no usable one."""
+        path = _snapshot_path(user_id)
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (meta.get("version") != SNAPSHOT_VERSION or meta.get("user_id") != user_id
+                or meta.get("quantized") != SEARCH_QUANTIZE or not meta.get("size")):
+            return None
+
+        index = cls.__new__(cls)
+        try:
+            for name in ROW_ARRAYS:
+                setattr(index, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+            if SEARCH_QUANTIZE:
+                index.vectors = None
+                index.codes = np.load(os.path.join(path, "codes.npy"), mmap_mode="r")
+                index.scale = np.load(os.path.join(path, "scale.npy"))
+            else:
+                index.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        except (OSError, ValueError) as e:
+            print(f"[SearchIndex] Ignoring unreadable snapshot for {user_id}: {e}")
+            return None
+
+        index.user_id = user_id
+        index.generation = None
+        index.log_seq = meta["log_seq"]
+        index.dim = meta["dim"]
+        index.type_names = meta["type_names"]
+        index.chunk_type_names = meta["chunk_type_names"]
+        index.quantized = SEARCH_QUANTIZE
+        index.n_base = meta["size"]
+        index.tail_vectors = np.zeros((0, index.dim), dtype=np.float32)
+        index.alive = np.ones(index.n_base, dtype=bool)
+        index.tag_items = {tag: set(ids) for tag, ids in meta["tag_items"].items()}
+        index._reset_caches()
+        return index
+
+    def save_snapshot(self):
+        """
+        Writes a compacted index (no tail or tombstones) to its snapshot dir.
+        Files go to a temp dir that is renamed into place; meta.json is
+        written last, so a half-written snapshot is never loaded.
+        """
+        path = _snapshot_path(self.user_id)
+        tmp = f"{path}.tmp{os.getpid()}"
+        old = f"{path}.old{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name in ROW_ARRAYS:
+            np.save(os.path.join(tmp, f"{name}.npy"), getattr(self, name))
+        if self.quantized:
+            np.save(os.path.join(tmp, "codes.npy"), self.codes)
+            np.save(os.path.join(tmp, "scale.npy"), self.scale)
+        else:
+            np.save(os.path.join(tmp, "vectors.npy"), self.vectors)
+        meta = {
+            "version": SNAPSHOT_VERSION,
+            "user_id": self.user_id,
+            "log_seq": self.log_seq,
+            "size": self.size,
+            "dim": self.dim,
+            "quantized": self.quantized,
+            "type_names": self.type_names,
+            "chunk_type_names": self.chunk_type_names,
+            "tag_items": {tag: sorted(ids) for tag, ids in self.tag_items.items()},
+        }
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        # Mapped files of a replaced snapshot stay valid for readers until unmapped
+        if os.path.exists(path):
+            os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    def with_changes(self, changed_items, changed_chunks, rows, item_tags, log_seq, generation):
+        """
+        A copy caught up with index_log: rows of changed items / chunks are
+        tombstoned, their current versions (rows, from get_all_chunks) are
+        appended, and tags of changed items are replaced with item_tags.
+        The base arrays are shared, so this costs O(changes + n / 8).
+        Returns None if rows bring the first vectors to an index built without
+        any (the base has no columns to score them against; rebuild instead).
+        """
+        arrays, vectors, type_names, chunk_type_names, dim = _encode_rows(
+            rows, self.type_names, self.chunk_type_names, self.dim)
+        if dim != self.dim:
+            return None
+        index = copy.copy(self)
+        index.type_names, index.chunk_type_names = type_names, chunk_type_names
+        dead = np.zeros(self.size, dtype=bool)
+        if changed_items:
+            dead |= np.isin(self.item_ids, np.fromiter(changed_items, dtype=np.int64))
+        if changed_chunks:
+            dead |= np.isin(self.chunk_ids, np.fromiter(changed_chunks, dtype=np.int64))
+
+        for name in ROW_ARRAYS:
+            setattr(index, name, np.concatenate([getattr(self, name), arrays[name]]))
+        index.tail_vectors = np.concatenate([self.tail_vectors, vectors])
+        index.alive = np.concatenate([self.alive & ~dead, np.ones(len(rows), dtype=bool)])
+
+        index.tag_items = {tag: ids - changed_items for tag, ids in self.tag_items.items()}
+        for item_id, tag in item_tags:
+            index.tag_items.setdefault(tag, set()).add(item_id)
+        index.log_seq = log_seq
+        index.generation = generation
+        index._tag_masks = {}
+        index._lock = threading.Lock()
+        # Token sets are keyed by chunk id; drop the ones whose text may have changed
+        index._tokens = {cid: words for cid, words in self._tokens.items() if cid not in changed_chunks}
+        return index
+
+    def tokens(self, chunk_id, text):
+        words = self._tokens.get(chunk_id)
+        if words is None:
+            words = frozenset(text.lower().split()) if text else frozenset()
+            self._tokens[chunk_id] = words
+        return words
+
+    def payload(self, rows):
+        """Text and display fields of the given rows, read from the DB."""
+        chunk_ids = [int(cid) for cid in self.chunk_ids[rows]]
+        found = get_chunk_payloads(chunk_ids)
+        missing = {"text": "", "chunk_type": None, "title": None, "start_time": None, "end_time": None}
+        return [found.get(cid, missing) for cid in chunk_ids]
+
+    def tag_mask(self, tag):
+        tag = tag.strip().lower()
+        mask = self._tag_masks.get(tag)
+        if mask is None:
+            items = self.tag_items.get(tag)
+            mask = np.isin(self.item_ids, np.fromiter(items, dtype=np.int64)) if items else np.zeros(self.size, dtype=bool)
+            with self._lock:
+                self._tag_masks[tag] = mask
+        return mask
+
+    def filter_mask(self, type_filter=None, start_date=None, end_date=None, tags=None, match_any=False, github=None):
+        """
+        Candidate mask for the recall stage. github=True keeps only GitHub items,
+        False drops them, None ignores the source.
+        """
+        mask = self.alive.copy()
+        if tags:
+            tag_masks = [self.tag_mask(t) for t in tags if t.strip()]
+            if tag_masks:
+                combined = np.logical_or.reduce(tag_masks) if match_any else np.logical_and.reduce(tag_masks)
+                mask &= combined
+        if type_filter:
+            names = TYPE_FILTER_ALIASES.get(type_filter, [type_filter])
+            codes = [i for i, name in enumerate(self.type_names) if name in names]
+            mask &= np.isin(self.type_codes, codes)
+        if start_date and end_date:
+            mask &= self.date_valid
+            mask &= (self.created_epoch >= to_epoch(start_date)) & (self.created_epoch <= to_epoch(end_date))
+        if github is True:
+            mask &= self.tag_mask(GITHUB_TAG)
+        elif github is False:
+            mask &= ~self.tag_mask(GITHUB_TAG)
+        return mask
+
+    def score(self, q_vec, rows):
+        """
+        Cosine similarity of q_vec against the given rows (0 where a chunk has
+        no vector). float32: within ~1e-6 of a float64 cosine on the stored
+        JSON vectors (bench_search.py checks against RECALL_TOLERANCE).
+        """
+        scores = np.zeros(len(rows), dtype=np.float32)
+        if q_vec is None or not len(rows):
+            return scores
+        q = np.asarray(q_vec, dtype=np.float32)
+        q_norm = np.linalg.norm(q)
+        if q_norm == 0 or q.shape[0] != self.dim:
+            return scores
+        q = q / q_norm
+        in_base = rows < self.n_base
+        if in_base.all():
+            scores = self._base_scores(q, rows)
+        else:
+            scores[in_base] = self._base_scores(q, rows[in_base])
+            scores[~in_base] = self.tail_vectors[rows[~in_base] - self.n_base] @ q
+        scores[~self.has_embedding[rows]] = 0.0
+        return scores
+
+    def _base_scores(self, q, rows):
+        if not len(rows):
+            return np.zeros(0, dtype=np.float32)
+        if self.quantized:
+            return approx_scores(self.codes, self.scale, q, rows)
+        return self.vectors[rows] @ q
+
+    def exact_score(self, q_vec, rows):
+        """Cosine similarity with the float vectors from storage (for the int8 tier)."""
+        scores = np.zeros(len(rows), dtype=np.float32)
+        q = np.asarray(q_vec, dtype=np.float32)
+        q_norm = np.linalg.norm(q)
+        if q_norm == 0 or q.shape[0] != self.dim or not len(rows):
+            return scores
+        stored = get_chunk_embeddings(self.chunk_ids[rows].tolist())
+        for i, chunk_id in enumerate(self.chunk_ids[rows]):
+            vec = stored.get(int(chunk_id))
+            if vec is not None and len(vec) == self.dim:
+                v = np.asarray(vec, dtype=np.float32)
+                v_norm = np.linalg.norm(v)
+                if v_norm > 0:
+                    scores[i] = v @ q / (v_norm * q_norm)
+        return scores
+
+    def recall_scores(self, q_vec, rows):
+        """
+        Chunk-type weighted similarity for the recall stage. Returns (rows,
+        scores). On the int8 tier only the best SEARCH_RESCORE_K rows by
+        approximate score come back, with exact scores.
+        """
+        scores = self.score(q_vec, rows) * self.chunk_weights[rows]
+        if not self.quantized:
+            return rows, scores
+        if len(rows) > SEARCH_RESCORE_K:
+            rows, _ = top_k(scores, rows, SEARCH_RESCORE_K)
+            # Back to index order so later ties break the same way as the float path
+            rows = np.sort(rows)
+        return rows, self.exact_score(q_vec, rows) * self.chunk_weights[rows]
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+_snapshot_lock = threading.Lock()
+_building = Counter()   # Users whose index is being built or caught up (their log must not be truncated)
+_compactor = None
+
+def get_index(user_id):
+    """
+    Returns the user's UserIndex: the cached one if the DB generation hasn't
+    moved, else the cached one or the on-disk snapshot caught up with
+    index_log, else a full build from the chunks table.
+    """
+    # Read the generation before the log: a write landing in between leaves
+    # the index one generation behind, so the next search catches up again.
+    generation = get_index_generation(user_id)
+    with _indexes_lock:
+        index = _indexes.get(user_id)
+        if index is not None and index.generation == generation:
+            _indexes.move_to_end(user_id)
+            return index
+    _start_compactor()
+
+    # Held until the result is cached, so compact() keeps the log it replays
+    _hold(user_id)
+    try:
+        if index is None and SEARCH_SNAPSHOTS and user_id:
+            start = time.time()
+            index = UserIndex.load_snapshot(user_id)
+            if index is not None:
+                print(f"[SearchIndex] Mapped snapshot for {user_id}: {index.size} chunks in {(time.time() - start) * 1000:.0f}ms")
+        # Without a user_id the index spans every user's chunks, which no single
+        # user's log covers, so it is rebuilt whenever the generation moves
+        if index is not None and user_id:
+            index = _catch_up(index, generation)
+        else:
+            index = _build(user_id, generation)
+        _cache(user_id, index)
+    finally:
+        _release(user_id)
+    return index
+
+def _hold(user_id):
+    with _snapshot_lock:
+        _building[user_id] += 1
+
+def _release(user_id):
+    with _snapshot_lock:
+        _building[user_id] -= 1
+        if _building[user_id] <= 0:
+            del _building[user_id]
+
+def _cache(user_id, index):
+    with _indexes_lock:
+        _indexes[user_id] = index
+        _indexes.move_to_end(user_id)
+        while len(_indexes) > SEARCH_INDEX_MAX_USERS:
+            _indexes.popitem(last=False)
+
+def _snapshot_seq(user_id):
+    try:
+        with open(os.path.join(_snapshot_path(user_id), "meta.json")) as f:
+            return json.load(f).get("log_seq", 0)
+    except (OSError, ValueError):
+        return 0
+
+def _catch_up(index, generation):
+    entries = get_index_log(index.user_id, index.log_seq)
+    # Another worker may have re-snapshotted and truncated the log past this
+    # index (the log is read first, so a truncation it missed shows up here)
+    if SEARCH_SNAPSHOTS and index.user_id and _snapshot_seq(index.user_id) > index.log_seq:
+        newer = UserIndex.load_snapshot(index.user_id)
+        if newer is not None:
+            index = newer
+            entries = get_index_log(index.user_id, index.log_seq)
+    if not entries:
+        index.generation = generation
+        return index
+    changed_items = {item_id for _, item_id, chunk_id in entries if chunk_id is None}
+    changed_chunks = {chunk_id for _, item_id, chunk_id in entries if chunk_id is not None and item_id not in changed_items}
+    rows = get_all_chunks(index.user_id, item_ids=changed_items, chunk_ids=changed_chunks)
+    item_tags = get_user_item_tags(index.user_id, item_ids=changed_items) if changed_items else []
+    caught_up = index.with_changes(changed_items, changed_chunks, rows, item_tags, entries[-1][0], generation)
+    if caught_up is None:
+        return _build(index.user_id, generation)
+    index = caught_up
+    print(f"[SearchIndex] Applied {len(entries)} log entries for {index.user_id}: {index.pending} rows pending compaction")
+    return index
+
+def _build(user_id, generation):
+    """Full build from the chunks table; saves a snapshot and drops the log it covers."""
+    with _snapshot_lock:
+        _building[user_id] += 1
+        # Read the log position before the rows: entries landing mid-build are
+        # replayed on top of the snapshot (replaying a change twice is harmless)
+        log_seq = get_index_log_seq()
+    try:
+        start = time.time()
+        index = UserIndex(user_id, generation, get_all_chunks(user_id), get_user_item_tags(user_id), log_seq)
+        print(f"[SearchIndex] Built index for {user_id}: {index.size} chunks (gen {generation}) in {(time.time() - start) * 1000:.0f}ms")
+        if SEARCH_SNAPSHOTS and user_id and index.size:
+            try:
+                os.makedirs(SEARCH_SNAPSHOT_DIR, exist_ok=True)
+                index.save_snapshot()
+                truncate_index_log(user_id, log_seq)
+            except OSError as e:
+                print(f"[SearchIndex] Snapshot write failed for {user_id}: {e}")
+        return index
+    finally:
+        _release(user_id)
+
+def _start_compactor():
+    global _compactor
+    with _indexes_lock:
+        # Runs with snapshots off too: cached indexes still catch up from
+        # index_log, and only the compactor truncates it then
+        if _compactor is not None:
+            return
+        _compactor = threading.Thread(target=_compact_loop, daemon=True)
+        _compactor.start()
+
+def _compact_loop():
+    while True:
+        time.sleep(SNAPSHOT_COMPACT_S)
+        try:
+            compact()
+        except Exception as e:
+            print(f"[SearchIndex] Compaction failed: {e}")
+
+def compact():
+    """
+    Rebuilds and re-snapshots cached indexes that carry log changes, then
+    drops log entries nothing will replay: for users without a snapshot,
+    everything their cached index (if any) has already applied.
+    """
+    with _indexes_lock:
+        stale = [user_id for user_id, index in _indexes.items() if index.pending]
+    for user_id in stale:
+        index = _build(user_id, get_index_generation(user_id))
+        with _indexes_lock:
+            if user_id in _indexes:
+                _indexes[user_id] = index
+
+    upto = get_index_log_seq()
+    for user_id in get_index_log_users():
+        with _snapshot_lock:
+            if user_id in _building or (SEARCH_SNAPSHOTS and user_id and os.path.exists(os.path.join(_snapshot_path(user_id), "meta.json"))):
+                continue
+            # A cached index (e.g. one too small to snapshot, or whose snapshot
+            # write failed) catches up from its own log position
+            with _indexes_lock:
+                index = _indexes.get(user_id) if user_id else None
+            truncate_index_log(user_id, index.log_seq if index is not None else upto)
+    if stale:
+        print(f"[SearchIndex] Compacted {len(stale)} indexes")
+
+def top_k(scores, rows, k):
+    """
+    Rows with the k highest scores, ordered by score then row position. Same
+    result as a stable sort of every row, without sorting all of them.
+    """
+    if len(rows) <= k:
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
+    part = np.argpartition(-scores, k - 1)[:k]
+    threshold = scores[part].min()
+    # Rows tied at the cut-off: the earliest ones win, as in a stable sort
+    above = np.flatnonzero(scores > threshold)
+    ties = np.flatnonzero(scores == threshold)[:k - len(above)]
+    picked = np.concatenate([above, ties])
+    order = picked[np.lexsort((picked, -scores[picked]))]
+    return rows[order], scores[order]
+
+def rerank(index, rows, vector_scores, query, query_keywords, texts):
+    """
+    Stage 2 boosts for recall candidates, as arrays aligned with rows (texts:
+    chunk text per row, from index.payload): returns (final_scores,
+    keyword_overlap, modality_boost).
+    final = vector + 0.05 * overlap + modality (0.05). Recency and usage are
+    per-item and come from items.static_score.
+    """
+    k = len(rows)
+    final = np.asarray(vector_scores, dtype=np.float64).copy()
+    if query_keywords:
+        overlap = np.fromiter((len(query_keywords & index.tokens(int(index.chunk_ids[r]), text)) for r, text in zip(rows, texts)),
+                              dtype=np.int64, count=k)
+    else:
+        overlap = np.zeros(k, dtype=np.int64)
+    final += 0.05 * overlap
+
+    # Modality: one boost per chunk type for this query, gathered by type code
+    q = query.lower()
+    visual = any(w in q for w in VISUAL_HINTS)
+    audio = any(w in q for w in AUDIO_HINTS)
+    type_boost = np.array([0.05 if (visual and name in ["visual", "caption"]) or (audio and name == "transcript") else 0.0
+                           for name in index.chunk_type_names] or [0.0])
+    modality = type_boost[index.chunk_type_codes[rows]]
+    final += modality
+    return final, overlap, modality
+
+def aggregate_items(item_ids, final_scores):
+    """
+    Groups candidates by item: best chunk (first one on ties) plus 0.03 per
+    extra supporting chunk, capped at 0.15. Returns (item_ids, best candidate
+    position, item score, evidence count), items in first-appearance order.
+    """
+    item_ids = np.asarray(item_ids)
+    if not len(item_ids):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0), empty
+    _, first, inverse, counts = np.unique(item_ids, return_index=True, return_inverse=True, return_counts=True)
+    positions = np.arange(len(item_ids))
+    # Sorted by item, then score desc, then position: each group's first entry is its best chunk
+    order = np.lexsort((positions, -final_scores, inverse))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    best = order[starts]
+    evidence = counts - 1
+    scores = final_scores[best] + np.minimum(0.15, 0.03 * evidence)
+    by_appearance = np.argsort(first, kind="stable")
+    return item_ids[best][by_appearance], best[by_appearance], scores[by_appearance], evidence[by_appearance]
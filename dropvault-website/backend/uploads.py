@@ -0,0 +1,181 @@
+import os
+import uuid
+import asyncio
+import hashlib
+import mimetypes
+from fastapi import APIRouter, HTTPException, Request, Form
+from fastapi.responses import Response, JSONResponse
+from .database import (
+    create_upload_session, get_upload_session, update_upload_offset, delete_upload_session,
+    count_active_uploads, pop_stale_upload_sessions
+)
+from . import blob_store
+
+# Resumable, tus-style uploads:
+#   POST   /api/uploads                 -> create a session (filename, size)
+#   HEAD   /api/uploads/{id}            -> Upload-Offset: bytes received so far
+#   PATCH  /api/uploads/{id}            -> append the body at Upload-Offset
+#   POST   /api/uploads/{id}/finalize   -> move into the blob store, same reply as /api/upload
+#   DELETE /api/uploads/{id}            -> abort
+router = APIRouter()
+
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024          # What clients are told to send per PATCH
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_MB", "10240")) * 1024 * 1024
+UPLOAD_MAX_CONCURRENT = int(os.getenv("UPLOAD_MAX_CONCURRENT", "4"))   # Per user
+UPLOAD_SESSION_TTL_HOURS = 24
+WRITE_BLOCK_SIZE = 1024 * 1024
+
+# Running sha256 per session: upload_id -> (hasher, bytes hashed). Rebuilt from the
+# partial file if the server restarted mid-upload.
+_hashers = {}
+_locks = {}
+
+def _part_path(upload_id):
+    return os.path.join(blob_store.BLOB_DIR, f"{upload_id}.part")
+
+async def _get_session(upload_id):
+    session = await asyncio.to_thread(get_upload_session, upload_id)
+    if not session:
+        # Don't keep a lock around for an id that doesn't exist (or just finished)
+        _locks.pop(upload_id, None)
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+def _hash_file(path, length):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        remaining = length
+        while remaining > 0:
+            block = f.read(min(WRITE_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            h.update(block)
+            remaining -= len(block)
+    return h
+
+async def _hasher_for(upload_id, offset):
+    entry = _hashers.get(upload_id)
+    if entry is None or entry[1] != offset:
+        h = await asyncio.to_thread(_hash_file, _part_path(upload_id), offset) if offset else hashlib.sha256()
+        entry = (h, offset)
+        _hashers[upload_id] = entry
+    return entry[0]
+
+def _discard(upload_id):
+    _hashers.pop(upload_id, None)
+    _locks.pop(upload_id, None)
+    try:
+        os.remove(_part_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+def _offset_headers(session):
+    return {
+        "Upload-Offset": str(session["offset"]),
+        "Upload-Length": str(session["size"]),
+        "Cache-Control": "no-store",
+        "Access-Control-Expose-Headers": "Upload-Offset, Upload-Length, Location"
+    }
+
+@router.post("/api/uploads")
+async def init_upload(filename: str = Form(...), size: int = Form(...), userId: str = Form(None), mimeType: str = Form(None)):
+    if size < 0 or size > UPLOAD_MAX_SIZE:
+        raise HTTPException(status_code=413, detail="File too large")
+
+    for stale_id in await asyncio.to_thread(pop_stale_upload_sessions, UPLOAD_SESSION_TTL_HOURS):
+        await asyncio.to_thread(_discard, stale_id)
+    if await asyncio.to_thread(count_active_uploads, userId) >= UPLOAD_MAX_CONCURRENT:
+        raise HTTPException(status_code=429, detail="Too many uploads in progress", headers={"Retry-After": "5"})
+
+    upload_id = uuid.uuid4().hex
+    await asyncio.to_thread(lambda: open(_part_path(upload_id), "wb").close())
+    await asyncio.to_thread(create_upload_session, upload_id, userId, filename, mimeType or mimetypes.guess_type(filename)[0], size)
+    _hashers[upload_id] = (hashlib.sha256(), 0)
+    return JSONResponse(
+        {"uploadId": upload_id, "offset": 0, "chunkSize": UPLOAD_CHUNK_SIZE},
+        status_code=201,
+        headers={"Location": f"/api/uploads/{upload_id}", "Access-Control-Expose-Headers": "Location"}
+    )
+
+@router.head("/api/uploads/{upload_id}")
+async def upload_status(upload_id: str):
+    return Response(status_code=200, headers=_offset_headers(await _get_session(upload_id)))
+
+@router.patch("/api/uploads/{upload_id}")
+async def append_chunk(upload_id: str, request: Request):
+    await _get_session(upload_id)
+    async with _locks.setdefault(upload_id, asyncio.Lock()):
+        session = await _get_session(upload_id)
+        try:
+            client_offset = int(request.headers.get("upload-offset", ""))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Upload-Offset header required")
+        if client_offset != session["offset"]:
+            # Client is out of sync (e.g. a retried chunk that did land): tell it where we are
+            raise HTTPException(status_code=409, detail="Offset mismatch", headers=_offset_headers(session))
+
+        hasher = await _hasher_for(upload_id, session["offset"])
+        offset = session["offset"]
+        f = await asyncio.to_thread(open, _part_path(upload_id), "r+b")
+        try:
+            await asyncio.to_thread(f.seek, offset)
+            pending = bytearray()
+            # Disk writes and hashing happen off the event loop, one block at a time
+            async for piece in request.stream():
+                pending.extend(piece)
+                if offset + len(pending) > session["size"]:
+                    raise HTTPException(status_code=413, detail="Chunk exceeds declared size")
+                if len(pending) >= WRITE_BLOCK_SIZE:
+                    block = bytes(pending)
+                    pending.clear()
+                    await asyncio.to_thread(f.write, block)
+                    hasher.update(block)
+                    offset += len(block)
+            if pending:
+                block = bytes(pending)
+                await asyncio.to_thread(f.write, block)
+                hasher.update(block)
+                offset += len(block)
+            await asyncio.to_thread(f.flush)
+        finally:
+            # A dropped connection keeps everything that reached the disk
+            await asyncio.to_thread(f.close)
+            _hashers[upload_id] = (hasher, offset)
+            await asyncio.to_thread(update_upload_offset, upload_id, offset)
+            session["offset"] = offset
+
+    return Response(status_code=204, headers=_offset_headers(session))
+
+@router.post("/api/uploads/{upload_id}/finalize")
+async def finalize_upload(upload_id: str):
+    await _get_session(upload_id)
+    async with _locks.setdefault(upload_id, asyncio.Lock()):
+        session = await _get_session(upload_id)
+        if session["offset"] != session["size"]:
+            raise HTTPException(status_code=409, detail="Upload incomplete", headers=_offset_headers(session))
+
+        hasher = await _hasher_for(upload_id, session["offset"])
+        content_hash, file_url, _ = await asyncio.to_thread(
+            blob_store.commit_blob, _part_path(upload_id), hasher.hexdigest(), session["size"], session["filename"]
+        )
+        await asyncio.to_thread(delete_upload_session, upload_id)
+        _hashers.pop(upload_id, None)
+    _locks.pop(upload_id, None)
+
+    # Video thumbnails are generated by the worker, not on the request path
+    return {
+        "success": True,
+        "fileUrl": file_url,
+        "filename": os.path.basename(file_url),
+        "originalName": session["filename"],
+        "mimetype": session["mime_type"],
+        "contentHash": content_hash,
+        "thumbnailUrl": None
+    }
+
+@router.delete("/api/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    await _get_session(upload_id)
+    await asyncio.to_thread(delete_upload_session, upload_id)
+    await asyncio.to_thread(_discard, upload_id)
+    return {"success": True}
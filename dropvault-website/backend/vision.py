@@ -108,82 +108,87 @@ def unload_vision_models():
     unload_model("blip")
     unload_model("owl")
 
-def batch_analyze_images(file_paths):
+def _open_images(file_paths, indices):
+    imgs, opened = [], []
+    for i in indices:
+        path = file_paths[i]
+        if not os.path.exists(path): continue
+        try:
+            imgs.append(Image.open(path).convert("RGB"))
+            opened.append(i)
+        except Exception as e:
+            print(f"[Vision Debug] Failed to open {path}: {e}")
+    return imgs, opened
+
+def batch_analyze_images(file_paths, batch_size=12):
+    """
+    Captions (BLIP) then object tags (OWL-ViT) for a list of images. Images
+    are decoded one batch_size slice at a time (a long video can have
+    hundreds of keyframes), and a failing slice only loses its own results.
+    """
     results = [{"caption": "", "tags": []} for _ in file_paths]
     device = "cuda" if torch.cuda.is_available() else "cpu"
     dtype = torch.float16 if device == "cuda" else torch.float32
+    slices = [list(range(start, min(start + batch_size, len(file_paths)))) for start in range(0, len(file_paths), batch_size)]
 
     # --- PHASE 1: CAPTIONS (BLIP) ---
-    valid_imgs = []
-    valid_indices = []
-    
     if load_blip():
         print(f"[Vision Debug] Running BLIP on {len(file_paths)} files...")
-        try:
-            for i, path in enumerate(file_paths):
-                if os.path.exists(path):
-                    try:
-                        img = Image.open(path).convert("RGB")
-                        valid_imgs.append(img)
-                        valid_indices.append(i)
-                    except Exception as e:
-                        print(f"[Vision Debug] Failed to open {path}: {e}")
-            
-            if valid_imgs:
-                inputs = blip_processor(images=valid_imgs, return_tensors="pt").to(device, dtype)
+        captioned = 0
+        for indices in slices:
+            try:
+                imgs, opened = _open_images(file_paths, indices)
+                if not imgs: continue
+                inputs = blip_processor(images=imgs, return_tensors="pt").to(device, dtype)
                 with torch.no_grad():
                     out = blip_model.generate(**inputs, max_new_tokens=50)
-                captions = blip_processor.batch_decode(out, skip_special_tokens=True)
-                
-                print(f"[Vision Debug] BLIP Generated {len(captions)} captions.")
-                for idx, cap in zip(valid_indices, captions):
+                for idx, cap in zip(opened, blip_processor.batch_decode(out, skip_special_tokens=True)):
                     results[idx]["caption"] = cap.strip()
+                    captioned += 1
                     print(f" - Image {idx}: {cap.strip()}")
-                    
-        except Exception as e:
-            print(f"[Vision Debug] BLIP Phase Failed: {e}")
-        
+            except Exception as e:
+                print(f"[Vision Debug] BLIP failed for images {indices[0]}-{indices[-1]}: {e}")
+        print(f"[Vision Debug] BLIP Generated {captioned} captions.")
         unload_model("blip")
     
     # --- PHASE 2: DETECTION (OWL-ViT) ---
+    # Prompts are the static list plus keywords from each image's caption;
+    # one forward pass per slice (the processor pads the query lists)
     if load_owl():
-        print(f"[Vision Debug] Running OWL-ViT on {len(valid_indices)} images...")
-        try:
-            for i in valid_indices:
-                path = file_paths[i]
-                caption = results[i]["caption"]
-                if not caption: continue
-                
-                dynamic = extract_keywords(caption)
-                labels = list(set(STATIC_OBJECTS + dynamic))
-                prompts = [f"a photo of a {l}" for l in labels]
-                
-                img = Image.open(path).convert("RGB")
-                inputs = owl_processor(text=[prompts], images=img, return_tensors="pt").to(device)
+        print(f"[Vision Debug] Running OWL-ViT on {sum(1 for r in results if r['caption'])} images...")
+        for indices in slices:
+            try:
+                imgs, opened = _open_images(file_paths, [i for i in indices if results[i]["caption"]])
+                if not imgs: continue
+                labels = [list(set(STATIC_OBJECTS + extract_keywords(results[i]["caption"]))) for i in opened]
+                prompts = [[f"a photo of a {l}" for l in image_labels] for image_labels in labels]
+                inputs = owl_processor(text=prompts, images=imgs, return_tensors="pt").to(device)
                 
                 with torch.no_grad():
                     outputs = owl_model(**inputs)
                 
-                target_sizes = torch.Tensor([img.size[::-1]]).to(device)
+                target_sizes = torch.Tensor([img.size[::-1] for img in imgs]).to(device)
                 
                 # Revert to stable method (ignores FutureWarning)
-                res = owl_processor.post_process_object_detection(
+                detections = owl_processor.post_process_object_detection(
                     outputs, 
                     target_sizes=target_sizes, 
                     threshold=0.08
-                )[0]
+                )
                 
-                detected = set()
-                for score, label_idx in zip(res["scores"], res["labels"]):
-                    if score.item() > 0.08:
-                        detected.add(labels[label_idx])
-                results[i]["tags"] = list(detected)
-                print(f" - Image {i} Tags: {results[i]['tags']}")
+                for i, image_labels, res in zip(opened, labels, detections):
+                    detected = set()
+                    for score, label_idx in zip(res["scores"], res["labels"]):
+                        # Indices past this image's labels are padding queries
+                        if score.item() > 0.08 and label_idx.item() < len(image_labels):
+                            detected.add(image_labels[label_idx.item()])
+                    results[i]["tags"] = list(detected)
+                    print(f" - Image {i} Tags: {results[i]['tags']}")
                 
-        except Exception as e:
-            print(f"[Vision Debug] OWL Phase Failed: {e}")
-            import traceback
-            traceback.print_exc()
+            except Exception as e:
+                print(f"[Vision Debug] OWL failed for images {indices[0]}-{indices[-1]}: {e}")
+                import traceback
+                traceback.print_exc()
             
         unload_model("owl")
 
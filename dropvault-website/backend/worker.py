@@ -10,18 +10,27 @@ import torch
 import gc
 from concurrent.futures import ThreadPoolExecutor
 
-from .database import update_item, get_item, get_processing_items, insert_chunk, add_item, get_item_by_path, delete_chunks, update_last_synced, get_users_needing_sync
-from .chunker import split_text
-from .github_data import fetch_github_data
+from .database import update_item, get_item, get_processing_items, insert_chunk, add_item, get_item_by_path, delete_chunks, update_last_synced, refresh_static_scores, cache_item_extraction, clone_cached_extraction, save_github_repo_state, update_item_media
+from .chunker import split_text, split_segments, split_blocks
+from .indexer import reindex_chunks
+from .github_data import iter_github_data
+from .scheduler import SyncScheduler
+from .link_fetcher import LINK_FETCH_CONCURRENCY
+from .previews import cache_preview
+from . import blob_store
 from .media_utils import (
     extract_text_from_image, 
     extract_text,
-    transcribe_audio, 
+    extract_audio,
+    extract_keyframes,
+    generate_video_thumbnail,
+    probe_media,
+    transcribe_segments, 
     load_whisper_model, 
     unload_whisper_model,
     UPLOAD_DIR
 )
-from .ai import generate_embedding
+from .ai import generate_embedding, generate_embeddings
 from .vision import (
     detect_objects, 
     batch_analyze_images,
@@ -53,6 +62,18 @@ class ConnectionManager:
 
 manager = ConnectionManager()
 
+# Item types whose text is re-indexed incrementally (stable, content-defined chunks)
+INCREMENTAL_TYPES = ["note", "text"]
+
+# Task outputs stored in the extraction cache for content-hash dedup
+CACHED_OUTPUTS = ["ocr_text", "vision_caption", "vision_tags", "transcript", "transcript_segments", "keyframe_results"]
+
+# Words of transcript to collect before pushing a partial batch to the embed stage
+STREAM_BATCH_WORDS = 300
+
+# How often recency buckets in items.static_score are re-evaluated
+STATIC_SCORE_REFRESH_S = int(os.getenv("STATIC_SCORE_REFRESH_S", "3600"))
+
 class ProcessingWorker:
     def __init__(self):
         self.running = True
@@ -62,7 +83,6 @@ class ProcessingWorker:
         self.vision_queue = queue.Queue()   # Stage 2A: GPU (BLIP/OWL) - HIGH PRIORITY
         self.whisper_queue = queue.Queue()  # Stage 2B: GPU (Whisper) - LOW PRIORITY
         self.embed_queue = queue.Queue()    # Stage 3: CPU (Embedding)
-        self.github_queue = queue.Queue()   # Stage 0: Network (GitHub Fetch)
         
         # System Limits
         self.cpu_cores = max(2, (os.cpu_count() or 2) - 1)
@@ -75,55 +95,52 @@ class ProcessingWorker:
 
         # Executors
         self.cpu_pool = ThreadPoolExecutor(max_workers=self.cpu_cores)
+        # Link fetches are network-bound: they get their own pool so bulk imports
+        # don't tie up the OCR threads (per-host politeness is handled by link_fetcher)
+        self.link_pool = ThreadPoolExecutor(max_workers=LINK_FETCH_CONCURRENCY)
         
         # Start Pipeline Threads
         threading.Thread(target=self.ocr_worker, daemon=True).start()
         threading.Thread(target=self.gpu_worker, daemon=True).start()
         threading.Thread(target=self.embed_worker, daemon=True).start()
-        threading.Thread(target=self.github_worker, daemon=True).start()
-        threading.Thread(target=self.scheduler_worker, daemon=True).start()
+        threading.Thread(target=self.static_score_worker, daemon=True).start()
+
+        # OPTIMIZATION: Connected-account syncs are spread over the window with
+        # per-account jitter and run concurrently (was: hourly batch, one user at a time)
+        self.scheduler = SyncScheduler()
+        self.scheduler.register("github", self.sync_github, interval_hours=24,
+                                max_concurrency=int(os.getenv("GITHUB_SYNC_CONCURRENCY", "2")))
+        self.scheduler.start()
         
         # Recover pending tasks
         self.recover_state()
 
-    def scheduler_worker(self):
-        print("[Scheduler] Started. Checking for stale GitHub data every hour.")
-        while self.running:
-            try:
-                # Check for users needing sync (every 24h)
-                stale_users = get_users_needing_sync("github", hours=24)
-                if stale_users:
-                    print(f"[Scheduler] Found {len(stale_users)} users needing GitHub sync.")
-                    for uid in stale_users:
-                        self.add_github_task(uid)
-                
-                # Sleep for 1 hour
-                time.sleep(3600)
-            except Exception as e:
-                print(f"[Scheduler] Error: {e}")
-                time.sleep(3600)
-
-    def add_task(self, item_id, file_path, item_type, user_id, thumbnail_path=None):
+    def add_task(self, item_id, file_path, item_type, user_id, thumbnail_path=None, content_hash=None):
         task = {
             "id": item_id,
             "file_path": file_path,
             "type": item_type,
             "user_id": user_id,
             "thumbnail_path": thumbnail_path,
+            "content_hash": content_hash,
             "ocr_text": "",
             "vision_caption": "",
             "vision_tags": [],
             "transcript": "",
+            "transcript_segments": [],
             "meta_title": None,
             "meta_image": None,
+            "keyframes": [],
+            "keyframe_results": [],
             "vision_done": False
         }
         self.ocr_queue.put(task)
         print(f"[Worker] Task {item_id} added to OCR queue.")
 
     def add_github_task(self, user_id):
-        self.github_queue.put({"user_id": user_id})
-        print(f"[Worker] GitHub sync task added for user {user_id}")
+        # Manual syncs skip the schedule and go out on the next free slot
+        self.scheduler.request_sync("github", user_id)
+        print(f"[Worker] GitHub sync requested for user {user_id}")
 
     def recover_state(self):
         try:
@@ -135,7 +152,8 @@ class ProcessingWorker:
                     item['file_path'], 
                     item['type'], 
                     item['user_id'],
-                    item['thumbnail_path']
+                    item['thumbnail_path'],
+                    content_hash=item.get('content_hash')
                 )
         except Exception as e:
             print(f"[Worker] Recovery failed: {e}")
@@ -169,95 +187,163 @@ class ProcessingWorker:
                  loop.run_until_complete(manager.broadcast(msg))
         except: pass
 
-    # --- STAGE 4: GitHub Worker ---
-    def github_worker(self):
-        while self.running:
-            try:
-                task = self.github_queue.get(timeout=1)
-                user_id = task['user_id']
+    def ensure_video_thumbnail(self, task, full_path):
+        thumb_name = f"{os.path.basename(full_path)}.jpg"
+        thumb_path = os.path.join(os.path.dirname(full_path), "thumbnails", thumb_name)
+        os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+        if os.path.exists(thumb_path) or generate_video_thumbnail(full_path, thumb_path):
+            task['thumbnail_path'] = f"{os.path.dirname(task['file_path'])}/thumbnails/{thumb_name}"
+            update_item(task['id'], None, None, None, user_id=task['user_id'], thumbnail_path=task['thumbnail_path'])
+
+    def broadcast_done(self, task):
+        try:
+            loop = asyncio.get_event_loop()
+            msg = {
+                "item_id": task['id'], "stage": "done", "percent": 100, 
+                "message": "Completed", "status": "completed"
+            }
+            if loop.is_running(): asyncio.run_coroutine_threadsafe(manager.broadcast(msg), loop)
+            else: loop.run_until_complete(manager.broadcast(msg))
+        except: pass
+
+    def transcript_streamer(self, task):
+        """
+        Builds the on_segments callback for transcribe_segments.
+        Decoded segments are batched to the embed stage as they arrive, so long
+        recordings become searchable while Whisper is still running.
+        """
+        pending = []
+
+        def on_segments(segments, done_s, total_s):
+            pending.extend(segments)
+            finished = done_s >= total_s - 1e-6
+            words = sum(len(seg['text'].split()) for seg in pending)
+            if pending and (finished or words >= STREAM_BATCH_WORDS):
+                self.embed_queue.put({
+                    "id": task['id'],
+                    "user_id": task['user_id'],
+                    "partial": "transcript",
+                    "transcript_segments": list(pending)
+                })
+                pending.clear()
+
+            ratio = done_s / total_s if total_s else 1.0
+            self.update_progress(task, "whisper", 50 + int(39 * ratio), f"Transcribing... {int(100 * ratio)}%")
+
+        return on_segments
+
+    # --- STAGE 4: GitHub Sync (dispatched by SyncScheduler) ---
+    def sync_github(self, user_id):
+        # Errors propagate so the scheduler can back off and retry this account
+        print(f"[GitHub Sync] Starting sync for {user_id}")
+        report = {}
+        queued = 0
+        # Only new/changed repos come back; unchanged ones cost no README/commit calls.
+        # Repos stream in as their concurrent fetches finish and go straight to embedding.
+        for repo in iter_github_data(user_id, report=report):
+            content = f"{repo['description'] or ''}\n\nLanguage: {repo['language']}\nStars: {repo['stars']}\n\n--- Recent Commits ---\n{repo['commits']}\n\n--- README ---\n{repo['readme'][:5000]}"
+            
+            # Determine tags
+            tags = "github,code,repo"
+            if repo.get('category') == 'starred':
+                tags += ",starred"
+            if repo.get('is_fork'):
+                tags += ",fork"
+            
+            # Check for existing item
+            existing = get_item_by_path(user_id, repo['html_url'])
+            
+            if existing:
+                print(f"[GitHub Sync] Updating existing repo: {repo['full_name']}")
+                item_id = existing['id']
                 
-                print(f"[GitHub Worker] Starting sync for {user_id}")
-                repos = fetch_github_data(user_id)
+                # 1. Update Metadata
+                update_item(
+                    item_id=item_id,
+                    title=repo['full_name'], 
+                    content=content,
+                    tags=tags,
+                    status="processing",
+                    progress_stage="updating",
+                    progress_percent=0,
+                    progress_message="Updating content...",
+                    user_id=user_id
+                )
                 
-                for repo in repos:
-                    content = f"{repo['description'] or ''}\n\nLanguage: {repo['language']}\nStars: {repo['stars']}\n\n--- Recent Commits ---\n{repo['commits']}\n\n--- README ---\n{repo['readme'][:5000]}"
-                    
-                    # Determine tags
-                    tags = "github,code,repo"
-                    if repo.get('category') == 'starred':
-                        tags += ",starred"
-                    if repo.get('is_fork'):
-                        tags += ",fork"
-                    
-                    # Check for existing item
-                    existing = get_item_by_path(user_id, repo['html_url'])
-                    
-                    if existing:
-                        print(f"[GitHub Worker] Updating existing repo: {repo['full_name']}")
-                        item_id = existing['id']
-                        
-                        # 1. Update Metadata
-                        update_item(
-                            item_id=item_id,
-                            title=repo['full_name'], 
-                            content=content,
-                            tags=tags,
-                            status="processing",
-                            progress_stage="updating",
-                            progress_percent=0,
-                            progress_message="Updating content...",
-                            user_id=user_id
-                        )
-                        
-                        # 2. Clear old chunks (Critical for re-indexing)
-                        delete_chunks(item_id)
-                        
-                    else:
-                        # Create New Item
-                        item_id = add_item(
-                            title=repo['full_name'],
-                            type="link",
-                            content=content,
-                            notes=f"Synced from GitHub. Updated: {repo['updated_at']}",
-                            file_path=repo['html_url'],
-                            embedding=None,
-                            tags=tags,
-                            user_id=user_id,
-                            status="pending",
-                            progress_stage="queued",
-                            progress_percent=0,
-                            progress_message="Indexing repo..."
-                        )
-                    
-                    # Add to processing queue (Embed Stage directly)
-                    process_task = {
-                        "id": item_id,
-                        "file_path": repo['html_url'],
-                        "type": "link",
-                        "user_id": user_id,
-                        "ocr_text": content, 
-                        "vision_caption": "",
-                        "vision_tags": [],
-                        "transcript": "",
-                        "meta_title": repo['full_name'],
-                        "meta_image": None
-                    }
-                    self.embed_queue.put(process_task)
-                    
-                update_last_synced(user_id, "github")
-                print(f"[GitHub Worker] Sync complete for {user_id}. {len(repos)} items queued.")
+                # 2. Chunks are diffed in the embed stage (reindex), not dropped
                 
-            except queue.Empty:
-                continue
+            else:
+                # Create New Item
+                item_id = add_item(
+                    title=repo['full_name'],
+                    type="link",
+                    content=content,
+                    notes=f"Synced from GitHub. Updated: {repo['updated_at']}",
+                    file_path=repo['html_url'],
+                    embedding=None,
+                    tags=tags,
+                    user_id=user_id,
+                    status="pending",
+                    progress_stage="queued",
+                    progress_percent=0,
+                    progress_message="Indexing repo..."
+                )
+            
+            # Add to processing queue (Embed Stage directly)
+            process_task = {
+                "id": item_id,
+                "file_path": repo['html_url'],
+                "type": "link",
+                "user_id": user_id,
+                "ocr_text": content, 
+                "vision_caption": "",
+                "vision_tags": [],
+                "transcript": "",
+                "transcript_segments": [],
+                "meta_title": repo['full_name'],
+                "meta_image": None,
+                "reindex": True
+            }
+            self.embed_queue.put(process_task)
+
+            # Advance the watermark/ETags only once the repo is queued
+            save_github_repo_state(user_id, repo['state'])
+            queued += 1
+            
+        update_last_synced(user_id, "github")
+        print(f"[GitHub Sync] Sync complete for {user_id}. {queued} items queued "
+              f"({len(report.get('new', []))} new, {len(report.get('updated', []))} changed, {report.get('unchanged', 0)} unchanged).")
+
+    # --- Background: ranking priors ---
+    def static_score_worker(self):
+        """
+        Keeps items.static_score current as recency buckets roll over, and
+        collects uploaded blobs that never became an item.
+        """
+        full = True
+        while self.running:
+            try:
+                changed = refresh_static_scores(full=full)
+                if changed:
+                    print(f"[Worker] Refreshed static scores for {changed} items")
+                full = False
             except Exception as e:
-                print(f"[GitHub Worker] Error: {e}")
+                print(f"[Worker] Static score refresh failed: {e}")
+            try:
+                collected = blob_store.collect_garbage()
+                if collected:
+                    print(f"[Worker] Collected {collected} unreferenced blobs")
+            except Exception as e:
+                print(f"[Worker] Blob collection failed: {e}")
+            time.sleep(STATIC_SCORE_REFRESH_S)
 
     # --- STAGE 1: CPU Worker (OCR) ---
     def ocr_worker(self):
         while self.running:
             try:
                 task = self.ocr_queue.get(timeout=1)
-                self.cpu_pool.submit(self._process_ocr, task)
+                is_link = task['type'] == 'link' or (task['type'] == 'video' and task['file_path'].startswith('http'))
+                (self.link_pool if is_link else self.cpu_pool).submit(self._process_ocr, task)
             except queue.Empty:
                 continue
             except Exception as e:
@@ -265,6 +351,16 @@ class ProcessingWorker:
 
     def _process_ocr(self, task):
         try:
+            # Media metadata is captured once here so listings never stat files
+            if task['file_path'] and task['file_path'].startswith('/uploads/'):
+                update_item_media(task['id'], probe_media(self.resolve_path(task['file_path'])))
+
+            # Duplicate upload: clone the cached extraction instead of re-running the pipeline
+            if task.get('content_hash') and clone_cached_extraction(task['content_hash'], task['id']) is not None:
+                print(f"[Worker] Task {task['id']} cloned from cache ({task['content_hash'][:12]})")
+                self.broadcast_done(task)
+                return
+
             self.update_progress(task, "ocr", 10, "Extracting text...")
             full_path = self.resolve_path(task['file_path'])
             
@@ -281,6 +377,27 @@ class ProcessingWorker:
                 item = get_item(task['id'], task['user_id'])
                 if item: task['ocr_text'] = item['content']
 
+            # Remote preview images are downloaded and resized once, then served locally
+            if task.get('meta_image'):
+                task['meta_image'] = cache_preview(task['meta_image'], task['file_path'])
+
+            # Media preprocessing: decode the audio track once on the CPU pool,
+            # so Whisper/VAD later read the normalized PCM from cache.
+            if task['type'] in ['audio', 'video'] and not task['file_path'].startswith('http'):
+                try:
+                    extract_audio(full_path)
+                except Exception as e:
+                    print(f"[OCR] Audio extraction failed for {task['id']}: {e}")
+
+            # Poster thumbnail (moved off the upload request path)
+            if task['type'] == 'video' and not task['file_path'].startswith('http') and not task.get('thumbnail_path'):
+                self.ensure_video_thumbnail(task, full_path)
+
+            # Scene-change keyframes for the vision stage (bounded CPU per minute of video)
+            if task['type'] == 'video' and not task['file_path'].startswith('http'):
+                keyframe_dir = os.path.join(os.path.dirname(full_path), "thumbnails", "keyframes")
+                task['keyframes'] = extract_keyframes(full_path, keyframe_dir)
+
             # ROUTING
             if task['type'] == 'image':
                 self.vision_queue.put(task)
@@ -331,23 +448,33 @@ class ProcessingWorker:
                             break
                     
                     if batch:
-                        # Prepare Paths
-                        paths = []
+                        # Prepare Paths (one job per image/thumbnail plus one per video keyframe)
+                        jobs = []
                         for t in batch:
                             self.update_progress(t, "visual", 40, "Analyzing visuals...", "processing")
                             full_path = self.resolve_path(t['file_path'])
                             thumb_path = self.resolve_path(t['thumbnail_path']) if t.get('thumbnail_path') else full_path
                             target = thumb_path if (t['type'] == 'video' and t.get('thumbnail_path')) else full_path
-                            paths.append(target)
+                            jobs.append((t, target, None))
+                            for kf in t.get('keyframes') or []:
+                                jobs.append((t, kf['path'], kf['timestamp']))
 
-                        # Run Inference
-                        results = batch_analyze_images(paths)
+                        # Run Inference (BLIP generates in BATCH_SIZE slices)
+                        results = batch_analyze_images([path for _, path, _ in jobs], batch_size=BATCH_SIZE)
 
                         # Distribute Results
-                        for t, res in zip(batch, results):
-                            t['vision_caption'] = res['caption']
-                            t['vision_tags'] = res['tags']
-                            
+                        for (t, _, timestamp), res in zip(jobs, results):
+                            if timestamp is None:
+                                t['vision_caption'] = res['caption']
+                                t['vision_tags'] = res['tags']
+                            else:
+                                t['keyframe_results'].append({
+                                    "timestamp": timestamp,
+                                    "caption": res['caption'],
+                                    "tags": res['tags']
+                                })
+
+                        for t in batch:
                             if t['type'] == 'video':
                                 t['vision_done'] = True
                                 self.whisper_queue.put(t) # Move to Whisper Queue
@@ -380,9 +507,19 @@ class ProcessingWorker:
                     # We process fewer here to check for new Vision tasks sooner
                     try:
                         t = self.whisper_queue.get_nowait()
-                        self.update_progress(t, "whisper", 70, "Transcribing...", "processing")
+                        self.update_progress(t, "whisper", 50, "Transcribing...", "processing")
                         full_path = self.resolve_path(t['file_path'])
-                        t['transcript'] = transcribe_audio(full_path)
+                        # Drop transcript chunks left behind by an interrupted run
+                        delete_chunks(t['id'], "transcript")
+                        try:
+                            t['transcript_segments'] = transcribe_segments(full_path, on_segments=self.transcript_streamer(t))
+                            t['transcript'] = " ".join(seg['text'] for seg in t['transcript_segments'])
+                            t['transcript_streamed'] = True
+                        except Exception as e:
+                            print(f"[GPU] Transcription failed for {t['id']}: {e}")
+                            # Batches streamed before the failure are removed by the embed stage
+                            t['transcript'] = ""
+                            t['transcript_failed'] = True
                         self.embed_queue.put(t)
                     except queue.Empty:
                         pass
@@ -404,13 +541,28 @@ class ProcessingWorker:
         while self.running:
             try:
                 task = self.embed_queue.get(timeout=1)
+
+                # Partial transcript batch streamed from the Whisper stage
+                if task.get('partial') == "transcript":
+                    pieces = list(split_segments(task['transcript_segments']))
+                    vectors = generate_embeddings([part for part, _, _ in pieces])
+                    for (part, start, end), vec in zip(pieces, vectors):
+                        insert_chunk(task['id'], "transcript", part, vec, start_time=start, end_time=end)
+                    self.embed_queue.task_done()
+                    continue
+
                 self.update_progress(task, "embed", 90, "Finalizing...")
                 
                 # --- CHUNKING STEP (Step 1 Fix) ---
                 # 1. OCR Chunks
-                if task['ocr_text']:
-                    for part in split_text(task['ocr_text']):
-                        insert_chunk(task['id'], "ocr", part, generate_embedding(part))
+                # Embeddings are batched and served from the text-hash cache where possible
+                if task.get('reindex') or task['type'] in INCREMENTAL_TYPES:
+                    # Editable/re-synced text: diff against stored chunks, embed only what changed
+                    reindex_chunks(task['id'], "ocr", list(split_blocks(task['ocr_text'])))
+                elif task['ocr_text']:
+                    parts = list(split_text(task['ocr_text']))
+                    for part, vec in zip(parts, generate_embeddings(parts)):
+                        insert_chunk(task['id'], "ocr", part, vec)
                         
                 # 2. Vision Caption Chunk
                 if task['vision_caption']:
@@ -421,16 +573,37 @@ class ProcessingWorker:
                     tags_text = "Objects detected: " + ", ".join(task['vision_tags'])
                     insert_chunk(task['id'], "visual", tags_text, generate_embedding(tags_text))
                     
-                # 4. Transcript Chunks
-                if task['transcript']:
-                    for part in split_text(task['transcript']):
-                        insert_chunk(task['id'], "transcript", part, generate_embedding(part))
+                # 3b. Video Keyframe Chunks (timestamped)
+                for kf in task.get('keyframe_results') or []:
+                    if kf['caption']:
+                        insert_chunk(task['id'], "caption", kf['caption'], generate_embedding(kf['caption']), start_time=kf['timestamp'])
+                    if kf['tags']:
+                        kf_tags_text = "Objects detected: " + ", ".join(kf['tags'])
+                        insert_chunk(task['id'], "visual", kf_tags_text, generate_embedding(kf_tags_text), start_time=kf['timestamp'])
+
+                # 4. Transcript Chunks (timestamped when segments are available)
+                if task.get('transcript_failed'):
+                    # Partial batches were queued ahead of this task, so they are in by now
+                    delete_chunks(task['id'], "transcript")
+                elif task.get('transcript_streamed'):
+                    pass # Already indexed batch by batch while Whisper was running
+                elif task.get('transcript_segments'):
+                    pieces = list(split_segments(task['transcript_segments']))
+                    vectors = generate_embeddings([part for part, _, _ in pieces])
+                    for (part, start, end), vec in zip(pieces, vectors):
+                        insert_chunk(task['id'], "transcript", part, vec, start_time=start, end_time=end)
+                elif task['transcript']:
+                    parts = list(split_text(task['transcript']))
+                    for part, vec in zip(parts, generate_embeddings(parts)):
+                        insert_chunk(task['id'], "transcript", part, vec)
 
                 # --- ORIGINAL AGGREGATION (Legacy Support) ---
                 parts = []
                 if task['ocr_text']: parts.append(task['ocr_text'])
                 if task['vision_caption']: parts.append(f"AI Description: {task['vision_caption']}")
                 if task['vision_tags']: parts.append(f"Objects: {', '.join(task['vision_tags'])}")
+                scenes = [f"[{int(kf['timestamp']) // 60}:{int(kf['timestamp']) % 60:02d}] {kf['caption']}" for kf in task.get('keyframe_results') or [] if kf['caption']]
+                if scenes: parts.append("Scenes:\n" + "\n".join(scenes))
                 if task['transcript']: parts.append(f"Transcript:\n{task['transcript']}")
                 
                 final_content = "\n\n".join(parts)
@@ -453,15 +626,16 @@ class ProcessingWorker:
                     progress_message="Completed"
                 )
                 
-                try:
-                    loop = asyncio.get_event_loop()
-                    msg = {
-                        "item_id": task['id'], "stage": "done", "percent": 100, 
-                        "message": "Completed", "status": "completed"
-                    }
-                    if loop.is_running(): asyncio.run_coroutine_threadsafe(manager.broadcast(msg), loop)
-                    else: loop.run_until_complete(manager.broadcast(msg))
-                except: pass
+                # Cache outputs by content hash so re-uploads of the same file are instant
+                if task.get('content_hash') and not task.get('transcript_failed'):
+                    try:
+                        cache_item_extraction(task['content_hash'], task['id'], {
+                            key: task.get(key) for key in CACHED_OUTPUTS
+                        })
+                    except Exception as e:
+                        print(f"[Embed Worker] Could not cache extraction: {e}")
+
+                self.broadcast_done(task)
                 
                 self.embed_queue.task_done()
                 
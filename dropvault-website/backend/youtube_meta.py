@@ -0,0 +1,192 @@
+import os
+import re
+import json
+import time
+from urllib.parse import urlsplit, parse_qs, quote
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import yt_dlp
+from .database import get_youtube_meta, save_youtube_meta
+from .link_fetcher import fetch
+
+# yt-dlp calls take seconds each; they get their own bounded pool
+YTDLP_CONCURRENCY = int(os.getenv("YTDLP_CONCURRENCY", "4"))
+YTDLP_TIMEOUT_S = int(os.getenv("YTDLP_TIMEOUT_S", "30"))
+# Full yt-dlp metadata is reused for a week; oEmbed fallbacks are retried sooner
+YOUTUBE_META_TTL_S = int(os.getenv("YOUTUBE_META_TTL_HOURS", "168")) * 3600
+YOUTUBE_FALLBACK_TTL_S = 3600
+YOUTUBE_PLAYLIST_MAX = int(os.getenv("YOUTUBE_PLAYLIST_MAX", "50"))
+
+ytdlp_pool = ThreadPoolExecutor(max_workers=YTDLP_CONCURRENCY)
+
+VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+# Only these fields are kept (the raw info dict is huge: formats, thumbnails, ...)
+INFO_FIELDS = ["id", "title", "description", "uploader", "upload_date", "thumbnail", "tags", "duration", "webpage_url"]
+
+def is_youtube_url(url):
+    return bool(url) and ("youtube.com" in url or "youtu.be" in url)
+
+def canonical_video_id(url):
+    """
+    Video id from any of the usual URL shapes (watch, youtu.be, shorts, embed, live).
+    """
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return None
+    host = parts.netloc.lower()
+    path = parts.path.strip("/").split("/")
+    candidate = None
+    if host.endswith("youtu.be"):
+        candidate = path[0] if path else None
+    elif "youtube.com" in host:
+        if path and path[0] == "watch":
+            candidate = parse_qs(parts.query).get("v", [None])[0]
+        elif len(path) >= 2 and path[0] in ("shorts", "embed", "live", "v"):
+            candidate = path[1]
+    return candidate if candidate and VIDEO_ID_RE.match(candidate) else None
+
+def is_collection_url(url):
+    """
+    Playlists and channels (a watch URL with &list= is still treated as the video).
+    """
+    if not is_youtube_url(url) or canonical_video_id(url):
+        return False
+    path = urlsplit(url).path
+    return path.startswith(("/playlist", "/channel/", "/c/", "/user/", "/@"))
+
+def _ytdlp_extract(url, flat=False):
+    ydl_opts = {
+        'quiet': True,
+        'no_warnings': True,
+        'skip_download': True,
+        'ignoreerrors': True,  # Prevent crashing on errors
+        'socket_timeout': 15
+    }
+    if flat:
+        ydl_opts['extract_flat'] = 'in_playlist'
+        ydl_opts['playlistend'] = YOUTUBE_PLAYLIST_MAX
+    else:
+        # watch?v=...&list=... is the video, not its playlist (cached by video id)
+        ydl_opts['noplaylist'] = True
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        return ydl.extract_info(url, download=False)
+
+def _oembed(video_id):
+    # Cheap fallback: title/channel/thumbnail only, no description
+    url = f"https://www.youtube.com/oembed?format=json&url={quote(f'https://www.youtube.com/watch?v={video_id}', safe='')}"
+    page = fetch(url)
+    if page["status"] != 200:
+        return None
+    data = json.loads(page["body"])
+    return {
+        "id": video_id,
+        "title": data.get("title"),
+        "uploader": data.get("author_name"),
+        "thumbnail": data.get("thumbnail_url"),
+        "webpage_url": f"https://www.youtube.com/watch?v={video_id}"
+    }
+
+def get_video_info(url):
+    """
+    Metadata for one video: cache first, then yt-dlp on the dedicated pool
+    (bounded by YTDLP_TIMEOUT_S), then oEmbed. Returns a dict or None.
+    Must not be called from inside ytdlp_pool.
+    """
+    video_id = canonical_video_id(url)
+    cached = get_youtube_meta(video_id) if video_id else None
+    if cached:
+        ttl = YOUTUBE_META_TTL_S if cached["source"] == "ytdlp" else YOUTUBE_FALLBACK_TTL_S
+        if time.time() - cached["fetched_at"] < ttl:
+            return cached["info"]
+
+    info = None
+    try:
+        raw = ytdlp_pool.submit(_ytdlp_extract, url).result(timeout=YTDLP_TIMEOUT_S)
+        if raw:
+            info = {k: raw.get(k) for k in INFO_FIELDS}
+            info["description"] = raw.get('description') or raw.get('full_description') or raw.get('comment') or raw.get('caption')
+    except FutureTimeout:
+        # The call keeps its pool slot until yt-dlp's own socket timeout hits
+        print(f"[YouTube] yt-dlp timed out after {YTDLP_TIMEOUT_S}s: {url}")
+    except Exception as e:
+        print(f"[YouTube] yt-dlp failed: {e}")
+
+    if info:
+        video_id = info.get("id") if info.get("id") and VIDEO_ID_RE.match(info["id"]) else video_id
+        if video_id:
+            save_youtube_meta(video_id, info, "ytdlp")
+        return info
+
+    if video_id:
+        try:
+            info = _oembed(video_id)
+        except Exception as e:
+            print(f"[YouTube] oEmbed fallback failed: {e}")
+        if info:
+            save_youtube_meta(video_id, info, "oembed")
+            return info
+
+    # Stale beats nothing
+    return cached["info"] if cached else None
+
+def get_collection_info(url):
+    """
+    Playlist/channel: a flat listing (one yt-dlp call), then the videos'
+    metadata extracted in parallel on the pool. Returns (title, [video info]).
+    """
+    try:
+        listing = ytdlp_pool.submit(_ytdlp_extract, url, True).result(timeout=YTDLP_TIMEOUT_S * 2)
+    except FutureTimeout:
+        print(f"[YouTube] Playlist listing timed out: {url}")
+        return None, []
+    if not listing:
+        return None, []
+
+    video_urls = []
+    for entry in (listing.get("entries") or [])[:YOUTUBE_PLAYLIST_MAX]:
+        if entry and entry.get("id") and VIDEO_ID_RE.match(entry["id"]):
+            video_urls.append(f"https://www.youtube.com/watch?v={entry['id']}")
+
+    # get_video_info blocks on the pool itself, so fan out from a plain thread pool
+    with ThreadPoolExecutor(max_workers=YTDLP_CONCURRENCY) as fan_out:
+        videos = [info for info in fan_out.map(get_video_info, video_urls) if info]
+    return listing.get("title"), videos
+
+def format_video_text(url, info):
+    final_parts = [f"URL: {url}"]
+    if info.get("title"): final_parts.append(f"Title: {info['title']}")
+
+    if info.get("uploader"): final_parts.append(f"Channel: {info['uploader']}")
+    if info.get("upload_date"): final_parts.append(f"Date: {info['upload_date']}")
+    if info.get("tags"): final_parts.append(f"Tags: {', '.join(info['tags'])}")
+
+    if info.get("description"):
+        final_parts.append("\n--- Video Description ---\n")
+        final_parts.append(info["description"])
+
+    return "\n".join(final_parts)
+
+def extract_youtube(url):
+    """
+    Same shape as extract_text: (text, title, thumbnail), or None when
+    nothing could be extracted (the caller falls back to a plain page fetch).
+    """
+    print(f"Extracting YouTube metadata: {url}")
+    if is_collection_url(url):
+        title, videos = get_collection_info(url)
+        if not videos:
+            return None
+        final_parts = [f"URL: {url}"]
+        if title: final_parts.append(f"Title: {title}")
+        final_parts.append(f"Videos: {len(videos)}")
+        for info in videos:
+            line = f"\n- {info.get('title') or info.get('id')}"
+            if info.get("uploader"): line += f" ({info['uploader']})"
+            final_parts.append(line)
+            if info.get("description"): final_parts.append(info["description"][:300])
+        return "\n".join(final_parts), title, videos[0].get("thumbnail")
+
+    info = get_video_info(url)
+    if not info:
+        return None
+    return format_video_text(url, info), info.get("title"), info.get("thumbnail")
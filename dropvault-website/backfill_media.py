@@ -0,0 +1,54 @@
+import sqlite3
+import os
+from pathlib import Path
+from backend.database import init_db, update_item_media
+from backend.media_utils import UPLOAD_DIR, probe_media
+
+# Robust path handling
+BASE_DIR = Path(__file__).resolve().parent
+DB_PATH = BASE_DIR / "backend" / "dropvault.db"
+
+def backfill_media():
+    """
+    One-off: fills file_size/mime_type/width/height/duration for items
+    created before media metadata was captured at ingest.
+    """
+    if not DB_PATH.exists():
+        print(f"DB not found at {DB_PATH}")
+        return
+
+    # Adds the media columns if this DB predates them
+    init_db()
+
+    conn = sqlite3.connect(DB_PATH)
+    conn.row_factory = sqlite3.Row
+    c = conn.cursor()
+
+    print("Fetching items without media metadata...")
+    c.execute("SELECT id, file_path FROM items WHERE file_size IS NULL AND file_path LIKE '/uploads/%'")
+    rows = c.fetchall()
+    conn.close()
+
+    print(f"Found {len(rows)} items. Probing files...")
+
+    # Items sharing a blob are probed once
+    probed = {}
+    missing = 0
+    for row in rows:
+        rel_path = row['file_path'].replace('/uploads/', '', 1).lstrip('/')
+        full_path = os.path.join(UPLOAD_DIR, rel_path)
+        if full_path not in probed:
+            probed[full_path] = probe_media(full_path)
+        media = probed[full_path]
+
+        if media["file_size"] is None:
+            missing += 1
+            print(f"Item {row['id']}: file missing ({row['file_path']})")
+            # Recorded as 0 so the row isn't picked up again
+            media = {**media, "file_size": 0}
+        update_item_media(row['id'], media)
+
+    print(f"✅ Backfilled {len(rows) - missing} items ({missing} missing files, {len(probed)} files probed).")
+
+if __name__ == "__main__":
+    backfill_media()
@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import tempfile
+import numpy as np
+from backend import database
+from backend.search_index import quantize, approx_scores, top_k
+
+# Recall@20 and memory of the int8 search tier (SEARCH_QUANTIZE=int8) against
+# exact float32 search, on a synthetic corpus shaped like real chunk vectors:
+# 384-d (all-MiniLM-L6-v2), unit length, clustered by topic. Queries are
+# noisy topic centers. Rescoring is timed twice: against the float corpus in
+# memory, and the way search does it (UserIndex.exact_score): an IN query on a
+# chunks table of JSON embeddings plus json.loads per row. The table holds the
+# deepest shortlist of every query and is read warm (in the page cache).
+# Usage: python bench_quantized.py [n_chunks] [n_queries]
+
+DIM = 384
+N_TOPICS = 2000
+TOP = 20
+RESCORE_DEPTHS = [0, 50, 100, 200, 400]
+
+def unit(x):
+    return (x / np.linalg.norm(x, axis=-1, keepdims=True)).astype(np.float32)
+
+def make_corpus(n, n_queries, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = unit(rng.normal(size=(N_TOPICS, DIM)))
+    topics = rng.integers(0, N_TOPICS, size=n)
+    corpus = np.empty((n, DIM), dtype=np.float32)
+    for start in range(0, n, 50000):
+        stop = min(n, start + 50000)
+        corpus[start:stop] = unit(centers[topics[start:stop]] + 0.9 * rng.normal(size=(stop - start, DIM)) / np.sqrt(DIM) * 6)
+    queries = unit(centers[rng.integers(0, N_TOPICS, size=n_queries)] + rng.normal(size=(n_queries, DIM)) / np.sqrt(DIM) * 3)
+    return corpus, queries
+
+def exact_top(corpus, q, rows):
+    scores = corpus @ q
+    return set(top_k(scores, rows, TOP)[0].tolist())
+
+def quantized_top(codes, scale, corpus, q, rows, depth):
+    approx = approx_scores(codes, scale, q, rows)
+    if not depth:
+        return set(top_k(approx, rows, TOP)[0].tolist())
+    cand, _ = top_k(approx, rows, depth)
+    if corpus is None:
+        # As search does it: float vectors for the shortlist from the chunks table
+        stored = database.get_chunk_embeddings((cand + 1).tolist())
+        vectors = np.array([stored[int(row) + 1] for row in cand], dtype=np.float32)
+    else:
+        vectors = corpus[cand]
+    return set(top_k(vectors @ q, cand, TOP)[0].tolist())
+
+def make_store(corpus, rows):
+    """A chunks table (id, embedding JSON) holding the given corpus rows."""
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE chunks (id INTEGER PRIMARY KEY, embedding TEXT)")
+    conn.executemany("INSERT INTO chunks VALUES (?, ?)", ((int(row) + 1, json.dumps(corpus[row].tolist())) for row in sorted(rows)))
+    conn.commit()
+    conn.close()
+    return path
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    print(f"Corpus: {n} chunks x {DIM}d, {n_queries} queries")
+    corpus, queries = make_corpus(n, n_queries)
+    rows = np.arange(n)
+
+    start = time.perf_counter()
+    codes, scale = quantize(corpus)
+    print(f"Quantized in {time.perf_counter() - start:.2f}s")
+
+    float_mb = corpus.nbytes / 1e6
+    int8_mb = (codes.nbytes + scale.nbytes) / 1e6
+    print(f"Memory: float32 {float_mb:.1f} MB | int8 {int8_mb:.1f} MB | saved {float_mb - int8_mb:.1f} MB ({float_mb / int8_mb:.2f}x)")
+
+    t0 = time.perf_counter()
+    truth = [exact_top(corpus, q, rows) for q in queries]
+    t_exact = (time.perf_counter() - t0) / n_queries
+    print(f"Exact float32: {t_exact * 1000:.1f} ms/query")
+
+    deepest = set()
+    for q in queries:
+        deepest.update(top_k(approx_scores(codes, scale, q, rows), rows, max(RESCORE_DEPTHS))[0].tolist())
+    path = make_store(corpus, deepest)
+    print(f"Rescore store: {len(deepest)} JSON embeddings, {os.path.getsize(path) / 1e6:.0f} MB")
+    database.get_db_path = lambda: path
+
+    for depth in RESCORE_DEPTHS:
+        t0 = time.perf_counter()
+        found = [quantized_top(codes, scale, corpus, q, rows, depth) for q in queries]
+        t_q = (time.perf_counter() - t0) / n_queries
+        recall = np.mean([len(f & t) / TOP for f, t in zip(found, truth)])
+        label = f"rescore top {depth}" if depth else "no rescoring"
+        line = f"int8, {label:<17}: recall@{TOP} {recall:.4f} | {t_q * 1000:.1f} ms/query in memory"
+        if depth:
+            t0 = time.perf_counter()
+            stored = [quantized_top(codes, scale, None, q, rows, depth) for q in queries]
+            t_s = (time.perf_counter() - t0) / n_queries
+            assert stored == found
+            line += f" | {t_s * 1000:.1f} ms/query from SQLite"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import sys
+import json
+import time
+import random
+from datetime import datetime, timedelta
+import numpy as np
+from backend import search_index
+from backend.database import compute_static_score
+
+# Benchmark for the search rerank stage: the original per-candidate Python loop
+# vs the array version in search_index (recency + usage read from a per-item
+# static_score), on synthetic chunks with embeddings. Also checks that both
+# produce the same item scores and order, starting from the vectors: the old
+# recall scored float64 cosine_sim on the JSON embeddings, UserIndex.score uses
+# float32 unit vectors. Vector scores agree to RECALL_TOLERANCE (float32
+# rounding); items whose scores tie within it may swap places.
+
+CHUNK_TYPES = ["visual", "caption", "ocr", "transcript"]
+WORDS = ["rust", "python", "meeting", "diagram", "budget", "notes", "design", "review", "audio", "launch"]
+DIM = 384
+N_VECTORS = 2000   # Distinct embeddings; chunks share them, so exact score ties happen
+RECALL_TOLERANCE = 1e-5
+
+def make_vectors(seed):
+    """Query vector and a pool of float32 embeddings with cosines to it in [0.22, 0.9]."""
+    rng = np.random.default_rng(seed)
+    q = rng.normal(size=DIM)
+    q /= np.linalg.norm(q)
+    perp = rng.normal(size=(N_VECTORS, DIM))
+    perp -= np.outer(perp @ q, q)
+    perp /= np.linalg.norm(perp, axis=1, keepdims=True)
+    cos = rng.uniform(0.22, 0.9, size=N_VECTORS)
+    # Scaled like unnormalized model output; float32 like the encoder's
+    pool = ((cos[:, None] * q + np.sqrt(1 - cos[:, None] ** 2) * perp) * rng.uniform(0.5, 3, size=(N_VECTORS, 1))).astype(np.float32)
+    return q.astype(np.float32).tolist(), [json.dumps(v) for v in pool.tolist()]
+
+def make_rows(n_chunks, n_items, seed=0):
+    rng = random.Random(seed)
+    _, pool = make_vectors(seed)
+    now = datetime.now()
+    created = {i: (now - timedelta(days=rng.randint(0, 60), seconds=rng.randint(0, 86400))).strftime("%Y-%m-%d %H:%M:%S")
+               for i in range(1, n_items + 1)}
+    rows = []
+    for i in range(n_chunks):
+        item_id = rng.randint(1, n_items)
+        rows.append({
+            "id": i,
+            "item_id": item_id,
+            "chunk_type": rng.choice(CHUNK_TYPES),
+            "text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))),
+            "embedding": rng.choice(pool),
+            "start_time": None,
+            "end_time": None,
+            "item_type": "note",
+            "created_at": created[item_id],
+            "title": f"Item {i}",
+        })
+    return rows
+
+# --- Reference: the recall scoring, rerank + aggregation loop search() used before ---
+
+def cosine_sim(a, b):
+    if a is None or b is None:
+        return 0.0
+    a = np.array(a)
+    b = np.array(b)
+    norm_a = np.linalg.norm(a)
+    norm_b = np.linalg.norm(b)
+    if norm_a == 0 or norm_b == 0:
+        return 0.0
+    return np.dot(a, b) / (norm_a * norm_b)
+
+def reference_recall(rows_data, q_vec):
+    candidates = []
+    for chunk in rows_data:
+        score = cosine_sim(q_vec, json.loads(chunk['embedding'])) * search_index.CHUNK_WEIGHTS.get(chunk['chunk_type'], 1.0)
+        if score > 0.15:
+            candidates.append({"row": chunk['id'], "item_id": chunk['item_id'], "vector_score": score, "chunk_type": chunk['chunk_type'],
+                               "text": chunk['text'], "created_at": chunk['created_at']})
+    candidates.sort(key=lambda x: x["vector_score"], reverse=True)
+    return candidates
+
+def keyword_overlap_score(query_words, text):
+    if not text: return 0
+    words = set(text.lower().split())
+    return len(query_words & words)
+
+def get_modality_boost(query, chunk_type):
+    q = query.lower()
+    if any(w in q for w in search_index.VISUAL_HINTS) and chunk_type in ["visual", "caption"]:
+        return 0.05
+    if any(w in q for w in search_index.AUDIO_HINTS) and chunk_type == "transcript":
+        return 0.05
+    return 0
+
+def get_recency_boost(created_at_str):
+    try:
+        item_date = datetime.strptime(created_at_str, "%Y-%m-%d %H:%M:%S")
+        days_old = (datetime.now() - item_date).days
+        if days_old < 7: return 0.05
+        if days_old < 30: return 0.02
+    except: pass
+    return 0
+
+def usage_boost(access_count):
+    if not access_count: return 0.0
+    if access_count >= 20: return 0.07
+    if access_count >= 10: return 0.05
+    if access_count >= 3: return 0.03
+    return 0.0
+
+def reference(candidates, query, query_keywords, access_counts):
+    for c in candidates:
+        final_score = c['vector_score']
+        overlap = keyword_overlap_score(query_keywords, c['text'])
+        if overlap > 0:
+            final_score += 0.05 * overlap
+        mod_boost = get_modality_boost(query, c['chunk_type'])
+        if mod_boost > 0:
+            final_score += mod_boost
+        rec_boost = get_recency_boost(c['created_at'])
+        if rec_boost > 0:
+            final_score += rec_boost
+        c['final_score'] = final_score
+
+    item_map = {}
+    for c in candidates:
+        item_map.setdefault(c['item_id'], []).append(c)
+    results = []
+    for iid, chunks in item_map.items():
+        best_chunk = max(chunks, key=lambda x: x['final_score'])
+        item_score = best_chunk['final_score']
+        evidence_count = len(chunks) - 1
+        if evidence_count > 0:
+            item_score += min(0.15, 0.03 * evidence_count)
+        item_score += usage_boost(access_counts.get(iid, 0))
+        results.append((iid, item_score))
+    results.sort(key=lambda x: x[1], reverse=True)
+    return results[:20]
+
+def vectorized(index, rows, scores, query, query_keywords, texts, static_scores):
+    # texts stands in for index.payload(rows), which reads the DB
+    final_scores, _, _ = search_index.rerank(index, rows, scores, query, query_keywords, [texts[r] for r in rows])
+    item_ids, _, item_scores, _ = search_index.aggregate_items(index.item_ids[rows], final_scores)
+    item_scores = item_scores + np.array([static_scores[int(i)] for i in item_ids], dtype=np.float64)
+    ranked = np.argsort(-item_scores, kind="stable")[:20]
+    return [(int(item_ids[g]), float(item_scores[g])) for g in ranked]
+
+def bench(k, n_items, repeats=5):
+    rows_data = make_rows(k, n_items, seed=k)
+    index = search_index.UserIndex("bench", 0, rows_data, [])
+    q_vec, _ = make_vectors(k)
+    rng = np.random.default_rng(k)
+    access_counts = {i: int(c) for i, c in enumerate(rng.integers(0, 25, size=n_items + 1))}
+    # What items.static_score holds (maintained on write, not timed here)
+    created = {r['item_id']: r['created_at'] for r in rows_data}
+    static_scores = {i: compute_static_score(created[i], access_counts[i]) for i in created}
+    query = "rust meeting diagram"
+    query_keywords = set(w for w in query.split() if len(w) > 3)
+
+    # Recall both ways (not timed; this bench times the rerank stage)
+    ref_candidates = reference_recall(rows_data, q_vec)
+    rows, scores = index.recall_scores(q_vec, np.arange(k))
+    keep = scores > 0.15
+    rows, scores = search_index.top_k(scores[keep], rows[keep], k)
+    ref_scores = {c['row']: c['vector_score'] for c in ref_candidates}
+    recall_error = max(abs(float(s) - ref_scores.get(int(r), 0.0)) for r, s in zip(rows, scores))
+    same_rows = len(rows) == len(ref_candidates)
+
+    def candidates():
+        return [dict(c) for c in ref_candidates]
+
+    expected = reference(candidates(), query, query_keywords, access_counts)
+    texts = [r['text'] for r in rows_data]
+    got = vectorized(index, rows, scores, query, query_keywords, texts, static_scores)
+    # Item scores carry the float32 recall error; items tying within it may swap
+    same = same_rows and recall_error <= RECALL_TOLERANCE and len(expected) == len(got) and all(
+        abs(a - b) <= RECALL_TOLERANCE and (i == j or abs(a - dict(got).get(i, 1e9)) <= 2 * RECALL_TOLERANCE)
+        for (i, a), (j, b) in zip(expected, got))
+
+    t_ref = min(_timed(lambda: reference(candidates(), query, query_keywords, access_counts)) for _ in range(repeats))
+    t_vec = min(_timed(lambda: vectorized(index, rows, scores, query, query_keywords, texts, static_scores)) for _ in range(repeats))
+    print(f"top-K {k:>6}: loop {t_ref * 1000:8.2f} ms | arrays {t_vec * 1000:7.2f} ms | "
+          f"x{t_ref / t_vec:5.1f} | recall error {recall_error:.1e} | same ranking: {same}")
+    return same
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [60, 1000, 10000, 50000]
+    ok = all([bench(k, max(10, k // 4)) for k in sizes])
+    sys.exit(0 if ok else 1)
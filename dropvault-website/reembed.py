@@ -3,7 +3,8 @@ import json
 import os
 import re
 from pathlib import Path
-from backend.ai import generate_embedding
+from backend.ai import generate_embedding, embedding_cache_stats
+from backend.database import init_db
 
 # Robust path handling
 BASE_DIR = Path(__file__).resolve().parent
@@ -19,6 +20,9 @@ def reembed_all():
         print(f"DB not found at {DB_PATH}")
         return
 
+    # Make sure the embedding cache table exists (unchanged text is not re-encoded)
+    init_db()
+
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
     c = conn.cursor()
@@ -54,6 +58,7 @@ def reembed_all():
     conn.commit()
     conn.close()
     print("✅ All items re-embedded successfully!")
+    print(f"Embedding cache: {embedding_cache_stats()}")
 
 if __name__ == "__main__":
     reembed_all()
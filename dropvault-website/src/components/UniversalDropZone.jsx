@@ -83,17 +83,68 @@ const UniversalDropZone = ({ onItemAdded, onUploadStart, onUploadEnd, onQueueCha
       }
   };
 
+  // Large files go through the resumable protocol: chunks are retried and resumed
+  // from the server's offset instead of restarting the whole upload.
+  const RESUMABLE_THRESHOLD = 16 * 1024 * 1024;
+  const MAX_CHUNK_RETRIES = 5;
+
+  const uploadResumable = async (file) => {
+      const initData = new FormData();
+      if (user) initData.append("userId", user.uid);
+      initData.append("filename", file.name);
+      initData.append("size", file.size);
+      if (file.type) initData.append("mimeType", file.type);
+
+      let initRes = await fetch("/api/uploads", { method: "POST", body: initData });
+      while (initRes.status === 429) {
+          await new Promise(r => setTimeout(r, 5000));
+          initRes = await fetch("/api/uploads", { method: "POST", body: initData });
+      }
+      if (!initRes.ok) throw new Error("Upload init failed");
+      const { uploadId, chunkSize } = await initRes.json();
+
+      let offset = 0;
+      let retries = 0;
+      while (offset < file.size) {
+          try {
+              const res = await fetch(`/api/uploads/${uploadId}`, {
+                  method: "PATCH",
+                  headers: { "Upload-Offset": String(offset), "Content-Type": "application/offset+octet-stream" },
+                  body: file.slice(offset, offset + chunkSize)
+              });
+              if (!res.ok && res.status !== 409) throw new Error(`Chunk failed (${res.status})`);
+              offset = parseInt(res.headers.get("Upload-Offset"), 10);
+              retries = 0;
+          } catch (e) {
+              if (++retries > MAX_CHUNK_RETRIES) throw e;
+              await new Promise(r => setTimeout(r, 1000 * 2 ** retries));
+              // Ask the server how much actually arrived, then continue from there
+              const head = await fetch(`/api/uploads/${uploadId}`, { method: "HEAD" }).catch(() => null);
+              if (head && head.ok) offset = parseInt(head.headers.get("Upload-Offset"), 10);
+          }
+      }
+
+      const done = await fetch(`/api/uploads/${uploadId}/finalize`, { method: "POST" });
+      if (!done.ok) throw new Error("Upload finalize failed");
+      return done.json();
+  };
+
   const uploadFile = async (file) => {
     if (onUploadStart) onUploadStart();
 
     try {
-      const formData = new FormData();
-      if (user) formData.append("userId", user.uid);
-      formData.append("file", file);
-      
-      const response = await fetch("/api/upload", { method: "POST", body: formData });
-      if (!response.ok) throw new Error("Upload failed");
-      const data = await response.json();
+      let data;
+      if (file.size > RESUMABLE_THRESHOLD) {
+          data = await uploadResumable(file);
+      } else {
+          const formData = new FormData();
+          if (user) formData.append("userId", user.uid);
+          formData.append("file", file);
+
+          const response = await fetch("/api/upload", { method: "POST", body: formData });
+          if (!response.ok) throw new Error("Upload failed");
+          data = await response.json();
+      }
       const initialType = file.type === "application/pdf" ? "pdf" : (file.type.startsWith("image/") ? "image" : "file");
       
       await createItem({
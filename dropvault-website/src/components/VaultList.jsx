@@ -89,6 +89,10 @@ const InstagramEmbed = ({ url }) => {
     );
 };
 
+// Local uploads are served resized by the backend (/api/media); remote URLs are used as-is
+const mediaUrl = (path, width) => (path && path.startsWith('/uploads/')) ? `/api/media${path}?w=${width}` : path;
+const mediaSrcSet = (path, width) => (path && path.startsWith('/uploads/')) ? `${mediaUrl(path, width)} 1x, ${mediaUrl(path, width * 2)} 2x` : undefined;
+
 // --- Sub-Components ---
 
 const GridItemCard = ({ item, isSelectionMode, isSelected, onSelect, onClick }) => {
@@ -117,11 +121,11 @@ const GridItemCard = ({ item, isSelectionMode, isSelected, onSelect, onClick })
            </div>
         )}
         <div className="flex-grow-1 bg-muted d-flex align-items-center justify-content-center position-relative overflow-hidden" style={{ minHeight: "140px" }}>
-            {itemType === "image" ? <img src={item.file_path} alt="" className="w-100 h-100 object-fit-cover position-absolute" /> :
+            {itemType === "image" ? <img src={mediaUrl(item.file_path, 480)} srcSet={mediaSrcSet(item.file_path, 480)} loading="lazy" alt="" className="w-100 h-100 object-fit-cover position-absolute" /> :
              isVid ? (
                  displayThumbnail ? (
                      <React.Fragment>
-                         <img src={displayThumbnail} alt="" className="w-100 h-100 object-fit-cover position-absolute" />
+                         <img src={mediaUrl(displayThumbnail, 480)} srcSet={mediaSrcSet(displayThumbnail, 480)} loading="lazy" alt="" className="w-100 h-100 object-fit-cover position-absolute" />
                          <div className="position-absolute bg-dark bg-opacity-50 rounded-circle p-2 d-flex align-items-center justify-content-center" style={{ width: "40px", height: "40px" }}>
                              <Play size={20} className="text-white fill-white" />
                          </div>
@@ -207,6 +211,7 @@ const VaultList = ({ searchQuery = "", activeTags = [], viewMode = "list", limit
   const [loadingMore, setLoadingMore] = useState(false);
   const [activeFilter, setActiveFilter] = useState("ALL");
   const [hasMoreMap, setHasMoreMap] = useState({});
+  const [cursorMap, setCursorMap] = useState({});
   const [selectedItem, setSelectedItem] = useState(null);
   const [isEditing, setIsEditing] = useState(false);
   const [editForm, setEditForm] = useState({ title: "", content: "", tags: "" });
@@ -317,7 +322,7 @@ const VaultList = ({ searchQuery = "", activeTags = [], viewMode = "list", limit
       
       try {
           let url = "/api/items";
-          const offset = isInitial ? 0 : itemsPool.length; 
+          const cursor = isInitial ? null : cursorMap[activeFilter];
           const currentPageSize = getPageSize(isInitial);
           
           if (searchQuery || activeTags.length > 0) {
@@ -327,7 +332,8 @@ const VaultList = ({ searchQuery = "", activeTags = [], viewMode = "list", limit
               }
               setIsSearching(true);
           } else {
-              url += `?limit=${currentPageSize}&offset=${offset}&type=${activeFilter}`;
+              url += `?limit=${currentPageSize}&type=${activeFilter}`;
+              if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
               setIsSearching(false);
           }
           
@@ -351,7 +357,10 @@ const VaultList = ({ searchQuery = "", activeTags = [], viewMode = "list", limit
                           return dateB - dateA;
                       });
                   });
-                  setHasMoreMap(prev => ({ ...prev, [activeFilter]: data.length === currentPageSize }));
+                  // Keyset pagination: the server hands back where the next page starts
+                  const nextCursor = res.headers.get("X-Next-Cursor");
+                  setCursorMap(prev => ({ ...prev, [activeFilter]: nextCursor }));
+                  setHasMoreMap(prev => ({ ...prev, [activeFilter]: !!nextCursor }));
               }
           } else {
               console.error("Fetch failed:", res.status);
@@ -365,7 +374,7 @@ const VaultList = ({ searchQuery = "", activeTags = [], viewMode = "list", limit
   };
 
   useEffect(() => {
-      if (refreshTrigger > 0) { setItemsPool([]); setHasMoreMap({}); }
+      if (refreshTrigger > 0) { setItemsPool([]); setHasMoreMap({}); setCursorMap({}); }
       if (limit > 0) {
           const fetchRecent = async () => {
               setLoading(true);
@@ -0,0 +1,60 @@
+import json
+import sqlite3
+import pytest
+from backend import database, search_index
+
+# Search index catch-up vs index_log truncation by compact().
+# Run from dropvault-website/: python -m pytest tests
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / "test.db")
+    monkeypatch.setattr(database, "DB_NAME", path)    # Absolute, so os.path.join keeps it as is
+    monkeypatch.setattr(search_index, "SEARCH_SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    monkeypatch.setattr(search_index, "_indexes", search_index.OrderedDict())
+    monkeypatch.setattr(search_index, "_compactor", object())   # No background compaction
+    database.init_db()
+    return path
+
+def add_chunk(path, user_id, embedding=(1.0, 0.0, 0.0)):
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute("INSERT INTO items (title, type, user_id) VALUES ('n', 'note', ?)", (user_id,))
+    c.execute("INSERT INTO chunks (item_id, type, text, embedding) VALUES (?, 'ocr', 'text', ?)", (c.lastrowid, json.dumps(list(embedding))))
+    conn.commit()
+    conn.close()
+
+def live_chunks(index):
+    return sorted(int(cid) for cid in index.chunk_ids[index.alive])
+
+def fresh_chunks(user_id):
+    return sorted(r['id'] for r in database.get_all_chunks(user_id))
+
+def test_compact_keeps_log_of_cached_index_without_snapshot(db):
+    # Empty index: nothing to snapshot, so only the cached copy replays the log
+    assert search_index.get_index("u").size == 0
+    add_chunk(db, "u")
+    search_index.compact()
+    assert live_chunks(search_index.get_index("u")) == fresh_chunks("u") != []
+
+def test_compact_keeps_log_when_snapshot_write_failed(db, monkeypatch):
+    add_chunk(db, "u")
+    def fail(self):
+        raise OSError("disk full")
+    monkeypatch.setattr(search_index.UserIndex, "save_snapshot", fail)
+    search_index.get_index("u")
+    add_chunk(db, "u", (0.0, 1.0, 0.0))
+    search_index.compact()
+    assert live_chunks(search_index.get_index("u")) == fresh_chunks("u")
+    assert len(fresh_chunks("u")) == 2
+
+def test_compact_trims_applied_log_with_snapshots_off(db, monkeypatch):
+    monkeypatch.setattr(search_index, "SEARCH_SNAPSHOTS", False)
+    search_index.get_index("u")
+    add_chunk(db, "u")
+    search_index.compact()
+    assert len(database.get_index_log("u", 0)) == 1     # Not applied by the cached index yet
+    assert live_chunks(search_index.get_index("u")) == fresh_chunks("u") != []
+    search_index.compact()                               # Rebuilds the caught-up index
+    assert database.get_index_log("u", 0) == []
+    assert live_chunks(search_index.get_index("u")) == fresh_chunks("u")